@@ -6,16 +6,52 @@ This package provides tools for converting between different annotation formats.
 
 import argparse
 import sys
+from importlib import import_module
+
+from .materialize import IMAGE_MODES
+from .labelme_writer import IMAGE_DATA_MODES
+
+# Subcommand registry: command -> (module, function). Converter modules and
+# their heavy dependencies (numpy, PIL, ...) are only imported when the
+# subcommand actually runs, which keeps `2label --help`/`--version` fast.
+COMMANDS = {
+    "labelme-to-coco": ("labelme_coco", "labelme_to_coco"),
+    "labelme-to-yolo": ("labelme_yolo", "labelme_to_yolo"),
+    "labelme3-to-labelme": ("labelme3_labelme", "labelme3_to_labelme"),
+    "labelme3-to-via": ("labelme3_via", "labelme3_to_via"),
+    "via-to-labelme3": ("via_labelme3", "via_to_labelme3"),
+    "cvat-to-via": ("cvat_via", "cvat_to_via"),
+    "cvat-to-yolo": ("cvat_yolo", "cvat_to_yolo"),
+    "yolo-to-voc": ("yolo_voc", "yolo_to_voc"),
+    "voc-to-coco": ("voc_coco", "voc_to_coco"),
+    "convert": ("dataset", "convert_dataset"),
+    "tfrecord-export": ("tfrecord_export", "tfrecord_export"),
+}
+
+# Public converter functions, re-exported lazily from their modules
+_EXPORTS = {function: module for module, function in COMMANDS.values()}
+
+
+def load_command(command):
+    """
+    Import the converter function registered for a subcommand.
+    
+    Args:
+        command (str): Subcommand name, e.g. "labelme-to-coco"
+        
+    Returns:
+        callable: The converter function
+    """
+    module, function = COMMANDS[command]
+    return getattr(import_module(f".{module}", __name__), function)
+
+
+def __getattr__(name):
+    """Resolve `from convert import labelme_to_coco` style imports on first use."""
+    if name in _EXPORTS:
+        return getattr(import_module(f".{_EXPORTS[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-from .labelme_coco import labelme_to_coco
-from .labelme3_labelme import labelme3_to_labelme
-from .via_labelme3 import via_to_labelme3
-from .cvat_via import cvat_to_via
-from .yolo_voc import yolo_to_voc
-from .labelme3_via import labelme3_to_via
-from .voc_coco import voc_to_coco
-from .cvat_yolo import cvat_to_yolo
-from .labelme_yolo import labelme_to_yolo
 
 def main():
     """Main entry point for the 2label command-line interface."""
@@ -28,46 +64,99 @@ def main():
     labelme_coco_parser = subparsers.add_parser("labelme-to-coco", help="Convert LabelMe to COCO")
     labelme_coco_parser.add_argument("--input_dir", required=True, help="Directory with LabelMe JSON files")
     labelme_coco_parser.add_argument("--output_file", required=True, help="Output COCO JSON file")
+    labelme_coco_parser.add_argument("--no_stream", action="store_true", help="Build the whole COCO file in memory before writing")
+    labelme_coco_parser.add_argument("--incremental", action="store_true", help="Only convert inputs that changed since the previous run")
+    labelme_coco_parser.add_argument("--classes_file", help="classes.txt, obj.names or labelmap.txt fixing the class id order")
+    labelme_coco_parser.add_argument("--compact", action="store_true", help="Write JSON output without indentation")
     
     # LabelMe to YOLO
     labelme_yolo_parser = subparsers.add_parser("labelme-to-yolo", help="Convert LabelMe to YOLO")
     labelme_yolo_parser.add_argument("--input_dir", required=True, help="Directory with LabelMe JSON files")
     labelme_yolo_parser.add_argument("--output_dir", default="dst", help="Output directory for YOLO files")
+    labelme_yolo_parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (0 = one per CPU)")
+    labelme_yolo_parser.add_argument("--image_mode", "--image-mode", choices=IMAGE_MODES, default="copy", help="How images are placed in the output directory")
+    labelme_yolo_parser.add_argument("--incremental", action="store_true", help="Only convert inputs that changed since the previous run")
+    labelme_yolo_parser.add_argument("--classes_file", help="classes.txt, obj.names or labelmap.txt fixing the class id order")
     
     # LabelMe3 to LabelMe
     labelme3_labelme_parser = subparsers.add_parser("labelme3-to-labelme", help="Convert LabelMe 3.0 to LabelMe")
     labelme3_labelme_parser.add_argument("--input_dir", required=True, help="Directory with LabelMe 3.0 files")
     labelme3_labelme_parser.add_argument("--output_dir", default="dst", help="Output directory for LabelMe files")
+    labelme3_labelme_parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (0 = one per CPU)")
+    labelme3_labelme_parser.add_argument("--image_mode", "--image-mode", choices=IMAGE_MODES, default="copy", help="How images are placed in the output directory")
+    labelme3_labelme_parser.add_argument("--incremental", action="store_true", help="Only convert inputs that changed since the previous run")
+    labelme3_labelme_parser.add_argument("--compact", action="store_true", help="Write JSON output without indentation")
+    labelme3_labelme_parser.add_argument("--image_data", "--image-data", choices=IMAGE_DATA_MODES, default="embed", help="Embed images as base64 imageData or leave it empty")
     
     # LabelMe3 to VIA
     labelme3_via_parser = subparsers.add_parser("labelme3-to-via", help="Convert LabelMe 3.0 to VIA")
     labelme3_via_parser.add_argument("--input_dir", required=True, help="Directory with LabelMe 3.0 files")
     labelme3_via_parser.add_argument("--output_dir", default="dst", help="Output directory for VIA files")
+    labelme3_via_parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (0 = one per CPU)")
+    labelme3_via_parser.add_argument("--image_mode", "--image-mode", choices=IMAGE_MODES, default="copy", help="How images are placed in the output directory")
+    labelme3_via_parser.add_argument("--compact", action="store_true", help="Write JSON output without indentation")
     
     # VIA to LabelMe3
     via_labelme3_parser = subparsers.add_parser("via-to-labelme3", help="Convert VIA to LabelMe 3.0")
     via_labelme3_parser.add_argument("--input_dir", required=True, help="Directory with VIA project file")
     via_labelme3_parser.add_argument("--output_dir", default="dst", help="Output directory for LabelMe 3.0 files")
+    via_labelme3_parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (0 = one per CPU)")
+    via_labelme3_parser.add_argument("--image_mode", "--image-mode", choices=IMAGE_MODES, default="copy", help="How images are placed in the output directory")
     
     # CVAT to VIA
     cvat_via_parser = subparsers.add_parser("cvat-to-via", help="Convert CVAT to VIA")
     cvat_via_parser.add_argument("--input_dir", required=True, help="Directory with CVAT XML file")
     cvat_via_parser.add_argument("--output_dir", default="dst", help="Output directory for VIA files")
+    cvat_via_parser.add_argument("--image_mode", "--image-mode", choices=IMAGE_MODES, default="copy", help="How images are placed in the output directory")
+    cvat_via_parser.add_argument("--compact", action="store_true", help="Write JSON output without indentation")
     
     # CVAT to YOLO
     cvat_yolo_parser = subparsers.add_parser("cvat-to-yolo", help="Convert CVAT to YOLO")
     cvat_yolo_parser.add_argument("--input_dir", required=True, help="Directory with CVAT XML file")
     cvat_yolo_parser.add_argument("--output_dir", default="dst", help="Output directory for YOLO files")
+    cvat_yolo_parser.add_argument("--image_mode", "--image-mode", choices=IMAGE_MODES, default="copy", help="How images are placed in the output directory")
+    cvat_yolo_parser.add_argument("--classes_file", help="classes.txt, obj.names or labelmap.txt fixing the class id order")
     
     # YOLO to VOC
     yolo_voc_parser = subparsers.add_parser("yolo-to-voc", help="Convert YOLO to Pascal VOC")
     yolo_voc_parser.add_argument("--input_dir", required=True, help="Directory with YOLO files")
     yolo_voc_parser.add_argument("--output_dir", default="dst", help="Output directory for VOC files")
+    yolo_voc_parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (0 = one per CPU)")
+    yolo_voc_parser.add_argument("--image_mode", "--image-mode", choices=IMAGE_MODES, default="copy", help="How images are placed in the output directory")
+    yolo_voc_parser.add_argument("--incremental", action="store_true", help="Only convert inputs that changed since the previous run")
+    yolo_voc_parser.add_argument("--classes_file", help="classes.txt, obj.names or labelmap.txt fixing the class id order")
     
     # VOC to COCO
     voc_coco_parser = subparsers.add_parser("voc-to-coco", help="Convert Pascal VOC to COCO")
     voc_coco_parser.add_argument("--input_dir", required=True, help="Directory with VOC XML files")
     voc_coco_parser.add_argument("--output_file", required=True, help="Output COCO JSON file")
+    voc_coco_parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (0 = one per CPU)")
+    voc_coco_parser.add_argument("--no_stream", action="store_true", help="Build the whole COCO file in memory before writing")
+    voc_coco_parser.add_argument("--incremental", action="store_true", help="Only convert inputs that changed since the previous run")
+    voc_coco_parser.add_argument("--classes_file", help="classes.txt, obj.names or labelmap.txt fixing the class id order")
+    voc_coco_parser.add_argument("--compact", action="store_true", help="Write JSON output without indentation")
+    
+    # Any reader to any writer through the columnar dataset model
+    dataset_parser = subparsers.add_parser("convert", help="Convert between formats through the shared dataset model")
+    dataset_parser.add_argument("--input", required=True, help="Input directory (or COCO JSON file)")
+    dataset_parser.add_argument("--input_format", required=True, help="Input format (labelme, voc, yolo or coco)")
+    dataset_parser.add_argument("--output", required=True, help="Output directory (or COCO JSON file)")
+    dataset_parser.add_argument("--output_format", required=True, help="Output format (coco, yolo or voc)")
+    dataset_parser.add_argument("--classes_file", help="classes.txt, obj.names or labelmap.txt fixing the class id order")
+    dataset_parser.add_argument("--compact", action="store_true", help="Write JSON output without indentation")
+    
+    # TFRecord to COCO, YOLO or VOC
+    tfrecord_parser = subparsers.add_parser("tfrecord-export", help="Convert TFRecord files to COCO, YOLO or Pascal VOC")
+    tfrecord_parser.add_argument("--input", required=True, help="TFRecord file, glob pattern or directory of record files")
+    tfrecord_parser.add_argument("--output_dir", required=True, help="Output directory")
+    tfrecord_parser.add_argument("--output_format", choices=("coco", "yolo", "voc"), default="coco", help="Output format")
+    tfrecord_parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (0 = one per CPU)")
+    tfrecord_parser.add_argument("--compression", choices=("NONE", "GZIP", "ZLIB"), default="NONE", help="Record compression")
+    tfrecord_parser.add_argument("--classes_file", help="classes.txt, obj.names or labelmap.txt fixing the class id order")
+    tfrecord_parser.add_argument("--label_map", help="Label map .pbtxt naming the class ids of records without class text")
+    tfrecord_parser.add_argument("--no_masks", action="store_true", help="Do not convert instance masks to COCO polygons")
+    tfrecord_parser.add_argument("--no_images", action="store_true", help="Only write annotations, not the encoded images")
+    tfrecord_parser.add_argument("--compact", action="store_true", help="Write JSON output without indentation")
     
     args = parser.parse_args()
     
@@ -75,24 +164,35 @@ def main():
         parser.print_help()
         sys.exit(1)
         
+    command = load_command(args.command)
+    
     if args.command == "labelme-to-coco":
-        labelme_to_coco(args.input_dir, args.output_file)
+        command(args.input_dir, args.output_file, not args.no_stream, args.incremental, args.classes_file,
+                args.compact)
     elif args.command == "labelme-to-yolo":
-        labelme_to_yolo(args.input_dir, args.output_dir)
+        command(args.input_dir, args.output_dir, args.workers, args.image_mode, args.incremental, args.classes_file)
     elif args.command == "labelme3-to-labelme":
-        labelme3_to_labelme(args.input_dir, args.output_dir)
+        command(args.input_dir, args.output_dir, args.workers, args.image_mode, args.incremental, args.compact,
+                args.image_data)
     elif args.command == "labelme3-to-via":
-        labelme3_to_via(args.input_dir, args.output_dir)
+        command(args.input_dir, args.output_dir, args.workers, args.image_mode, args.compact)
     elif args.command == "via-to-labelme3":
-        via_to_labelme3(args.input_dir, args.output_dir)
+        command(args.input_dir, args.output_dir, args.workers, args.image_mode)
     elif args.command == "cvat-to-via":
-        cvat_to_via(args.input_dir, args.output_dir)
+        command(args.input_dir, args.output_dir, args.image_mode, args.compact)
     elif args.command == "cvat-to-yolo":
-        cvat_to_yolo(args.input_dir, args.output_dir)
+        command(args.input_dir, args.output_dir, args.image_mode, args.classes_file)
     elif args.command == "yolo-to-voc":
-        yolo_to_voc(args.input_dir, args.output_dir)
+        command(args.input_dir, args.output_dir, args.workers, args.image_mode, args.incremental, args.classes_file)
     elif args.command == "voc-to-coco":
-        voc_to_coco(args.input_dir, args.output_file)
+        command(args.input_dir, args.output_file, args.workers, not args.no_stream, args.incremental,
+                args.classes_file, args.compact)
+    elif args.command == "convert":
+        command(args.input, args.input_format, args.output, args.output_format, args.classes_file, args.compact)
+    elif args.command == "tfrecord-export":
+        if not command(args.input, args.output_dir, args.output_format, args.workers, args.compression,
+                       args.classes_file, args.label_map, not args.no_masks, not args.no_images, args.compact):
+            sys.exit(1)
 
 
 if __name__ == "__main__":
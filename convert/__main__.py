@@ -0,0 +1,5 @@
+"""Allow running the 2label CLI as `python -m convert`."""
+
+from . import main
+
+main()
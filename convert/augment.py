@@ -0,0 +1,517 @@
+"""
+Matrix-based geometric augmentation for LabelMe datasets.
+
+Every geometric step (flip, rotate, scale, resize, crop, translate, shear or an
+arbitrary homography) is a 3x3 matrix in LabelMe point coordinates, where
+pixel (i, j) covers [i, i + 1) x [j, j + 1). A chain of steps is composed into
+a single matrix, so an augmented sample costs one point transform for all of
+its shapes and one cv2.warpAffine/warpPerspective call for the image, however
+many steps the chain has.
+
+iter_augmented() streams randomly augmented samples of a LabelMe dataset
+straight from memory, e.g. into a training loop. Every sample draws its
+random steps from its own generator, seeded by the global seed, the source
+file and the sample index, so the stream is reproducible however it is
+sharded across workers.
+
+Photometric steps from convert.photometric can be mixed into a chain; they
+are applied, in order, to the warped image.
+
+Usage:
+    pipeline = Compose([Rotate(10), Crop(20, 20, 600, 400), HorizontalFlip(), Brightness(20)])
+    image_aug, shapes_aug = pipeline.apply(image, shapes)
+
+    for image, shapes in iter_augmented("dataset/labelme", 1000, seed=42):
+        ...
+"""
+
+import os
+import math
+import base64
+import random
+
+import cv2
+import numpy as np
+
+from .labelme_reader import load_labelme
+from .photometric import (PhotometricStep, Brightness, Contrast, Gamma, Hue, Saturation, Value, Noise,
+                          apply_photometric)
+
+# Random options drawn by iter_augmented()
+GEOMETRIC_OPTIONS = ('h_flip', 'v_flip', 'rotate', 'crop', 'resize', 'shear')
+PHOTOMETRIC_OPTIONS = ('brightness', 'contrast', 'gamma', 'hue', 'saturation', 'value', 'noise')
+AUG_OPTIONS = GEOMETRIC_OPTIONS + PHOTOMETRIC_OPTIONS
+
+
+def translation(tx, ty):
+    """Return the 3x3 matrix translating by (tx, ty)."""
+    return np.array([[1.0, 0.0, tx], [0.0, 1.0, ty], [0.0, 0.0, 1.0]])
+
+
+def scaling(sx, sy):
+    """Return the 3x3 matrix scaling by (sx, sy) around the origin."""
+    return np.array([[sx, 0.0, 0.0], [0.0, sy, 0.0], [0.0, 0.0, 1.0]])
+
+
+def rotation(degrees, center=(0.0, 0.0)):
+    """
+    Return the 3x3 matrix rotating around a center point.
+
+    Args:
+        degrees (float): Angle; positive values rotate counter-clockwise on screen, like cv2.getRotationMatrix2D
+        center (tuple, optional): (x, y) rotation center. Defaults to the origin.
+
+    Returns:
+        numpy.ndarray: 3x3 matrix
+    """
+    radians = math.radians(degrees)
+    cos, sin = math.cos(radians), math.sin(radians)
+    cx, cy = center
+    rotate = np.array([[cos, sin, 0.0], [-sin, cos, 0.0], [0.0, 0.0, 1.0]])
+    return translation(cx, cy) @ rotate @ translation(-cx, -cy)
+
+
+def compose(*matrices):
+    """
+    Compose transforms applied one after the other.
+
+    Args:
+        *matrices (numpy.ndarray): 3x3 matrices, in the order they are applied
+
+    Returns:
+        numpy.ndarray: Single 3x3 matrix equivalent to the chain
+    """
+    result = np.eye(3)
+    for matrix in matrices:
+        result = matrix @ result
+    return result
+
+
+def is_affine(matrix):
+    """Return True if a 3x3 matrix has no perspective component."""
+    return np.allclose(matrix[2], (0.0, 0.0, 1.0))
+
+
+def transform_points(matrix, points):
+    """
+    Apply a 3x3 transform to many points at once.
+
+    Args:
+        matrix (numpy.ndarray): 3x3 affine or homography matrix
+        points (array-like): (N, 2) x, y coordinates
+
+    Returns:
+        numpy.ndarray: (N, 2) transformed coordinates
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if is_affine(matrix):
+        return points @ matrix[:2, :2].T + matrix[:2, 2]
+    projected = points @ matrix[:, :2].T + matrix[:, 2]
+    return projected[:, :2] / projected[:, 2:3]
+
+
+def warp_image(image, matrix, size, interpolation=cv2.INTER_LINEAR, border_mode=cv2.BORDER_CONSTANT,
+               border_value=0):
+    """
+    Warp an image with a transform given in LabelMe point coordinates.
+
+    Args:
+        image (numpy.ndarray): Source image
+        matrix (numpy.ndarray): 3x3 transform in point coordinates
+        size (tuple): (width, height) of the output image
+        interpolation (int, optional): OpenCV interpolation flag. Defaults to cv2.INTER_LINEAR.
+        border_mode (int, optional): OpenCV border mode. Defaults to cv2.BORDER_CONSTANT.
+        border_value (optional): Fill value for constant borders. Defaults to 0.
+
+    Returns:
+        numpy.ndarray: Warped image
+    """
+    # OpenCV samples at pixel centers, which sit half a pixel off the point coordinates
+    pixel_matrix = translation(-0.5, -0.5) @ matrix @ translation(0.5, 0.5)
+    size = (int(size[0]), int(size[1]))
+    if is_affine(pixel_matrix):
+        return cv2.warpAffine(image, pixel_matrix[:2], size, flags=interpolation,
+                              borderMode=border_mode, borderValue=border_value)
+    return cv2.warpPerspective(image, pixel_matrix, size, flags=interpolation,
+                               borderMode=border_mode, borderValue=border_value)
+
+
+def transform_shapes(matrix, shapes, size=None):
+    """
+    Transform the points of all LabelMe shapes of an image in one call.
+
+    Rectangles are transformed through their four corners and replaced by the
+    axis-aligned box around them, so they stay valid under rotation and shear.
+
+    Args:
+        matrix (numpy.ndarray): 3x3 transform
+        shapes (list): LabelMe shape dicts; they are not modified
+        size (tuple, optional): (width, height) of the output image. If given,
+            points are clipped to it and shapes falling entirely outside are dropped.
+
+    Returns:
+        list: New shape dicts
+    """
+    groups = []
+    for shape in shapes:
+        points = np.asarray(shape.get("points") or [], dtype=np.float64).reshape(-1, 2)
+        if shape.get("shape_type") == "rectangle" and len(points) == 2:
+            (x1, y1), (x2, y2) = points
+            points = np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]])
+        groups.append(points)
+    if not groups:
+        return []
+
+    transformed = transform_points(matrix, np.concatenate(groups))
+    splits = np.cumsum([len(points) for points in groups])[:-1]
+
+    results = []
+    for shape, points in zip(shapes, np.split(transformed, splits)):
+        if size is not None and len(points):
+            width, height = size
+            outside = ((points[:, 0] < 0).all() or (points[:, 0] > width).all()
+                       or (points[:, 1] < 0).all() or (points[:, 1] > height).all())
+            if outside:
+                continue
+            points = np.clip(points, 0, (width, height))
+        if shape.get("shape_type") == "rectangle" and len(points) == 4:
+            points = np.array([points.min(axis=0), points.max(axis=0)])
+        result = dict(shape)
+        result["points"] = points.tolist()
+        results.append(result)
+    return results
+
+
+class HorizontalFlip:
+    """Mirror the image left to right."""
+
+    def __call__(self, size):
+        width, height = size
+        return np.array([[-1.0, 0.0, width], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]), size
+
+
+class VerticalFlip:
+    """Mirror the image top to bottom."""
+
+    def __call__(self, size):
+        width, height = size
+        return np.array([[1.0, 0.0, 0.0], [0.0, -1.0, height], [0.0, 0.0, 1.0]]), size
+
+
+class Rotate:
+    """Rotate around the image center."""
+
+    def __init__(self, degrees, expand=False):
+        """
+        Initialize the step.
+
+        Args:
+            degrees (float): Counter-clockwise angle
+            expand (bool, optional): Grow the output to hold the whole rotated
+                image instead of keeping the input size. Defaults to False.
+        """
+        self.degrees = degrees
+        self.expand = expand
+
+    def __call__(self, size):
+        width, height = size
+        matrix = rotation(self.degrees, (width / 2, height / 2))
+        if not self.expand:
+            return matrix, size
+        corners = transform_points(matrix, [[0, 0], [width, 0], [width, height], [0, height]])
+        low, high = corners.min(axis=0), corners.max(axis=0)
+        new_size = tuple(int(math.ceil(v - 1e-6)) for v in high - low)
+        return translation(*(-low)) @ matrix, new_size
+
+
+class Resize:
+    """Resize to a fixed output size."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+    def __call__(self, size):
+        width, height = size
+        return scaling(self.width / width, self.height / height), (self.width, self.height)
+
+
+class Scale:
+    """Resize by a factor; the output size is rounded to whole pixels."""
+
+    def __init__(self, sx, sy=None):
+        self.sx = sx
+        self.sy = sx if sy is None else sy
+
+    def __call__(self, size):
+        width, height = size
+        return Resize(max(1, round(width * self.sx)), max(1, round(height * self.sy)))(size)
+
+
+class Crop:
+    """Cut out a window of the image."""
+
+    def __init__(self, x, y, width, height):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def __call__(self, size):
+        return translation(-self.x, -self.y), (self.width, self.height)
+
+
+class Translate:
+    """Shift the image content, keeping the size."""
+
+    def __init__(self, tx, ty):
+        self.tx = tx
+        self.ty = ty
+
+    def __call__(self, size):
+        return translation(self.tx, self.ty), size
+
+
+class Shear:
+    """Shear around the image center."""
+
+    def __init__(self, shx, shy=0.0):
+        self.shx = shx
+        self.shy = shy
+
+    def __call__(self, size):
+        width, height = size
+        shear = np.array([[1.0, self.shx, 0.0], [self.shy, 1.0, 0.0], [0.0, 0.0, 1.0]])
+        return translation(width / 2, height / 2) @ shear @ translation(-width / 2, -height / 2), size
+
+
+class Homography:
+    """Apply an arbitrary 3x3 matrix, e.g. from cv2.getPerspectiveTransform."""
+
+    def __init__(self, matrix, size=None):
+        """
+        Initialize the step.
+
+        Args:
+            matrix (array-like): 3x3 transform in point coordinates
+            size (tuple, optional): (width, height) of the output. Defaults to the input size.
+        """
+        self.matrix = np.asarray(matrix, dtype=np.float64)
+        self.size = size
+
+    def __call__(self, size):
+        return self.matrix, (tuple(self.size) if self.size is not None else size)
+
+
+class Compose:
+    """Chain of geometric steps applied as a single transform, followed by any photometric steps."""
+
+    def __init__(self, steps):
+        """
+        Initialize the pipeline.
+
+        Args:
+            steps (list): Step objects in the order they are applied. Geometric
+                steps are called with the current (width, height) and return
+                (matrix, new_size); PhotometricStep objects only change pixel values.
+        """
+        self.steps = list(steps)
+        self.geometric = [step for step in self.steps if not isinstance(step, PhotometricStep)]
+        self.photometric = [step for step in self.steps if isinstance(step, PhotometricStep)]
+
+    def plan(self, size):
+        """
+        Compose the chain for an input size.
+
+        Args:
+            size (tuple): (width, height) of the input image
+
+        Returns:
+            tuple: (matrix, output_size)
+        """
+        matrices = []
+        for step in self.geometric:
+            matrix, size = step(size)
+            matrices.append(matrix)
+        return compose(*matrices), size
+
+    def apply(self, image, shapes, **warp_options):
+        """
+        Augment an image and its LabelMe shapes.
+
+        Args:
+            image (numpy.ndarray): Source image
+            shapes (list): LabelMe shape dicts; they are not modified
+            **warp_options: Passed to warp_image()
+
+        Returns:
+            tuple: (augmented_image, augmented_shapes)
+        """
+        height, width = image.shape[:2]
+        if not self.geometric:
+            return apply_photometric(image, self.photometric), transform_shapes(np.eye(3), shapes)
+        matrix, size = self.plan((width, height))
+        image_aug = apply_photometric(warp_image(image, matrix, size, **warp_options), self.photometric)
+        return image_aug, transform_shapes(matrix, shapes, size)
+
+
+class RandomCrop:
+    """Keep a random window of a fraction of the current width and height."""
+
+    def __init__(self, min_ratio=0.8, rng=random):
+        """
+        Initialize the step.
+
+        Args:
+            min_ratio (float, optional): Smallest kept fraction of each side. Defaults to 0.8.
+            rng (random.Random, optional): Random generator. Defaults to the random module.
+        """
+        self.min_ratio = min_ratio
+        self.rng = rng
+
+    def __call__(self, size):
+        width, height = size
+        crop_width = max(1, int(width * self.rng.uniform(self.min_ratio, 1.0)))
+        crop_height = max(1, int(height * self.rng.uniform(self.min_ratio, 1.0)))
+        x = self.rng.randint(0, width - crop_width)
+        y = self.rng.randint(0, height - crop_height)
+        return Crop(x, y, crop_width, crop_height)(size)
+
+
+def random_step(option, rng=random, max_angle=15.0):
+    """
+    Create a randomly parameterized step for an augmentation option.
+
+    Table-based photometric parameters are drawn from a small set of rounded
+    values, so their lookup tables are built once and then reused.
+
+    The flip names are historical: 'h_flip' mirrors top to bottom like
+    cv2.flip(image, 0) and 'v_flip' mirrors left to right like cv2.flip(image, 1).
+
+    Args:
+        option (str): One of AUG_OPTIONS
+        rng (random.Random, optional): Random generator. Defaults to the random module.
+        max_angle (float, optional): Largest rotation in degrees. Defaults to 15.
+
+    Returns:
+        Step object
+    """
+    if option == 'h_flip':
+        return VerticalFlip()
+    if option == 'v_flip':
+        return HorizontalFlip()
+    if option == 'rotate':
+        return Rotate(rng.uniform(-max_angle, max_angle))
+    if option == 'crop':
+        return RandomCrop(rng=rng)
+    if option == 'resize':
+        return Scale(rng.uniform(0.8, 1.2))
+    if option == 'shear':
+        return Shear(rng.uniform(-0.2, 0.2))
+    if option == 'brightness':
+        return Brightness(rng.randint(-32, 32))
+    if option == 'contrast':
+        return Contrast(round(rng.uniform(0.75, 1.25), 2))
+    if option == 'gamma':
+        return Gamma(round(math.exp(rng.uniform(math.log(0.7), math.log(1.4))), 2))
+    if option == 'hue':
+        return Hue(rng.randint(-10, 10))
+    if option == 'saturation':
+        return Saturation(round(rng.uniform(0.7, 1.3), 2))
+    if option == 'value':
+        return Value(round(rng.uniform(0.7, 1.3), 2))
+    if option == 'noise':
+        return Noise(rng.uniform(2.0, 10.0), rng.getrandbits(32))
+    raise ValueError(f"Unknown augmentation option '{option}'. Use one of {', '.join(AUG_OPTIONS)}.")
+
+
+def sample_rng(seed, annotation_file, index):
+    """
+    Create the random generator of one augmented sample.
+
+    Args:
+        seed (int): Global seed of the stream
+        annotation_file (str): Source annotation file name
+        index (int): Sample index within the source file
+
+    Returns:
+        random.Random: Generator that does not depend on any other sample
+    """
+    return random.Random(f"{seed}:{os.path.basename(annotation_file)}:{index}")
+
+
+def _read_image(src_path, annotation_path, annotation):
+    """Read the source image, falling back to the embedded imageData. Returns None if unreadable."""
+    image_path = os.path.join(src_path, annotation.get("imagePath") or "")
+    if os.path.isfile(image_path):
+        image = cv2.imread(image_path)
+        if image is not None:
+            return image
+    image_data = load_labelme(annotation_path, image_data=True).get("imageData")
+    if not image_data:
+        return None
+    return cv2.imdecode(np.frombuffer(base64.b64decode(image_data), dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def iter_augmented(src_path, n, seed=0, options=('v_flip',), chain_length=1, max_angle=15.0,
+                   shard_index=0, num_shards=1, annotation_files=None, with_info=False):
+    """
+    Lazily yield randomly augmented samples of a LabelMe dataset.
+
+    The n samples are spread evenly over the source files, the first
+    n % len(annotation_files) files getting one extra, and are produced one
+    source file after the other, so each source image is read only once.
+    Sources are assigned to shards round-robin; the union of all shards is the
+    unsharded stream, sample for sample.
+
+    Args:
+        src_path (str): Directory with the LabelMe JSON files and their images
+        n (int): Total number of samples over all shards
+        seed (int, optional): Global seed. Defaults to 0.
+        options (sequence, optional): AUG_OPTIONS to draw from. Defaults to ('v_flip',).
+        chain_length (int, optional): Number of random steps composed per sample. Defaults to 1.
+        max_angle (float, optional): Largest rotation in degrees. Defaults to 15.
+        shard_index (int, optional): Shard to produce. Defaults to 0.
+        num_shards (int, optional): Number of shards the stream is split into. Defaults to 1.
+        annotation_files (list, optional): JSON file names relative to src_path.
+            Defaults to all .json files in src_path, sorted by name.
+        with_info (bool, optional): Also yield a dict with the source
+            "annotation_file", its "annotation" data and the sample "index". Defaults to False.
+
+    Yields:
+        tuple: (image, shapes), or (image, shapes, info) with with_info; image is a BGR numpy.ndarray
+    """
+    for option in options:
+        if option not in AUG_OPTIONS:
+            raise ValueError(f"Unknown augmentation option '{option}'. Use one of {', '.join(AUG_OPTIONS)}.")
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"Shard index {shard_index} is out of range for {num_shards} shards")
+    if annotation_files is None:
+        annotation_files = sorted(f for f in os.listdir(src_path) if f.endswith(".json"))
+    if not annotation_files or n <= 0:
+        return
+
+    per_source, extra = divmod(n, len(annotation_files))
+    for source_index in range(shard_index, len(annotation_files), num_shards):
+        count = per_source + (1 if source_index < extra else 0)
+        if count == 0:
+            break
+
+        annotation_file = annotation_files[source_index]
+        annotation_path = os.path.join(src_path, annotation_file)
+        annotation = load_labelme(annotation_path)
+        image = _read_image(src_path, annotation_path, annotation)
+        if image is None:
+            print(f"Error: can not read image of {annotation_path}")
+            continue
+        shapes = annotation.get("shapes") or []
+
+        for index in range(count):
+            rng = sample_rng(seed, annotation_file, index)
+            steps = [random_step(rng.choice(options), rng, max_angle) for _ in range(chain_length)]
+            image_aug, shapes_aug = Compose(steps).apply(image, shapes)
+            if with_info:
+                yield image_aug, shapes_aug, {"annotation_file": annotation_file,
+                                              "annotation": annotation, "index": index}
+            else:
+                yield image_aug, shapes_aug
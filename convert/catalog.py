@@ -0,0 +1,306 @@
+"""
+Persistent catalog of image metadata shared by all converters.
+
+Width, height, byte size, format and SHA-256 digest of every image a
+converter looks at are kept in a SQLite database, keyed by absolute path. An
+entry is only trusted while the file still has the size and modification time
+it was recorded with, so checking it costs one os.stat() and repeated
+conversions of the same images skip reading them. The digest is computed the
+first time it is asked for.
+
+The catalog lives at $XDG_CACHE_HOME/2label/images.sqlite (~/.cache/2label by
+default). Set TWOLABEL_CATALOG to another database path, or to "off" to
+disable it. Entries of deleted images are dropped with:
+
+    python -m convert.catalog --prune
+"""
+
+import os
+import io
+import sqlite3
+import hashlib
+import argparse
+import threading
+from collections import namedtuple
+from multiprocessing import util as mp_util
+
+from .utils import ensure_dir, probe_image_dimensions
+
+CATALOG_ENV = "TWOLABEL_CATALOG"
+
+# Rows buffered before they are written in one transaction
+_FLUSH_ROWS = 256
+
+_SCHEMA = """CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    format TEXT,
+    sha256 TEXT
+)"""
+
+_IMAGE_MAGIC = ((b"\xff\xd8", "jpeg"), (b"\x89PNG\r\n\x1a\n", "png"), (b"GIF8", "gif"), (b"BM", "bmp"))
+
+ImageInfo = namedtuple("ImageInfo", ["width", "height", "size", "format", "sha256"])
+
+
+def default_catalog_path():
+    """
+    Return the catalog database path.
+
+    Returns:
+        str: Database path, or None if the catalog is disabled
+    """
+    path = os.environ.get(CATALOG_ENV)
+    if path is not None:
+        return None if path.lower() in ("", "0", "off", "none") else path
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_dir, "2label", "images.sqlite")
+
+
+def probe_image(path, data=None):
+    """
+    Read the dimensions and format of an image from its header.
+
+    Args:
+        path (str): Image file
+        data (bytes, optional): The file contents, if already read
+
+    Returns:
+        tuple: (width, height, format), format being e.g. "jpeg" or "png"
+    """
+    with (io.BytesIO(data) if data is not None else open(path, "rb")) as f:
+        head = f.read(8)
+        image_format = next((name for magic, name in _IMAGE_MAGIC if head.startswith(magic)), None)
+        f.seek(0)
+        size = probe_image_dimensions(f) if image_format else None
+    if size is None:
+        from PIL import Image
+        with Image.open(io.BytesIO(data) if data is not None else path) as img:
+            size, image_format = img.size, (img.format or "").lower()
+    return size[0], size[1], image_format
+
+
+def _probe_metadata(path, data=None):
+    """Return probe_image(), or Nones for files that are not readable images, which still have a size and digest."""
+    try:
+        return probe_image(path, data)
+    except Exception:
+        return None, None, None
+
+
+def _digest(path, data=None, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of data, or of the file if data is None."""
+    if data is not None:
+        return hashlib.sha256(data).hexdigest()
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_image_info(path, sha256=False, data=None):
+    """
+    Read image metadata without the catalog.
+
+    Args:
+        path (str): Image file
+        sha256 (bool, optional): Also compute the SHA-256 digest. Defaults to False.
+        data (bytes, optional): The file contents, if already read
+
+    Returns:
+        ImageInfo: The metadata; sha256 is None unless requested, and width,
+            height and format are None if the file is not a readable image
+    """
+    width, height, image_format = _probe_metadata(path, data)
+    size = len(data) if data is not None else os.path.getsize(path)
+    return ImageInfo(width, height, size, image_format, _digest(path, data) if sha256 else None)
+
+
+class ImageCatalog:
+    """SQLite-backed image metadata cache, safe to share between threads and forked processes."""
+
+    def __init__(self, path):
+        """
+        Initialize the catalog; the database is opened on first use.
+
+        Args:
+            path (str): Database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._pending = {}
+
+    def _connect(self):
+        """Return this process's connection; SQLite connections must not cross a fork."""
+        if self._pid != os.getpid():
+            ensure_dir(os.path.dirname(os.path.abspath(self.path)))
+            conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            conn.commit()
+            self._conn, self._pid, self._pending = conn, os.getpid(), {}
+            # Also runs when pool worker processes exit, unlike atexit handlers
+            mp_util.Finalize(self, self.close, exitpriority=10)
+        return self._conn
+
+    def lookup(self, path, sha256=False, data=None):
+        """
+        Return the metadata of an image, reading the image only if it is not cataloged.
+
+        Args:
+            path (str): Image file
+            sha256 (bool, optional): Include the SHA-256 digest. Defaults to False.
+            data (bytes, optional): The file contents, if already read, used instead
+                of reading the file when the entry is missing or stale
+
+        Returns:
+            ImageInfo: The metadata; sha256 may be None unless requested, and width,
+                height and format are None if the file is not a readable image
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            conn = self._connect()
+            row = self._pending.get(path)
+            if row is None:
+                row = conn.execute("SELECT size, mtime_ns, width, height, format, sha256 FROM images WHERE path = ?",
+                                   (path,)).fetchone()
+
+        if row is not None and row[:2] == (stat.st_size, stat.st_mtime_ns):
+            if row[5] is not None or not sha256:
+                return ImageInfo(row[2], row[3], row[0], row[4], row[5])
+            width, height, image_format = row[2:5]
+        else:
+            width, height, image_format = _probe_metadata(path, data)
+        digest = _digest(path, data) if sha256 else None
+
+        with self._lock:
+            self._connect()
+            self._pending[path] = (stat.st_size, stat.st_mtime_ns, width, height, image_format, digest)
+            if len(self._pending) >= _FLUSH_ROWS:
+                self._flush()
+        return ImageInfo(width, height, stat.st_size, image_format, digest)
+
+    def _flush(self):
+        """Write the buffered rows; the caller holds the lock."""
+        if self._pending and self._pid == os.getpid():
+            rows = [(path,) + row for path, row in self._pending.items()]
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._pending.clear()
+
+    def flush(self):
+        """Write the buffered rows to the database."""
+        with self._lock:
+            self._flush()
+
+    def prune(self):
+        """
+        Drop the entries of images that no longer exist.
+
+        Returns:
+            int: Number of dropped entries
+        """
+        with self._lock:
+            conn = self._connect()
+            self._flush()
+            missing = [(path,) for path, in conn.execute("SELECT path FROM images") if not os.path.exists(path)]
+            with conn:
+                conn.executemany("DELETE FROM images WHERE path = ?", missing)
+        return len(missing)
+
+    def count(self):
+        """
+        Return the number of cataloged images.
+
+        Returns:
+            int: Number of entries
+        """
+        with self._lock:
+            conn = self._connect()
+            self._flush()
+            return conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def close(self):
+        """Write the buffered rows and close this process's connection."""
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                try:
+                    self._flush()
+                except sqlite3.Error:
+                    pass  # the catalog is only a cache, losing buffered rows is harmless
+                finally:
+                    self._conn.close()
+            self._conn, self._pid, self._pending = None, None, {}
+
+
+_catalog = None
+
+
+def get_catalog():
+    """
+    Return the shared catalog.
+
+    Returns:
+        ImageCatalog: The catalog, or None if it is disabled
+    """
+    global _catalog
+    if _catalog is None:
+        path = default_catalog_path()
+        _catalog = ImageCatalog(path) if path else False
+    return _catalog if _catalog is not False else None
+
+
+def image_info(path, sha256=False, data=None):
+    """
+    Return the metadata of an image through the shared catalog.
+
+    Falls back to reading the image when the catalog is disabled or unusable.
+
+    Args:
+        path (str): Image file
+        sha256 (bool, optional): Include the SHA-256 digest. Defaults to False.
+        data (bytes, optional): The file contents, if already read
+
+    Returns:
+        ImageInfo: The metadata; sha256 may be None unless requested, and width,
+            height and format are None if the file is not a readable image
+    """
+    global _catalog
+    catalog = get_catalog()
+    if catalog is not None:
+        try:
+            return catalog.lookup(path, sha256, data)
+        except (OSError, sqlite3.Error) as e:
+            # A missing image is the caller's error, reported again by read_image_info();
+            # anything else means the database cannot be created or used
+            if os.path.exists(path):
+                print(f"Warning: image catalog {catalog.path} disabled: {str(e)}")
+                _catalog = False
+                catalog.close()
+    return read_image_info(path, sha256, data)
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Maintain the image metadata catalog")
+    parser.add_argument('--prune', action='store_true', help="Drop the entries of images that no longer exist")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    catalog = get_catalog()
+    if catalog is None:
+        print(f"The image catalog is disabled by {CATALOG_ENV}")
+    else:
+        if args.prune:
+            print(f"Dropped {catalog.prune()} entries of deleted images")
+        print(f"{catalog.count()} images cataloged in {catalog.path}")
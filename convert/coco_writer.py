@@ -0,0 +1,231 @@
+"""
+Constant-memory streaming writer for COCO JSON files.
+
+Images are written straight to the output file as they are added, while
+annotations are serialized into a temporary spool file next to it and copied
+in after the image list. Categories are written last, so converters that only
+learn their categories while parsing can still stream everything else.
+Both writers produce either the indent=2 layout or compact JSON.
+"""
+
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+from . import jsonio
+
+
+def default_info(description, contributor="2Label"):
+    """
+    Build a COCO "info" block.
+
+    Args:
+        description (str): Dataset description
+        contributor (str, optional): Contributor name. Defaults to "2Label".
+
+    Returns:
+        dict: COCO info block
+    """
+    return {
+        "description": description,
+        "url": "",
+        "version": "1.0",
+        "year": datetime.now().year,
+        "contributor": contributor,
+        "date_created": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+DEFAULT_LICENSES = [{"id": 1, "name": "Unknown", "url": ""}]
+
+
+def load_coco(path):
+    """
+    Load a COCO file written by an earlier run.
+
+    Args:
+        path (str): Path to the COCO JSON file
+
+    Returns:
+        dict: COCO data, or None if the file is missing or not a COCO file
+    """
+    try:
+        with open(path, "rb") as f:
+            data = jsonio.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or not all(key in data for key in ("images", "annotations", "categories")):
+        return None
+    return data
+
+
+def retained_entries(previous, stale_image_ids):
+    """
+    Select the images and annotations of a previous COCO file that are still valid.
+
+    Args:
+        previous (dict): COCO data from load_coco()
+        stale_image_ids (set): Ids of images whose source changed or was deleted
+
+    Returns:
+        tuple: (images, annotations, next_image_id, next_annotation_id) where the
+            next ids follow the largest ids of the previous file
+    """
+    images = [image for image in previous["images"] if image["id"] not in stale_image_ids]
+    annotations = [annotation for annotation in previous["annotations"]
+                   if annotation["image_id"] not in stale_image_ids]
+    next_image_id = max((image["id"] for image in previous["images"]), default=0) + 1
+    next_annotation_id = max((annotation["id"] for annotation in previous["annotations"]), default=0) + 1
+    return images, annotations, next_image_id, next_annotation_id
+
+
+class COCOStreamWriter:
+    """Write a COCO JSON file incrementally, one image or annotation at a time."""
+
+    def __init__(self, output_file, info=None, licenses=None, categories=None, compact=False):
+        """
+        Open the output file and write the COCO header.
+
+        Args:
+            output_file (str): Path to the output COCO JSON file
+            info (dict, optional): COCO info block
+            licenses (list, optional): COCO licenses list
+            categories (list, optional): Category list; it is only read on close(),
+                so it may keep growing while images and annotations are added
+            compact (bool, optional): Write JSON without whitespace. Defaults to False.
+        """
+        self.output_file = output_file
+        self.categories = categories if categories is not None else []
+        self.compact = compact
+        self.num_images = 0
+        self.num_annotations = 0
+        # Line break, indent unit and key separator of the chosen layout
+        self._nl, self._pad, self._colon = ("", "", ":") if compact else ("\n", "  ", ": ")
+
+        output_dir = os.path.dirname(os.path.abspath(output_file))
+        self._file = open(output_file, "w", encoding="utf-8")
+        self._spool = tempfile.TemporaryFile(mode="w+", encoding="utf-8", dir=output_dir, suffix=".annotations")
+        self._closed = False
+
+        self._file.write("{" + self._nl)
+        self._write_member(self._file, "info", info if info is not None else default_info("Converted by 2Label"))
+        self._file.write("," + self._nl)
+        self._write_member(self._file, "licenses", licenses if licenses is not None else DEFAULT_LICENSES)
+        self._file.write(f',{self._nl}{self._pad}"images"{self._colon}[')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def _dumps_item(self, item):
+        """Serialize an array item exactly as json.dump(..., indent=2) nests it, or compactly."""
+        if self.compact:
+            return jsonio.dumps(item, compact=True)
+        return jsonio.dumps(item).replace("\n", "\n    ")
+
+    def _write_member(self, f, key, value):
+        """Write a top-level "key": value member in the chosen layout."""
+        if self.compact:
+            f.write(jsonio.dumps(key) + ":" + jsonio.dumps(value, compact=True))
+        else:
+            f.write(f'  {jsonio.dumps(key)}: ' + jsonio.dumps(value).replace("\n", "\n  "))
+
+    def add_image(self, image):
+        """
+        Write one COCO image entry.
+
+        Args:
+            image (dict): COCO image dict
+        """
+        self._file.write(("," if self.num_images else "") + self._nl + self._pad * 2 + self._dumps_item(image))
+        self.num_images += 1
+
+    def add_annotation(self, annotation):
+        """
+        Spool one COCO annotation entry.
+
+        Args:
+            annotation (dict): COCO annotation dict
+        """
+        self._spool.write(("," if self.num_annotations else "") + self._nl + self._pad * 2
+                          + self._dumps_item(annotation))
+        self.num_annotations += 1
+
+    def close(self):
+        """Append the spooled annotations and the categories, then close the file."""
+        if self._closed:
+            return
+        try:
+            self._file.write(self._nl + self._pad + "]," if self.num_images else "],")
+            self._file.write(f'{self._nl}{self._pad}"annotations"{self._colon}[')
+            self._spool.seek(0)
+            shutil.copyfileobj(self._spool, self._file)
+            self._file.write((self._nl + self._pad + "]," if self.num_annotations else "],") + self._nl)
+            self._write_member(self._file, "categories", self.categories)
+            self._file.write(self._nl + "}")
+        finally:
+            self._file.close()
+            self._spool.close()
+            self._closed = True
+
+    def abort(self):
+        """Close and remove a partially written output file."""
+        if self._closed:
+            return
+        self._file.close()
+        self._spool.close()
+        self._closed = True
+        if os.path.exists(self.output_file):
+            os.remove(self.output_file)
+
+
+class COCOMemoryWriter(COCOStreamWriter):
+    """Drop-in COCOStreamWriter that builds the whole file in memory and writes it on close."""
+
+    def __init__(self, output_file, info=None, licenses=None, categories=None, compact=False):
+        self.output_file = output_file
+        self.categories = categories if categories is not None else []
+        self.compact = compact
+        self.info = info if info is not None else default_info("Converted by 2Label")
+        self.licenses = licenses if licenses is not None else DEFAULT_LICENSES
+        self.images = []
+        self.annotations = []
+        self._closed = False
+
+    @property
+    def num_images(self):
+        return len(self.images)
+
+    @property
+    def num_annotations(self):
+        return len(self.annotations)
+
+    def add_image(self, image):
+        self.images.append(image)
+
+    def add_annotation(self, annotation):
+        self.annotations.append(annotation)
+
+    def close(self):
+        if self._closed:
+            return
+        data = {
+            "info": self.info,
+            "licenses": self.licenses,
+            "images": self.images,
+            "annotations": self.annotations,
+            "categories": self.categories
+        }
+        with open(self.output_file, "w", encoding="utf-8") as f:
+            jsonio.dump(data, f, self.compact)
+        self._closed = True
+
+    def abort(self):
+        self._closed = True
@@ -0,0 +1,119 @@
+"""
+Streaming reader for CVAT "for images" XML annotation files.
+
+The file is consumed with ElementTree.iterparse, so only the image currently
+being yielded is held in memory; every element is cleared once consumed.
+"""
+
+import xml.etree.ElementTree as ET
+
+from .labels import LabelRegistry
+
+
+SHAPE_TYPES = ('box', 'polygon', 'polyline', 'points')
+
+
+def parse_points(points_str):
+    """
+    Parse a CVAT points attribute ("x1,y1;x2,y2;...") into a list of [x, y].
+
+    Args:
+        points_str (str): CVAT points string
+
+    Returns:
+        list: List of [x, y] float pairs
+    """
+    points = []
+    for point_str in (points_str or '').split(';'):
+        if ',' in point_str:
+            x, y = point_str.split(',')
+            points.append([float(x), float(y)])
+    return points
+
+
+def _parse_shape(elem):
+    """Convert a CVAT shape element into a plain dict."""
+    shape = {
+        'type': elem.tag,
+        'label': elem.get('label'),
+        'attributes': {attr.get('name'): attr.text for attr in elem.findall('attribute')}
+    }
+    if elem.tag == 'box':
+        shape['box'] = tuple(float(elem.get(key, 0)) for key in ('xtl', 'ytl', 'xbr', 'ybr'))
+    else:
+        shape['points'] = parse_points(elem.get('points'))
+    return shape
+
+
+def _parse_float(value):
+    """Parse an optional numeric attribute, returning 0 when it is missing or invalid."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class CVATReader:
+    """Iterate over the images of a CVAT XML file one at a time."""
+
+    def __init__(self, xml_file, labels=None):
+        """
+        Initialize the reader.
+
+        Args:
+            xml_file (str): Path to CVAT XML file
+            labels (LabelRegistry, optional): Pre-seeded registry the labels of
+                the file are added to
+        """
+        self.xml_file = xml_file
+        # Filled from <meta> while iterating; CVAT writes it before any <image>
+        self.labels = labels if labels is not None else LabelRegistry()
+
+    def __iter__(self):
+        """
+        Yield one dict per <image> element.
+
+        Yields:
+            dict: {'id', 'name', 'width', 'height', 'shapes'} where each shape is
+                {'type', 'label', 'attributes'} plus 'box' (xtl, ytl, xbr, ybr)
+                for boxes or 'points' [[x, y], ...] for the other shape types
+        """
+        context = ET.iterparse(self.xml_file, events=('start', 'end'))
+        _, root = next(context)
+
+        for event, elem in context:
+            if event != 'end':
+                continue
+
+            if elem.tag == 'label':
+                name_elem = elem.find('name')
+                if name_elem is not None:
+                    self.labels.add(name_elem.text)
+            elif elem.tag == 'meta':
+                elem.clear()
+                root.clear()
+            elif elem.tag == 'image':
+                image_id = elem.get('id')
+                yield {
+                    'id': int(image_id) if image_id is not None else None,
+                    'name': elem.get('name'),
+                    'width': _parse_float(elem.get('width')),
+                    'height': _parse_float(elem.get('height')),
+                    'shapes': [_parse_shape(child) for child in elem if child.tag in SHAPE_TYPES]
+                }
+                # Drop the consumed image and its reference from the root
+                elem.clear()
+                root.clear()
+
+
+def iter_cvat_images(xml_file):
+    """
+    Iterate over the images of a CVAT XML file.
+
+    Args:
+        xml_file (str): Path to CVAT XML file
+
+    Yields:
+        dict: One image at a time, see CVATReader.__iter__
+    """
+    return iter(CVATReader(xml_file))
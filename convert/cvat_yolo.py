@@ -8,12 +8,94 @@ Usage:
 import os
 import sys
 import argparse
-import xml.etree.ElementTree as ET
 from pathlib import Path
 from PIL import Image
-import shutil
 
 from .utils import ensure_dir, clean_dir
+from .cvat_reader import CVATReader
+from .labels import load_labels
+from .materialize import IMAGE_MODES, ImageMaterializer
+
+
+def cvat_image_to_yolo(image, labels):
+    """
+    Convert one image yielded by CVATReader to YOLO annotations.
+    
+    Args:
+        image (dict): Image dict from CVATReader
+        labels (LabelRegistry): Class registry
+        
+    Returns:
+        tuple: (image_name, image_info) or None if the image is invalid
+    """
+    image_name = image['name']
+    if not image_name:
+        return None
+        
+    width = image['width']
+    height = image['height']
+    
+    if width <= 0 or height <= 0:
+        print(f"Warning: Invalid dimensions for image {image_name}")
+        return None
+        
+    image_info = {
+        'width': width,
+        'height': height,
+        'annotations': []
+    }
+    
+    # Get annotations for this image
+    for box in image['shapes']:
+        if box['type'] != 'box':
+            continue
+            
+        label = box['label']
+        label_id = labels.get(label)
+        if label_id is None:
+            print(f"Warning: Label {label} not in label list")
+            continue
+        
+        xtl, ytl, xbr, ybr = box['box']
+        
+        # Convert to YOLO format (normalized center, width, height)
+        x_center = (xtl + xbr) / (2 * width)
+        y_center = (ytl + ybr) / (2 * height)
+        box_width = (xbr - xtl) / width
+        box_height = (ybr - ytl) / height
+        
+        # Validate coordinates
+        if not (0 <= x_center <= 1 and 0 <= y_center <= 1 and 
+                0 <= box_width <= 1 and 0 <= box_height <= 1):
+            print(f"Warning: Invalid box coordinates for {image_name}, label {label}")
+            continue
+        
+        image_info['annotations'].append({
+            'label_id': label_id,
+            'x_center': x_center,
+            'y_center': y_center,
+            'width': box_width,
+            'height': box_height
+        })
+        
+    return image_name, image_info
+
+
+def iter_cvat_yolo(reader):
+    """
+    Stream YOLO annotations for every valid image of a CVAT file.
+    
+    Args:
+        reader (CVATReader): Reader over the CVAT XML file; its labels are
+            filled from the file header before the first image is yielded
+        
+    Yields:
+        tuple: (image_name, image_info)
+    """
+    for image in reader:
+        result = cvat_image_to_yolo(image, reader.labels)
+        if result is not None:
+            yield result
 
 
 def parse_cvat_xml(xml_file):
@@ -24,152 +106,97 @@ def parse_cvat_xml(xml_file):
         xml_file (str): Path to CVAT XML file
         
     Returns:
-        tuple: (image_info, class_list, annotations) or (None, None, None) if error
+        tuple: (image_info, class_registry, annotations) or (None, None, None) if error
     """
     try:
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-        
-        # Get all classes/labels
-        labels = []
-        for label in root.findall('.//label'):
-            name_elem = label.find('name')
-            if name_elem is not None:
-                labels.append(name_elem.text)
-                
-        if not labels:
+        reader = CVATReader(xml_file)
+        images = dict(iter_cvat_yolo(reader))
+        
+        if not reader.labels:
             print(f"No labels found in {xml_file}")
             return None, None, None
             
-        # Get images and annotations
-        images = {}
-        
-        for image_elem in root.findall('.//image'):
-            image_name = image_elem.get('name')
-            if not image_name:
-                continue
-                
-            width = float(image_elem.get('width', 0))
-            height = float(image_elem.get('height', 0))
-            
-            if width <= 0 or height <= 0:
-                print(f"Warning: Invalid dimensions for image {image_name}")
-                continue
-                
-            images[image_name] = {
-                'width': width,
-                'height': height,
-                'annotations': []
-            }
-            
-            # Get annotations for this image
-            for box in image_elem.findall('.//box'):
-                label = box.get('label')
-                if label not in labels:
-                    print(f"Warning: Label {label} not in label list")
-                    continue
-                    
-                label_id = labels.index(label)
-                
-                xtl = float(box.get('xtl', 0))
-                ytl = float(box.get('ytl', 0))
-                xbr = float(box.get('xbr', 0))
-                ybr = float(box.get('ybr', 0))
-                
-                # Convert to YOLO format (normalized center, width, height)
-                x_center = (xtl + xbr) / (2 * width)
-                y_center = (ytl + ybr) / (2 * height)
-                box_width = (xbr - xtl) / width
-                box_height = (ybr - ytl) / height
-                
-                # Validate coordinates
-                if not (0 <= x_center <= 1 and 0 <= y_center <= 1 and 
-                        0 <= box_width <= 1 and 0 <= box_height <= 1):
-                    print(f"Warning: Invalid box coordinates for {image_name}, label {label}")
-                    continue
-                
-                images[image_name]['annotations'].append({
-                    'label_id': label_id,
-                    'x_center': x_center,
-                    'y_center': y_center,
-                    'width': box_width,
-                    'height': box_height
-                })
-                
-        return images, labels, True
+        return images, reader.labels, True
         
     except Exception as e:
         print(f"Error parsing CVAT XML file {xml_file}: {str(e)}")
         return None, None, None
 
 
-def write_yolo_files(images, labels, input_dir, output_dir):
+def write_yolo_files(images, labels, input_dir, output_dir, image_mode="copy"):
     """
     Write YOLO annotation files and copy images.
     
     Args:
-        images (dict): Image information and annotations
-        labels (list): List of class names
+        images (dict or iterable): Image information and annotations, either as a
+            dict or as a stream of (image_name, image_info) pairs
+        labels (iterable): Class names in id order, e.g. a LabelRegistry; classes.txt
+            is written after the images, so it may still be filled while a stream is consumed
         input_dir (str): Input directory containing images
         output_dir (str): Output directory for YOLO format
+        image_mode (str, optional): How images are placed in output_dir. Defaults to "copy".
         
     Returns:
         tuple: (processed_count, total_count)
     """
+    total_count = 0
     try:
-        # Write classes.txt
-        with open(os.path.join(output_dir, 'classes.txt'), 'w') as f:
-            f.write('\n'.join(labels))
-            
+        items = images.items() if isinstance(images, dict) else images
         processed_count = 0
-        for image_name, image_info in images.items():
-            # Find image file
-            image_path = None
-            for ext in ['.jpg', '.jpeg', '.png', '.bmp']:
-                test_path = os.path.join(input_dir, image_name)
-                if os.path.exists(test_path):
-                    image_path = test_path
-                    break
+        with ImageMaterializer(image_mode) as materializer:
+            for image_name, image_info in items:
+                total_count += 1
+                # Find image file
+                image_path = None
+                for ext in ['.jpg', '.jpeg', '.png', '.bmp']:
+                    test_path = os.path.join(input_dir, image_name)
+                    if os.path.exists(test_path):
+                        image_path = test_path
+                        break
                     
-            if not image_path:
-                print(f"Warning: Image {image_name} not found in {input_dir}")
-                continue
+                if not image_path:
+                    print(f"Warning: Image {image_name} not found in {input_dir}")
+                    continue
                 
-            # Copy image to output directory
-            output_image_path = os.path.join(output_dir, image_name)
-            try:
-                shutil.copy2(image_path, output_image_path)
-            except Exception as e:
-                print(f"Error copying image {image_path}: {str(e)}")
-                continue
+                # Copy image to output directory
+                materializer.add(image_path, os.path.join(output_dir, image_name))
                 
-            # Write YOLO annotation
-            base_name = os.path.splitext(image_name)[0]
-            txt_path = os.path.join(output_dir, f"{base_name}.txt")
+                # Write YOLO annotation
+                base_name = os.path.splitext(image_name)[0]
+                txt_path = os.path.join(output_dir, f"{base_name}.txt")
             
-            with open(txt_path, 'w') as f:
-                for ann in image_info['annotations']:
-                    # YOLO format: class_id center_x center_y width height
-                    f.write(f"{ann['label_id']} {ann['x_center']:.6f} "
-                           f"{ann['y_center']:.6f} {ann['width']:.6f} "
-                           f"{ann['height']:.6f}\n")
+                with open(txt_path, 'w') as f:
+                    for ann in image_info['annotations']:
+                        # YOLO format: class_id center_x center_y width height
+                        f.write(f"{ann['label_id']} {ann['x_center']:.6f} "
+                               f"{ann['y_center']:.6f} {ann['width']:.6f} "
+                               f"{ann['height']:.6f}\n")
                     
-            processed_count += 1
+                processed_count += 1
             
-        return processed_count, len(images)
+        processed_count -= len(materializer.failed)
+            
+        # Write classes.txt
+        with open(os.path.join(output_dir, 'classes.txt'), 'w') as f:
+            f.write('\n'.join(labels))
+            
+        return processed_count, total_count
         
     except Exception as e:
         print(f"Error writing YOLO files: {str(e)}")
-        return 0, len(images)
+        return 0, total_count
 
 
-def cvat_to_yolo(input_dir, output_dir="dst"):
+def cvat_to_yolo(input_dir, output_dir="dst", image_mode="copy", classes_file=None):
     """
     Convert CVAT format annotations to YOLO format.
     
     Args:
         input_dir (str): Directory containing CVAT XML file and images
         output_dir (str, optional): Output directory for YOLO files. Defaults to "dst".
+        image_mode (str, optional): copy, hardlink, symlink, reflink or none. Defaults to "copy".
+        classes_file (str, optional): classes.txt, obj.names or labelmap.txt file
+            fixing the order of the first class ids
         
     Returns:
         bool: True if successful, False otherwise
@@ -193,18 +220,17 @@ def cvat_to_yolo(input_dir, output_dir="dst"):
         xml_file = os.path.join(input_dir, xml_files[0])
         print(f"Using CVAT file: {xml_file}")
         
-        # Parse CVAT XML
-        images, labels, success = parse_cvat_xml(xml_file)
+        # Stream CVAT XML images straight into YOLO files
+        reader = CVATReader(xml_file, load_labels(classes_file))
+        processed_count, total_count = write_yolo_files(iter_cvat_yolo(reader), reader.labels,
+                                                        input_dir, output_dir, image_mode)
         
-        if not success or not images or not labels:
+        if not total_count or not reader.labels:
             print(f"Failed to parse CVAT file {xml_file}")
             return False
             
-        print(f"Found {len(images)} images and {len(labels)} classes")
-        print(f"Classes: {', '.join(labels)}")
-        
-        # Write YOLO files
-        processed_count, total_count = write_yolo_files(images, labels, input_dir, output_dir)
+        print(f"Found {total_count} images and {len(reader.labels)} classes")
+        print(f"Classes: {', '.join(reader.labels)}")
         
         print(f"Conversion complete. {processed_count}/{total_count} images converted to YOLO format.")
         print(f"Results saved to {output_dir}")
@@ -220,9 +246,12 @@ def parse_args():
     parser = argparse.ArgumentParser(description="Convert CVAT format annotations to YOLO format")
     parser.add_argument('--input_dir', required=True, help="Directory containing CVAT XML file and images")
     parser.add_argument('--output_dir', default="dst", help="Output directory for YOLO files")
+    parser.add_argument('--image_mode', '--image-mode', choices=IMAGE_MODES, default="copy",
+                        help="How images are placed in the output directory")
+    parser.add_argument('--classes_file', help="classes.txt, obj.names or labelmap.txt fixing the class id order")
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    cvat_to_yolo(args.input_dir, args.output_dir)
+    cvat_to_yolo(args.input_dir, args.output_dir, args.image_mode, args.classes_file)
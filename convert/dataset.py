@@ -0,0 +1,682 @@
+"""
+Columnar intermediate annotation model shared by format readers and writers.
+
+Annotations are kept in flat NumPy arrays instead of per-shape dicts, so every
+format only needs a reader that fills an AnnotationDataset and a writer that
+consumes one, and coordinate transforms run once per dataset:
+
+    - boxes:         (N, 4) float64 array of [xmin, ymin, xmax, ymax]
+    - polygons:      (M, 2) float64 vertex buffer plus (N + 1,) offsets
+    - category_ids:  (N,) int64 array of 0-based category indices
+    - image_ids:     (N,) int64 array of 0-based image indices
+
+Usage:
+    python -m convert.dataset --input /path/to/labelme --input_format labelme \
+        --output /path/to/coco.json --output_format coco
+"""
+
+import os
+import argparse
+import glob
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+import numpy as np
+
+from . import jsonio
+from .utils import ensure_dir, get_image_dimensions, get_image_dimensions_batch
+from .labels import LabelRegistry, load_labels, read_class_names
+from .labelme_reader import load_labelme
+
+
+def xyxy_to_xywh(boxes):
+    """Convert (N, 4) [xmin, ymin, xmax, ymax] boxes to [x, y, width, height]."""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    return np.concatenate([boxes[:, :2], boxes[:, 2:] - boxes[:, :2]], axis=1)
+
+
+def xywh_to_xyxy(boxes):
+    """Convert (N, 4) [x, y, width, height] boxes to [xmin, ymin, xmax, ymax]."""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    return np.concatenate([boxes[:, :2], boxes[:, :2] + boxes[:, 2:]], axis=1)
+
+
+def normalize_boxes(boxes, widths, heights):
+    """
+    Convert absolute xyxy boxes to normalized YOLO [x_center, y_center, width, height].
+
+    Args:
+        boxes (np.ndarray): (N, 4) boxes in absolute [xmin, ymin, xmax, ymax]
+        widths (np.ndarray): (N,) width of the image each box belongs to
+        heights (np.ndarray): (N,) height of the image each box belongs to
+
+    Returns:
+        np.ndarray: (N, 4) normalized boxes
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    scale = np.stack([widths, heights, widths, heights], axis=1).astype(np.float64)
+    centers = (boxes[:, :2] + boxes[:, 2:]) / 2.0
+    sizes = boxes[:, 2:] - boxes[:, :2]
+    return np.concatenate([centers, sizes], axis=1) / scale
+
+
+def denormalize_boxes(boxes, widths, heights):
+    """
+    Convert normalized YOLO [x_center, y_center, width, height] boxes to absolute xyxy.
+
+    Args:
+        boxes (np.ndarray): (N, 4) normalized boxes
+        widths (np.ndarray): (N,) width of the image each box belongs to
+        heights (np.ndarray): (N,) height of the image each box belongs to
+
+    Returns:
+        np.ndarray: (N, 4) boxes in absolute [xmin, ymin, xmax, ymax]
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    scale = np.stack([widths, heights, widths, heights], axis=1).astype(np.float64)
+    half = boxes[:, 2:] / 2.0
+    return np.concatenate([boxes[:, :2] - half, boxes[:, :2] + half], axis=1) * scale
+
+
+def polygon_bounds(vertices, offsets):
+    """
+    Compute the bounding box of every polygon in a flat vertex buffer.
+
+    Args:
+        vertices (np.ndarray): (M, 2) vertex buffer
+        offsets (np.ndarray): (N + 1,) start offsets of each polygon in the buffer
+
+    Returns:
+        np.ndarray: (N, 4) boxes in [xmin, ymin, xmax, ymax]; NaN for empty polygons
+    """
+    counts = np.diff(offsets)
+    bounds = np.full((len(counts), 4), np.nan)
+    nonempty = counts > 0
+    if not nonempty.any():
+        return bounds
+    # reduceat misbehaves on empty segments, so only reduce the non-empty ones
+    starts = offsets[:-1][nonempty]
+    bounds[nonempty, :2] = np.minimum.reduceat(vertices, starts, axis=0)
+    bounds[nonempty, 2:] = np.maximum.reduceat(vertices, starts, axis=0)
+    return bounds
+
+
+def polygon_areas(vertices, offsets):
+    """
+    Compute the area of every polygon in a flat vertex buffer (shoelace formula).
+
+    Args:
+        vertices (np.ndarray): (M, 2) vertex buffer
+        offsets (np.ndarray): (N + 1,) start offsets of each polygon in the buffer
+
+    Returns:
+        np.ndarray: (N,) polygon areas; 0 for empty polygons
+    """
+    counts = np.diff(offsets)
+    areas = np.zeros(len(counts))
+    nonempty = counts > 0
+    if not nonempty.any():
+        return areas
+    # Index of the next vertex of each vertex, wrapping around within its polygon
+    owner = np.repeat(np.arange(len(counts)), counts)
+    nxt = np.arange(len(vertices)) + 1
+    ends = offsets[1:][nonempty]
+    nxt[ends - 1] = offsets[:-1][nonempty]
+    x, y = vertices[:, 0], vertices[:, 1]
+    cross = x * y[nxt] - x[nxt] * y
+    areas[:] = 0.5 * np.abs(np.bincount(owner, weights=cross, minlength=len(counts)))
+    return areas
+
+
+class AnnotationDataset:
+    """Columnar, NumPy-backed collection of images, categories and annotations."""
+
+    def __init__(self, categories=None):
+        """
+        Initialize an empty dataset.
+
+        Args:
+            categories (iterable, optional): Initial category names, in id order
+        """
+        self.labels = LabelRegistry(categories)
+
+        # Image columns
+        self.file_names = []
+        self._widths = []
+        self._heights = []
+
+        # Annotation columns, appended chunk-wise and concatenated lazily
+        self._image_ids = []
+        self._category_ids = []
+        self._boxes = []
+        self._poly_chunks = []
+        self._poly_counts = []
+        self._frozen = None
+
+    def __len__(self):
+        """Return the number of annotations."""
+        return len(self._image_ids)
+
+    @property
+    def num_images(self):
+        """Return the number of images."""
+        return len(self.file_names)
+
+    @property
+    def categories(self):
+        """Return the category names, in id order."""
+        return self.labels.names
+
+    def category_id(self, name):
+        """Return the 0-based id of a category, registering it if it is new."""
+        return self.labels.add(name)
+
+    def add_image(self, file_name, width, height):
+        """
+        Add an image to the dataset.
+
+        Args:
+            file_name (str): Image file name
+            width (int): Image width in pixels
+            height (int): Image height in pixels
+
+        Returns:
+            int: 0-based index of the new image
+        """
+        self.file_names.append(file_name)
+        self._widths.append(width)
+        self._heights.append(height)
+        return len(self.file_names) - 1
+
+    def add_annotation(self, image_id, label, box=None, polygon=None):
+        """
+        Add an annotation to an image.
+
+        Either a box or a polygon must be given. When only a polygon is given,
+        its bounding box is filled in by a single vectorized pass on freeze().
+
+        Args:
+            image_id (int): Index returned by add_image()
+            label (str): Category name
+            box (sequence, optional): [xmin, ymin, xmax, ymax] in pixels
+            polygon (sequence, optional): [[x, y], ...] vertices in pixels
+        """
+        if box is None and polygon is None:
+            raise ValueError("An annotation needs a box or a polygon")
+        self._image_ids.append(image_id)
+        self._category_ids.append(self.category_id(label))
+        self._boxes.append(box if box is not None else (np.nan,) * 4)
+        if polygon is not None and len(polygon):
+            points = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+            self._poly_chunks.append(points)
+            self._poly_counts.append(len(points))
+        else:
+            self._poly_counts.append(0)
+        self._frozen = None
+
+    def freeze(self):
+        """Concatenate the appended columns into arrays; cached until the next add."""
+        if self._frozen is not None:
+            return self._frozen
+
+        offsets = np.zeros(len(self._poly_counts) + 1, dtype=np.int64)
+        np.cumsum(self._poly_counts, out=offsets[1:])
+        if self._poly_chunks:
+            vertices = np.concatenate(self._poly_chunks)
+        else:
+            vertices = np.zeros((0, 2))
+
+        boxes = np.asarray(self._boxes, dtype=np.float64).reshape(-1, 4)
+        # Order the corners of explicit boxes, derive the rest from polygons
+        boxes = np.concatenate([np.minimum(boxes[:, :2], boxes[:, 2:]),
+                                np.maximum(boxes[:, :2], boxes[:, 2:])], axis=1)
+        missing = np.isnan(boxes).any(axis=1)
+        if missing.any():
+            boxes[missing] = polygon_bounds(vertices, offsets)[missing]
+
+        self._frozen = {
+            "widths": np.asarray(self._widths, dtype=np.float64),
+            "heights": np.asarray(self._heights, dtype=np.float64),
+            "image_ids": np.asarray(self._image_ids, dtype=np.int64),
+            "category_ids": np.asarray(self._category_ids, dtype=np.int64),
+            "boxes": boxes,
+            "vertices": vertices,
+            "offsets": offsets,
+        }
+        return self._frozen
+
+    @property
+    def widths(self):
+        """(num_images,) array of image widths."""
+        return self.freeze()["widths"]
+
+    @property
+    def heights(self):
+        """(num_images,) array of image heights."""
+        return self.freeze()["heights"]
+
+    @property
+    def image_ids(self):
+        """(N,) array mapping each annotation to its image index."""
+        return self.freeze()["image_ids"]
+
+    @property
+    def category_ids(self):
+        """(N,) array of 0-based category ids."""
+        return self.freeze()["category_ids"]
+
+    @property
+    def boxes(self):
+        """(N, 4) array of absolute [xmin, ymin, xmax, ymax] boxes."""
+        return self.freeze()["boxes"]
+
+    @property
+    def vertices(self):
+        """(M, 2) polygon vertex buffer."""
+        return self.freeze()["vertices"]
+
+    @property
+    def offsets(self):
+        """(N + 1,) polygon offsets into the vertex buffer."""
+        return self.freeze()["offsets"]
+
+    def polygon(self, index):
+        """Return the (K, 2) vertices of one annotation's polygon (K may be 0)."""
+        offsets = self.offsets
+        return self.vertices[offsets[index]:offsets[index + 1]]
+
+    def normalized_boxes(self):
+        """Return all boxes as normalized YOLO [x_center, y_center, width, height]."""
+        image_ids = self.image_ids
+        return normalize_boxes(self.boxes, self.widths[image_ids], self.heights[image_ids])
+
+    def areas(self):
+        """Return polygon areas, falling back to box areas for box-only annotations."""
+        areas = polygon_areas(self.vertices, self.offsets)
+        box_only = np.diff(self.offsets) == 0
+        sizes = self.boxes[box_only, 2:] - self.boxes[box_only, :2]
+        areas[box_only] = sizes[:, 0] * sizes[:, 1]
+        return areas
+
+    def annotations_by_image(self):
+        """
+        Group annotation indices by image.
+
+        Returns:
+            list: One index array per image, in image order
+        """
+        if self.num_images == 0:
+            return []
+        image_ids = self.image_ids
+        order = np.argsort(image_ids, kind="stable")
+        splits = np.searchsorted(image_ids[order], np.arange(1, self.num_images))
+        return np.split(order, splits)
+
+
+def read_labelme(input_dir, categories=None):
+    """
+    Read a directory of LabelMe JSON files into an AnnotationDataset.
+
+    Args:
+        input_dir (str): Directory containing LabelMe JSON files
+        categories (iterable, optional): Category names that take the first ids
+
+    Returns:
+        AnnotationDataset: The loaded dataset
+    """
+    dataset = AnnotationDataset(categories)
+    for json_file in sorted(glob.glob(os.path.join(input_dir, "*.json"))):
+        try:
+            data = load_labelme(json_file)
+
+            image_path = os.path.basename(data.get("imagePath") or "")
+            width = data.get("imageWidth")
+            height = data.get("imageHeight")
+            if not width or not height:
+                width, height = get_image_dimensions(os.path.join(input_dir, image_path))
+            image_id = dataset.add_image(image_path, width, height)
+
+            for shape in data.get("shapes", []):
+                label = shape.get("label")
+                points = shape.get("points") or []
+                shape_type = shape.get("shape_type", "polygon")
+                if not label or not points:
+                    continue
+                if shape_type == "rectangle" and len(points) == 2:
+                    (x1, y1), (x2, y2) = points
+                    dataset.add_annotation(image_id, label, box=(x1, y1, x2, y2))
+                elif shape_type == "polygon":
+                    dataset.add_annotation(image_id, label, polygon=points)
+        except Exception as e:
+            print(f"Error reading LabelMe file {json_file}: {str(e)}")
+    return dataset
+
+
+def read_voc(input_dir, categories=None):
+    """
+    Read a directory of Pascal VOC XML files into an AnnotationDataset.
+
+    Args:
+        input_dir (str): Directory containing VOC XML files
+        categories (iterable, optional): Category names that take the first ids
+
+    Returns:
+        AnnotationDataset: The loaded dataset
+    """
+    dataset = AnnotationDataset(categories)
+    for xml_file in sorted(glob.glob(os.path.join(input_dir, "*.xml"))):
+        try:
+            root = ET.parse(xml_file).getroot()
+            size_elem = root.find("size")
+            image_id = dataset.add_image(root.find("filename").text,
+                                         int(size_elem.find("width").text),
+                                         int(size_elem.find("height").text))
+            for obj in root.findall("object"):
+                bbox_elem = obj.find("bndbox")
+                if bbox_elem is None:
+                    continue
+                box = [float(bbox_elem.find(tag).text) for tag in ("xmin", "ymin", "xmax", "ymax")]
+                dataset.add_annotation(image_id, obj.find("name").text, box=box)
+        except Exception as e:
+            print(f"Error reading VOC file {xml_file}: {str(e)}")
+    return dataset
+
+
+def read_yolo(input_dir, categories=None):
+    """
+    Read a YOLO directory (images, .txt labels and classes.txt) into an AnnotationDataset.
+
+    Args:
+        input_dir (str): Directory containing YOLO annotations and images
+        categories (iterable, optional): Category names that take the first ids
+
+    Returns:
+        AnnotationDataset: The loaded dataset
+    """
+    classes_file = os.path.join(input_dir, "classes.txt")
+    class_names = []
+    if os.path.exists(classes_file):
+        class_names = read_class_names(classes_file)
+    dataset = AnnotationDataset(categories)
+    for name in class_names:
+        dataset.category_id(name)
+
+    # Pair label files with images, then probe all image sizes in one batch
+    pairs = []
+    for txt_file in sorted(glob.glob(os.path.join(input_dir, "*.txt"))):
+        if os.path.basename(txt_file) == "classes.txt":
+            continue
+        base_name = os.path.splitext(txt_file)[0]
+        image_path = next((base_name + ext for ext in [".jpg", ".jpeg", ".png", ".bmp"]
+                           if os.path.exists(base_name + ext)), None)
+        if not image_path:
+            print(f"Warning: No image found for {txt_file}. Skipping.")
+            continue
+        pairs.append((txt_file, image_path))
+    sizes = get_image_dimensions_batch([image_path for _, image_path in pairs])
+
+    # Collect normalized rows first so they can be denormalized in one pass
+    rows, row_images, row_labels = [], [], []
+    for (txt_file, image_path), size in zip(pairs, sizes):
+        if size is None:
+            continue
+        try:
+            width, height = size
+            image_id = dataset.add_image(os.path.basename(image_path), width, height)
+            data = np.loadtxt(txt_file, ndmin=2)
+            if data.size == 0:
+                continue
+            rows.append(data[:, 1:5])
+            row_images.append(np.full(len(data), image_id))
+            row_labels.append(data[:, 0].astype(np.int64))
+        except Exception as e:
+            print(f"Error reading YOLO file {txt_file}: {str(e)}")
+
+    if not rows:
+        return dataset
+    image_ids = np.concatenate(row_images)
+    class_ids = np.concatenate(row_labels)
+    widths = np.asarray(dataset._widths, dtype=np.float64)[image_ids]
+    heights = np.asarray(dataset._heights, dtype=np.float64)[image_ids]
+    boxes = denormalize_boxes(np.concatenate(rows), widths, heights)
+    for image_id, class_id, box in zip(image_ids.tolist(), class_ids.tolist(), boxes.tolist()):
+        label = class_names[class_id] if 0 <= class_id < len(class_names) else f"class_{class_id}"
+        dataset.add_annotation(image_id, label, box=box)
+    return dataset
+
+
+def read_coco(input_file, categories=None):
+    """
+    Read a COCO JSON file into an AnnotationDataset.
+
+    Args:
+        input_file (str): COCO JSON file
+        categories (iterable, optional): Category names that take the first ids
+
+    Returns:
+        AnnotationDataset: The loaded dataset
+    """
+    with open(input_file, "rb") as f:
+        coco = jsonio.load(f)
+
+    coco_categories = {c["id"]: c["name"] for c in coco.get("categories", [])}
+    dataset = AnnotationDataset(categories)
+    for category_id in sorted(coco_categories):
+        dataset.category_id(coco_categories[category_id])
+    image_index = {}
+    for image in coco.get("images", []):
+        image_index[image["id"]] = dataset.add_image(image["file_name"], image["width"], image["height"])
+
+    for annotation in coco.get("annotations", []):
+        image_id = image_index.get(annotation["image_id"])
+        if image_id is None:
+            continue
+        label = coco_categories.get(annotation["category_id"], str(annotation["category_id"]))
+        segmentation = annotation.get("segmentation")
+        polygon = segmentation[0] if isinstance(segmentation, list) and segmentation else None
+        box = xywh_to_xyxy(annotation["bbox"])[0] if annotation.get("bbox") else None
+        dataset.add_annotation(image_id, label, box=box, polygon=polygon)
+    return dataset
+
+
+def write_coco(dataset, output_file, compact=False):
+    """
+    Write an AnnotationDataset as a COCO JSON file.
+
+    Args:
+        dataset (AnnotationDataset): The dataset to write
+        output_file (str): Output COCO JSON file
+        compact (bool, optional): Write without whitespace. Defaults to False.
+
+    Returns:
+        bool: True if successful
+    """
+    widths, heights = dataset.widths, dataset.heights
+    boxes = xyxy_to_xywh(dataset.boxes).tolist()
+    areas = dataset.areas().tolist()
+    image_ids = (dataset.image_ids + 1).tolist()
+    category_ids = (dataset.category_ids + 1).tolist()
+    offsets = dataset.offsets
+    vertices = dataset.vertices
+
+    annotations = []
+    for i in range(len(dataset)):
+        if offsets[i + 1] > offsets[i]:
+            segmentation = [vertices[offsets[i]:offsets[i + 1]].ravel().tolist()]
+        else:
+            x, y, w, h = boxes[i]
+            segmentation = [[x, y, x + w, y, x + w, y + h, x, y + h]]
+        annotations.append({
+            "id": i + 1,
+            "image_id": image_ids[i],
+            "category_id": category_ids[i],
+            "segmentation": segmentation,
+            "area": areas[i],
+            "bbox": boxes[i],
+            "iscrowd": 0
+        })
+
+    coco = {
+        "info": {
+            "description": "Converted by 2Label",
+            "url": "",
+            "version": "1.0",
+            "year": datetime.now().year,
+            "contributor": "2Label",
+            "date_created": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        },
+        "licenses": [{"id": 1, "name": "Unknown", "url": ""}],
+        "images": [
+            {"id": i + 1, "file_name": name, "width": int(w), "height": int(h), "license": 1}
+            for i, (name, w, h) in enumerate(zip(dataset.file_names, widths, heights))
+        ],
+        "annotations": annotations,
+        "categories": [
+            {"id": i + 1, "name": name, "supercategory": "object"}
+            for i, name in enumerate(dataset.categories)
+        ]
+    }
+
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        ensure_dir(output_dir)
+    with open(output_file, "w", encoding="utf-8") as f:
+        jsonio.dump(coco, f, compact)
+    return True
+
+
+def write_yolo(dataset, output_dir):
+    """
+    Write an AnnotationDataset as YOLO .txt files plus classes.txt.
+
+    Args:
+        dataset (AnnotationDataset): The dataset to write
+        output_dir (str): Output directory
+
+    Returns:
+        bool: True if successful
+    """
+    ensure_dir(output_dir)
+    with open(os.path.join(output_dir, "classes.txt"), "w") as f:
+        f.write("\n".join(dataset.categories))
+
+    normalized = dataset.normalized_boxes()
+    category_ids = dataset.category_ids
+    for image_id, indices in enumerate(dataset.annotations_by_image()):
+        base_name = os.path.splitext(dataset.file_names[image_id])[0]
+        with open(os.path.join(output_dir, f"{base_name}.txt"), "w") as f:
+            for class_id, box in zip(category_ids[indices].tolist(), normalized[indices].tolist()):
+                f.write(f"{class_id} {box[0]:.6f} {box[1]:.6f} {box[2]:.6f} {box[3]:.6f}\n")
+    return True
+
+
+def write_voc(dataset, output_dir):
+    """
+    Write an AnnotationDataset as Pascal VOC XML files.
+
+    Args:
+        dataset (AnnotationDataset): The dataset to write
+        output_dir (str): Output directory
+
+    Returns:
+        bool: True if successful
+    """
+    ensure_dir(output_dir)
+    boxes = np.rint(dataset.boxes).astype(np.int64)
+    category_ids = dataset.category_ids
+    widths, heights = dataset.widths, dataset.heights
+    for image_id, indices in enumerate(dataset.annotations_by_image()):
+        file_name = dataset.file_names[image_id]
+        root = ET.Element("annotation")
+        ET.SubElement(root, "filename").text = file_name
+        size = ET.SubElement(root, "size")
+        ET.SubElement(size, "width").text = str(int(widths[image_id]))
+        ET.SubElement(size, "height").text = str(int(heights[image_id]))
+        ET.SubElement(size, "depth").text = "3"
+        ET.SubElement(root, "segmented").text = "0"
+        for class_id, box in zip(category_ids[indices].tolist(), boxes[indices].tolist()):
+            obj = ET.SubElement(root, "object")
+            ET.SubElement(obj, "name").text = dataset.categories[class_id]
+            ET.SubElement(obj, "pose").text = "Unspecified"
+            ET.SubElement(obj, "truncated").text = "0"
+            ET.SubElement(obj, "difficult").text = "0"
+            bndbox = ET.SubElement(obj, "bndbox")
+            for tag, value in zip(("xmin", "ymin", "xmax", "ymax"), box):
+                ET.SubElement(bndbox, tag).text = str(value)
+        base_name = os.path.splitext(file_name)[0]
+        ET.ElementTree(root).write(os.path.join(output_dir, f"{base_name}.xml"))
+    return True
+
+
+READERS = {
+    "labelme": read_labelme,
+    "voc": read_voc,
+    "yolo": read_yolo,
+    "coco": read_coco,
+}
+
+WRITERS = {
+    "coco": write_coco,
+    "yolo": write_yolo,
+    "voc": write_voc,
+}
+
+# Writers producing JSON, which accept a compact flag
+JSON_WRITERS = ("coco",)
+
+
+def convert_dataset(input_path, input_format, output_path, output_format, classes_file=None, compact=False):
+    """
+    Convert between any supported reader and writer through an AnnotationDataset.
+
+    Args:
+        input_path (str): Input directory (or file, for COCO)
+        input_format (str): One of READERS
+        output_path (str): Output directory (or file, for COCO)
+        output_format (str): One of WRITERS
+        classes_file (str, optional): classes.txt, obj.names or labelmap.txt file
+            fixing the order of the first category ids
+        compact (bool, optional): Write JSON outputs without whitespace. Defaults to False.
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        if input_format not in READERS:
+            print(f"Unsupported input format: {input_format}")
+            return False
+        if output_format not in WRITERS:
+            print(f"Unsupported output format: {output_format}")
+            return False
+
+        print(f"Reading {input_format} annotations from {input_path}...")
+        dataset = READERS[input_format](input_path, load_labels(classes_file))
+        print(f"  - Images: {dataset.num_images}")
+        print(f"  - Categories: {len(dataset.categories)}")
+        print(f"  - Annotations: {len(dataset)}")
+
+        options = {"compact": compact} if output_format in JSON_WRITERS else {}
+        WRITERS[output_format](dataset, output_path, **options)
+        print(f"Conversion complete. Results saved to {output_path}")
+        return True
+
+    except Exception as e:
+        print(f"Error during conversion: {str(e)}")
+        return False
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Convert annotations through the columnar dataset model")
+    parser.add_argument('--input', required=True, help="Input directory (or COCO JSON file)")
+    parser.add_argument('--input_format', required=True, choices=sorted(READERS), help="Input format")
+    parser.add_argument('--output', required=True, help="Output directory (or COCO JSON file)")
+    parser.add_argument('--output_format', required=True, choices=sorted(WRITERS), help="Output format")
+    parser.add_argument('--classes_file', help="classes.txt, obj.names or labelmap.txt fixing the category id order")
+    parser.add_argument('--compact', action='store_true', help="Write JSON outputs without indentation")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    convert_dataset(args.input, args.input_format, args.output, args.output_format, args.classes_file, args.compact)
@@ -0,0 +1,108 @@
+"""
+Parse-once handles for source files.
+
+A SourceDocument wraps one input file and caches every decoded form of it
+(raw bytes, JSON data, LabelMe data, XML root, image size) the first time a converter stage
+asks for it. Stages pass the handle along instead of a path, so a file is read
+and parsed at most once per conversion no matter how many stages look at it.
+"""
+
+import io
+import base64
+import xml.etree.ElementTree as ET
+
+from . import jsonio
+from .labelme_reader import load_labelme
+from .utils import get_image_dimensions, get_image_dimensions_from_bytes
+
+
+class SourceDocument:
+    """Lazily read and decoded view of one source file."""
+
+    def __init__(self, path):
+        """
+        Initialize the handle. Nothing is read until a property is accessed.
+
+        Args:
+            path (str): Path to the source file
+        """
+        self.path = path
+        self._bytes = None
+        self._json = None
+        self._labelme = None
+        self._root = None
+        self._image_size = None
+
+    def __repr__(self):
+        return f"SourceDocument({self.path!r})"
+
+    @property
+    def bytes(self):
+        """bytes: Raw file contents."""
+        if self._bytes is None:
+            with open(self.path, "rb") as f:
+                self._bytes = f.read()
+        return self._bytes
+
+    @property
+    def json(self):
+        """Parsed JSON data."""
+        if self._json is None:
+            if self._bytes is not None:
+                self._json = jsonio.loads(self._bytes)
+            else:
+                with open(self.path, "rb") as f:
+                    self._json = jsonio.load(f)
+        return self._json
+
+    @property
+    def labelme(self):
+        """dict: LabelMe data parsed without its embedded imageData."""
+        if self._labelme is None:
+            if self._json is not None:
+                self._labelme = self._json
+            else:
+                self._labelme = load_labelme(self.path)
+        return self._labelme
+
+    @property
+    def xml(self):
+        """xml.etree.ElementTree.Element: Root element of the parsed XML."""
+        if self._root is None:
+            source = io.BytesIO(self._bytes) if self._bytes is not None else self.path
+            self._root = ET.parse(source).getroot()
+        return self._root
+
+    @property
+    def image_size(self):
+        """tuple: (width, height) of the image, probed from the bytes already read if any."""
+        if self._image_size is None:
+            if self._bytes is not None:
+                self._image_size = get_image_dimensions_from_bytes(self._bytes)
+            else:
+                self._image_size = get_image_dimensions(self.path)
+        return self._image_size
+
+    def base64(self):
+        """
+        Encode the file contents as base64.
+
+        Returns:
+            str: Base64 encoded contents
+        """
+        return base64.b64encode(self.bytes).decode("utf-8")
+
+
+def as_document(source):
+    """
+    Wrap a path in a SourceDocument, passing existing handles through.
+
+    Args:
+        source (str or SourceDocument): File path or handle
+
+    Returns:
+        SourceDocument: Handle for the file
+    """
+    if isinstance(source, SourceDocument):
+        return source
+    return SourceDocument(source)
@@ -0,0 +1,168 @@
+"""
+JSON backend used by every reader and writer in convert/.
+
+The fastest installed library is picked on first use, so importing this
+module stays cheap for the CLI:
+
+    orjson   - fastest; optional (`pip install orjson`)
+    ujson    - optional (`pip install ujson`)
+    json     - standard library fallback
+
+Output is either pretty (indent=2, the historical 2Label layout) or compact
+(no whitespace at all), which makes large COCO files 30-40% smaller and
+faster to write. Every backend escapes non-ASCII characters like the
+standard library does by default, so the output is plain ASCII whichever
+backend is installed. It is not byte-identical across backends, though:
+
+    - floats with an exponent are formatted differently, e.g. orjson writes
+      1e-7 and 1e20 where json writes 1e-07 and 1e+20; the values are equal
+    - orjson writes NaN and Infinity, which are not valid JSON, as null,
+      where json writes NaN and Infinity
+"""
+
+import re
+import json
+
+BACKENDS = ('orjson', 'ujson', 'json')
+
+
+def _import_backend(name):
+    """Import a backend module by name, returning None if it is not installed."""
+    if name == 'json':
+        return json
+    try:
+        if name == 'orjson':
+            import orjson
+            return orjson
+        if name == 'ujson':
+            import ujson
+            return ujson
+    except ImportError:
+        return None
+    raise ValueError(f"Unknown JSON backend '{name}'. Use one of {', '.join(BACKENDS)}.")
+
+
+def available_backends():
+    """
+    List the installed JSON backends.
+
+    Returns:
+        list: Backend names, fastest first
+    """
+    return [name for name in BACKENDS if _import_backend(name) is not None]
+
+
+_backend = None
+BACKEND = None
+
+
+def set_backend(name=None):
+    """
+    Select the JSON backend.
+
+    Args:
+        name (str, optional): One of BACKENDS. Defaults to the fastest installed one.
+
+    Returns:
+        str: Name of the selected backend
+    """
+    global _backend, BACKEND
+    if name is None:
+        name = available_backends()[0]
+    module = _import_backend(name)
+    if module is None:
+        raise ValueError(f"JSON backend '{name}' is not installed")
+    _backend, BACKEND = module, name
+    return name
+
+
+def _get_backend():
+    """Return the selected backend module, selecting the fastest one on first use."""
+    if _backend is None:
+        set_backend()
+    return _backend
+
+
+def _default(obj):
+    """Serialize numpy scalars and arrays, which converters may leave in coordinates."""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+_NON_ASCII = re.compile(r'[^\x00-\x7f]')
+
+
+def _escape_char(match):
+    """Escape one non-ASCII character as json.dumps does, with a surrogate pair beyond the BMP."""
+    code = ord(match.group())
+    if code < 0x10000:
+        return f"\\u{code:04x}"
+    code -= 0x10000
+    return f"\\u{0xd800 + (code >> 10):04x}\\u{0xdc00 + (code & 0x3ff):04x}"
+
+
+def dumps(data, compact=False):
+    """
+    Serialize data to a JSON string.
+
+    Args:
+        data: JSON-serializable data
+        compact (bool, optional): Leave out all whitespace instead of indenting
+            with 2 spaces. Defaults to False.
+
+    Returns:
+        str: JSON text, ASCII only
+    """
+    backend = _get_backend()
+    if BACKEND == 'orjson':
+        option = (backend.OPT_NON_STR_KEYS | backend.OPT_SERIALIZE_NUMPY
+                  | (0 if compact else backend.OPT_INDENT_2))
+        text = backend.dumps(data, default=_default, option=option).decode('utf-8')
+        # orjson always writes UTF-8; non-ASCII only occurs inside strings, where escapes are equivalent
+        return text if text.isascii() else _NON_ASCII.sub(_escape_char, text)
+    if BACKEND == 'ujson':
+        if compact:
+            return backend.dumps(data, escape_forward_slashes=False, default=_default)
+        return backend.dumps(data, indent=2, escape_forward_slashes=False, default=_default)
+    if compact:
+        return json.dumps(data, separators=(',', ':'), default=_default)
+    return json.dumps(data, indent=2, default=_default)
+
+
+def dump(data, f, compact=False):
+    """
+    Serialize data to an open text file.
+
+    Args:
+        data: JSON-serializable data
+        f: File object opened for writing in text mode
+        compact (bool, optional): Leave out all whitespace. Defaults to False.
+    """
+    f.write(dumps(data, compact))
+
+
+def loads(text):
+    """
+    Parse JSON text.
+
+    Args:
+        text (str or bytes): JSON document
+
+    Returns:
+        Parsed data
+    """
+    return _get_backend().loads(text)
+
+
+def load(f):
+    """
+    Parse JSON from an open file.
+
+    Args:
+        f: File object opened for reading
+
+    Returns:
+        Parsed data
+    """
+    return _get_backend().loads(f.read())
@@ -7,28 +7,38 @@ Usage:
 
 import os
 import sys
-import json
 import argparse
 import base64
 from xml.dom import minidom
 from PIL import Image
-from pathlib import Path
+from functools import partial
 
-from .utils import ensure_dir, clean_dir, get_image_dimensions, image_to_base64
+from .utils import ensure_dir, clean_dir
+from .parallel import parallel_map
+from .materialize import IMAGE_MODES, ImageMaterializer
+from .manifest import MANIFEST_NAME, open_manifest
+from .document import as_document
+from .labelme_writer import IMAGE_DATA_MODES, write_labelme
 
 
-def xml_to_json(xml_path, image_path):
+def xml_to_json(xml_path, image_path, image_data="embed"):
     """
     Convert a LabelMe 3.0 XML file to LabelMe JSON format.
     
     Args:
         xml_path (str): Path to the XML file
-        image_path (str): Path to the corresponding image file
+        image_path (str or SourceDocument): Corresponding image file path or handle
+        image_data (str, optional): "embed" to include the base64 image, "none" to
+            leave imageData empty, e.g. for write_labelme() to stream it. Defaults to "embed".
         
     Returns:
         dict: LabelMe format JSON data
     """
     try:
+        # The image is read at most once; its size is probed from the same bytes
+        image = as_document(image_path)
+        image_path = image.path
+        
         # Initialize JSON structure
         json_data = {
             'version': '5.2.1',
@@ -38,15 +48,16 @@ def xml_to_json(xml_path, image_path):
         }
         
         # Convert image to base64
-        try:
-            json_data['imageData'] = image_to_base64(image_path)
-        except Exception as e:
-            print(f"Warning: Failed to encode image {image_path}: {str(e)}")
-            json_data['imageData'] = None
+        json_data['imageData'] = None
+        if image_data == "embed":
+            try:
+                json_data['imageData'] = image.base64()
+            except Exception as e:
+                print(f"Warning: Failed to encode image {image_path}: {str(e)}")
         
         # Get image dimensions
         try:
-            width, height = get_image_dimensions(image_path)
+            width, height = image.image_size
             json_data['imageWidth'] = width
             json_data['imageHeight'] = height
         except Exception as e:
@@ -94,23 +105,80 @@ def xml_to_json(xml_path, image_path):
         return None
 
 
-def labelme3_to_labelme(input_dir, output_dir="dst"):
+def _convert_labelme3_file(xml_file, input_dir, output_images_dir, output_annotations_dir, compact=False,
+                           image_data="embed"):
+    """
+    Convert one LabelMe 3.0 XML file to a LabelMe JSON file.
+    
+    Args:
+        xml_file (str): XML file name
+        input_dir (str): Directory containing LabelMe 3.0 XML files
+        output_images_dir (str): Output directory for images
+        output_annotations_dir (str): Output directory for LabelMe JSON files
+        compact (bool, optional): Write JSON without whitespace. Defaults to False.
+        image_data (str, optional): "embed" or "none". Defaults to "embed".
+        
+    Returns:
+        tuple: (source_image_path, output_image_path) to materialize, or None if skipped
+    """
+    base_name = os.path.splitext(xml_file)[0]
+    image_file = f"{base_name}.jpg"  # Assuming JPG format
+    
+    # Check if image exists
+    image_path = os.path.join(input_dir, image_file)
+    if not os.path.exists(image_path):
+        print(f"Warning: Image file {image_file} not found. Skipping {xml_file}.")
+        return None
+        
+    # Convert XML to JSON
+    xml_path = os.path.join(input_dir, xml_file)
+    json_data = xml_to_json(xml_path, image_path, image_data="none")
+    
+    if not json_data:
+        return None
+        
+    # Save JSON file, streaming the base64 image into it
+    json_path = os.path.join(output_annotations_dir, f"{base_name}.json")
+    try:
+        write_labelme(json_data, json_path, image_path, image_data, compact)
+    except Exception as e:
+        print(f"Warning: Failed to encode image {image_path}: {str(e)}")
+        write_labelme(json_data, json_path, image_data="none", compact=compact)
+        
+    return image_path, os.path.join(output_images_dir, image_file)
+
+
+def labelme3_to_labelme(input_dir, output_dir="dst", workers=1, image_mode="copy", incremental=False,
+                        compact=False, image_data="embed"):
     """
     Convert all LabelMe 3.0 XML files in a directory to LabelMe JSON format.
     
     Args:
         input_dir (str): Directory containing LabelMe 3.0 XML files
         output_dir (str, optional): Output directory for LabelMe files. Defaults to "dst".
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        image_mode (str, optional): copy, hardlink, symlink, reflink or none. Defaults to "copy".
+        incremental (bool, optional): Only convert XML files that changed since the
+            previous run into output_dir. Defaults to False.
+        compact (bool, optional): Write LabelMe JSON without whitespace. Defaults to False.
+        image_data (str, optional): "embed" to embed each image as base64, "none" to
+            reference it through imagePath only. Defaults to "embed".
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
+        manifest = open_manifest(os.path.join(output_dir, MANIFEST_NAME), "labelme3-to-labelme",
+                                 {"input_dir": os.path.abspath(input_dir), "image_mode": image_mode,
+                                  "compact": compact, "image_data": image_data},
+                                 incremental)
+        
         # Create output directories
         output_images_dir = os.path.join(output_dir, 'images')
         output_annotations_dir = os.path.join(output_dir, 'annotations')
         
-        clean_dir(output_dir)
+        if not manifest.loaded:
+            clean_dir(output_dir)
         ensure_dir(output_images_dir)
         ensure_dir(output_annotations_dir)
         
@@ -121,34 +189,31 @@ def labelme3_to_labelme(input_dir, output_dir="dst"):
             print(f"No XML files found in {input_dir}")
             return False
             
-        print(f"Converting {len(xml_files)} LabelMe 3.0 XML files to LabelMe format...")
-        
-        for xml_file in xml_files:
-            base_name = os.path.splitext(xml_file)[0]
-            image_file = f"{base_name}.jpg"  # Assuming JPG format
-            
-            # Check if image exists
-            image_path = os.path.join(input_dir, image_file)
-            if not os.path.exists(image_path):
-                print(f"Warning: Image file {image_file} not found. Skipping {xml_file}.")
-                continue
-                
-            # Convert XML to JSON
-            xml_path = os.path.join(input_dir, xml_file)
-            json_data = xml_to_json(xml_path, image_path)
+        # Drop the outputs of deleted and changed files; only changed files are converted again
+        changed_files, deleted_files = manifest.scan(input_dir, xml_files)
+        for xml_file in deleted_files + changed_files:
+            manifest.forget(xml_file)
+        if manifest.loaded:
+            print(f"Incremental run: {len(changed_files)} changed, {len(deleted_files)} deleted, "
+                  f"{len(xml_files) - len(changed_files)} unchanged")
             
-            if json_data:
-                # Save JSON file
-                json_path = os.path.join(output_annotations_dir, f"{base_name}.json")
-                with open(json_path, 'w') as f:
-                    json.dump(json_data, f, indent=2)
-                    
-                # Copy image file
-                dst_image_path = os.path.join(output_images_dir, image_file)
-                try:
-                    Path(image_path).copy(dst_image_path)
-                except Exception as e:
-                    print(f"Error copying image {image_path}: {str(e)}")
+        print(f"Converting {len(changed_files)} LabelMe 3.0 XML files to LabelMe format...")
+        
+        convert_file = partial(_convert_labelme3_file, input_dir=input_dir,
+                               output_images_dir=output_images_dir,
+                               output_annotations_dir=output_annotations_dir, compact=compact,
+                               image_data=image_data)
+        with ImageMaterializer(image_mode) as images:
+            for xml_file, pair in zip(changed_files, parallel_map(convert_file, changed_files, workers)):
+                if pair is None:
+                    manifest.record(xml_file)
+                    continue
+                images.add(*pair)
+                outputs = [os.path.join(output_annotations_dir, f"{os.path.splitext(xml_file)[0]}.json")]
+                if image_mode != "none":
+                    outputs.append(pair[1])
+                manifest.record(xml_file, outputs)
+        manifest.save()
         
         print(f"Conversion complete. Results saved to {output_dir}")
         return True
@@ -163,9 +228,18 @@ def parse_args():
     parser = argparse.ArgumentParser(description="Convert LabelMe 3.0 XML files to LabelMe JSON format")
     parser.add_argument('--input_dir', required=True, help="Directory containing LabelMe 3.0 XML files")
     parser.add_argument('--output_dir', default="dst", help="Output directory for LabelMe files")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes (0 = one per CPU)")
+    parser.add_argument('--image_mode', '--image-mode', choices=IMAGE_MODES, default="copy",
+                        help="How images are placed in the output directory")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only convert inputs that changed since the previous run")
+    parser.add_argument('--compact', action='store_true', help="Write LabelMe JSON without indentation")
+    parser.add_argument('--image_data', '--image-data', choices=IMAGE_DATA_MODES, default="embed",
+                        help="Embed images as base64 imageData or leave it empty")
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    labelme3_to_labelme(args.input_dir, args.output_dir)
\ No newline at end of file
+    labelme3_to_labelme(args.input_dir, args.output_dir, args.workers, args.image_mode, args.incremental,
+                        args.compact, args.image_data)
\ No newline at end of file
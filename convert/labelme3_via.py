@@ -7,12 +7,15 @@ Usage:
 
 import os
 import sys
-import json
 import argparse
-import xml.etree.ElementTree as ET
-from pathlib import Path
+from functools import partial
 
 from .utils import ensure_dir, clean_dir
+from .catalog import image_info
+from .parallel import parallel_map
+from . import jsonio
+from .materialize import IMAGE_MODES, ImageMaterializer
+from .document import SourceDocument, as_document
 
 
 def get_image_size_from_xml(xml_file):
@@ -20,14 +23,15 @@ def get_image_size_from_xml(xml_file):
     Extract image dimensions from LabelMe 3.0 XML file.
     
     Args:
-        xml_file (str): Path to the XML file
+        xml_file (str or SourceDocument): XML file path or an already parsed handle
         
     Returns:
         tuple: (width, height) or None if not found
     """
     try:
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
+        document = as_document(xml_file)
+        xml_file = document.path
+        root = document.xml
         
         # Find image size
         size_elem = root.find(".//size")
@@ -41,13 +45,119 @@ def get_image_size_from_xml(xml_file):
         return None
 
 
-def labelme3_to_via(input_dir, output_dir="dst"):
+def _convert_labelme3_file(xml_file, input_dir, output_dir):
+    """
+    Convert one LabelMe 3.0 XML file to a VIA image metadata entry.
+    
+    Args:
+        xml_file (str): XML file name
+        input_dir (str): Directory containing LabelMe 3.0 XML files
+        output_dir (str): Output directory for VIA JSON
+        
+    Returns:
+        tuple: (image_id, metadata, (source_image_path, output_image_path)) or None
+            if the file was skipped
+    """
+    try:
+        # Parse XML file
+        document = SourceDocument(os.path.join(input_dir, xml_file))
+        root = document.xml
+        
+        # Get filename
+        filename_elem = root.find("filename")
+        if filename_elem is None:
+            print(f"Warning: No filename found in {xml_file}. Using XML filename.")
+            image_filename = os.path.splitext(xml_file)[0]
+        else:
+            image_filename = filename_elem.text
+        
+        # Get image dimensions
+        img_size = get_image_size_from_xml(document)
+        if img_size is None:
+            print(f"Warning: Could not determine image size for {xml_file}. Skipping.")
+            return None
+            
+        width, height = img_size
+        
+        # Find corresponding image file
+        image_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
+        image_path = None
+        
+        for ext in image_extensions:
+            img_file = f"{os.path.splitext(image_filename)[0]}{ext}"
+            img_path = os.path.join(input_dir, img_file)
+            if os.path.exists(img_path):
+                image_path = img_path
+                break
+        
+        if not image_path:
+            print(f"Warning: No image found for {xml_file}. Skipping.")
+            return None
+        
+        dest_img_path = os.path.join(output_dir, os.path.basename(image_path))
+        
+        # Create VIA image metadata
+        image_size = image_info(image_path).size
+        image_id = os.path.basename(image_path) + str(image_size)
+        metadata = {
+            "filename": os.path.basename(image_path),
+            "size": image_size,
+            "regions": [],
+            "file_attributes": {}
+        }
+        
+        # Process objects (regions)
+        region_id = 0
+        for obj in root.findall(".//object"):
+            name_elem = obj.find("name")
+            if name_elem is None:
+                continue
+                
+            name = name_elem.text
+            
+            # Process bounding box
+            bndbox = obj.find("bndbox")
+            if bndbox is not None:
+                # Rectangle annotation
+                xmin = int(float(bndbox.find("xmin").text))
+                ymin = int(float(bndbox.find("ymin").text))
+                xmax = int(float(bndbox.find("xmax").text))
+                ymax = int(float(bndbox.find("ymax").text))
+                
+                region = {
+                    "shape_attributes": {
+                        "name": "rect",
+                        "x": xmin,
+                        "y": ymin,
+                        "width": xmax - xmin,
+                        "height": ymax - ymin
+                    },
+                    "region_attributes": {
+                        "name": name,
+                        "type": "rect"
+                    }
+                }
+                
+                metadata["regions"].append(region)
+                region_id += 1
+        
+        return image_id, metadata, (image_path, dest_img_path)
+        
+    except Exception as e:
+        print(f"Error processing {xml_file}: {str(e)}")
+        return None
+
+
+def labelme3_to_via(input_dir, output_dir="dst", workers=1, image_mode="copy", compact=False):
     """
     Convert LabelMe 3.0 (XML) format annotations to VIA (JSON) format.
     
     Args:
         input_dir (str): Directory containing LabelMe 3.0 XML files
         output_dir (str, optional): Output directory for VIA JSON. Defaults to "dst".
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        image_mode (str, optional): copy, hardlink, symlink, reflink or none. Defaults to "copy".
+        compact (bool, optional): Write the VIA project without whitespace. Defaults to False.
         
     Returns:
         bool: True if successful, False otherwise
@@ -119,102 +229,28 @@ def labelme3_to_via(input_dir, output_dir="dst"):
             }
         }
         
+        convert_file = partial(_convert_labelme3_file, input_dir=input_dir, output_dir=output_dir)
         converted_count = 0
-        for xml_file in xml_files:
-            try:
-                # Parse XML file
-                xml_path = os.path.join(input_dir, xml_file)
-                tree = ET.parse(xml_path)
-                root = tree.getroot()
-                
-                # Get filename
-                filename_elem = root.find("filename")
-                if filename_elem is None:
-                    print(f"Warning: No filename found in {xml_file}. Using XML filename.")
-                    image_filename = os.path.splitext(xml_file)[0]
-                else:
-                    image_filename = filename_elem.text
-                
-                # Get image dimensions
-                img_size = get_image_size_from_xml(xml_path)
-                if img_size is None:
-                    print(f"Warning: Could not determine image size for {xml_file}. Skipping.")
-                    continue
-                    
-                width, height = img_size
-                
-                # Find corresponding image file
-                image_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
-                image_path = None
-                
-                for ext in image_extensions:
-                    img_file = f"{os.path.splitext(image_filename)[0]}{ext}"
-                    img_path = os.path.join(input_dir, img_file)
-                    if os.path.exists(img_path):
-                        image_path = img_path
-                        break
-                
-                if not image_path:
-                    print(f"Warning: No image found for {xml_file}. Skipping.")
+        image_ids = {}
+        with ImageMaterializer(image_mode) as images:
+            for result in parallel_map(convert_file, xml_files, workers):
+                if result is None:
                     continue
-                
-                # Copy image to destination
-                dest_img_path = os.path.join(output_dir, os.path.basename(image_path))
-                Path(image_path).copy(dest_img_path)
-                
-                # Create VIA image metadata
-                image_id = os.path.basename(image_path) + str(os.path.getsize(image_path))
-                via_json["_via_img_metadata"][image_id] = {
-                    "filename": os.path.basename(image_path),
-                    "size": os.path.getsize(image_path),
-                    "regions": [],
-                    "file_attributes": {}
-                }
-                
-                # Process objects (regions)
-                region_id = 0
-                for obj in root.findall(".//object"):
-                    name_elem = obj.find("name")
-                    if name_elem is None:
-                        continue
-                        
-                    name = name_elem.text
-                    
-                    # Process bounding box
-                    bndbox = obj.find("bndbox")
-                    if bndbox is not None:
-                        # Rectangle annotation
-                        xmin = int(float(bndbox.find("xmin").text))
-                        ymin = int(float(bndbox.find("ymin").text))
-                        xmax = int(float(bndbox.find("xmax").text))
-                        ymax = int(float(bndbox.find("ymax").text))
-                        
-                        region = {
-                            "shape_attributes": {
-                                "name": "rect",
-                                "x": xmin,
-                                "y": ymin,
-                                "width": xmax - xmin,
-                                "height": ymax - ymin
-                            },
-                            "region_attributes": {
-                                "name": name,
-                                "type": "rect"
-                            }
-                        }
-                        
-                        via_json["_via_img_metadata"][image_id]["regions"].append(region)
-                        region_id += 1
-                        
+                image_id, metadata, (image_path, dest_img_path) = result
+                via_json["_via_img_metadata"][image_id] = metadata
+                images.add(image_path, dest_img_path)
+                image_ids[image_path] = image_id
                 converted_count += 1
                 
-            except Exception as e:
-                print(f"Error processing {xml_file}: {str(e)}")
+        # Drop entries whose image could not be placed in the output directory
+        for image_path in images.failed:
+            via_json["_via_img_metadata"].pop(image_ids[image_path], None)
+            converted_count -= 1
         
         # Write VIA JSON to file
         output_json_path = os.path.join(output_dir, "via_project.json")
-        with open(output_json_path, 'w') as f:
-            json.dump(via_json, f, indent=2)
+        with open(output_json_path, 'w', encoding='utf-8') as f:
+            jsonio.dump(via_json, f, compact)
             
         print(f"Conversion complete. {converted_count} annotations converted to VIA format.")
         print(f"Results saved to {output_dir}")
@@ -231,9 +267,13 @@ def parse_args():
     parser = argparse.ArgumentParser(description="Convert LabelMe 3.0 format annotations to VIA format")
     parser.add_argument('--input_dir', required=True, help="Directory containing LabelMe 3.0 XML files")
     parser.add_argument('--output_dir', default="dst", help="Output directory for VIA JSON")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes (0 = one per CPU)")
+    parser.add_argument('--image_mode', '--image-mode', choices=IMAGE_MODES, default="copy",
+                        help="How images are placed in the output directory")
+    parser.add_argument('--compact', action='store_true', help="Write the VIA project without indentation")
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    labelme3_to_via(args.input_dir, args.output_dir)
\ No newline at end of file
+    labelme3_to_via(args.input_dir, args.output_dir, args.workers, args.image_mode, args.compact)
\ No newline at end of file
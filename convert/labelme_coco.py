@@ -7,38 +7,83 @@ Usage:
 
 import os
 import argparse
-import json
 import glob
-from datetime import datetime
 
 import numpy as np
-from PIL import Image
-from labelme import utils
+
+from . import jsonio
+from .utils import get_image_dimensions
+from .coco_writer import COCOStreamWriter, default_info, DEFAULT_LICENSES, load_coco, retained_entries
+from .manifest import Manifest, manifest_path_for, open_manifest
+from .labels import LabelRegistry, load_labels
+from .labelme_reader import load_labelme
 
 
 class LabelMeToCOCO:
     """Class to convert LabelMe JSON format to COCO format."""
     
-    def __init__(self, labelme_files=None, output_file="coco.json"):
+    def __init__(self, labelme_files=None, output_file="coco.json", labels=None, compact=False):
         """
         Initialize the converter.
         
         Args:
             labelme_files (list): List of LabelMe JSON file paths
             output_file (str): Path to save the output COCO JSON file
+            labels (LabelRegistry, optional): Pre-seeded 1-based category registry
+            compact (bool, optional): Write JSON without whitespace. Defaults to False.
         """
         self.labelme_files = labelme_files or []
         self.output_file = output_file
         self.images = []
         self.categories = []
         self.annotations = []
-        self.labels = []
+        self.labels = labels if labels is not None else LabelRegistry(start=1)
         self.annotation_id = 1
+        self.image_count = 0
+        self.annotation_count = 0
+        self.first_image_id = 0
+        self.image_ids = {}
+        self.retained = None
         self.height = 0
         self.width = 0
+        self.writer = None
+        self.compact = compact
+        
+    def resume_from(self, previous, stale_image_ids=()):
+        """
+        Continue a previous conversion instead of starting from scratch.
+        
+        The images and annotations of the previous output are kept with their ids,
+        except those of stale_image_ids, and new entries get ids after them.
         
-    def process_data(self):
-        """Process LabelMe data and convert to COCO format."""
+        Args:
+            previous (dict): COCO data written by an earlier run
+            stale_image_ids (iterable, optional): Ids of images whose source changed or was deleted
+        """
+        images, annotations, self.first_image_id, self.annotation_id = retained_entries(previous, set(stale_image_ids))
+        self.retained = (images, annotations)
+        names = [category["name"] for category in sorted(previous["categories"], key=lambda c: c["id"])]
+        self.labels = LabelRegistry(names, start=1)
+        
+    def process_data(self, writer=None):
+        """
+        Process LabelMe data and convert to COCO format.
+        
+        Args:
+            writer (COCOStreamWriter, optional): If given, images and annotations are
+                streamed to it instead of being collected in memory
+        """
+        self.writer = writer
+        if self.retained is not None:
+            images, annotations = self.retained
+            for image in images:
+                self._add_image(image)
+            # Retained annotations keep their ids, so the id counter is restored afterwards
+            annotation_id = self.annotation_id
+            for annotation in annotations:
+                self._add_annotation(annotation)
+            self.annotation_id = annotation_id
+            
         for file_index, json_file in enumerate(self.labelme_files):
             try:
                 data = self._load_json_file(json_file)
@@ -46,8 +91,9 @@ class LabelMeToCOCO:
                     continue
                     
                 # Process image info
-                image_id = file_index
+                image_id = self.first_image_id + file_index
                 self._process_image(data, image_id, json_file)
+                self.image_ids[json_file] = image_id
                 
                 # Process shapes (annotations)
                 self._process_shapes(data, image_id)
@@ -58,12 +104,27 @@ class LabelMeToCOCO:
         # Update category IDs in the annotations
         self._update_category_ids()
         
+    def _add_image(self, image):
+        """Stream an image entry to the writer, or keep it in memory."""
+        if self.writer is not None:
+            self.writer.add_image(image)
+        else:
+            self.images.append(image)
+        self.image_count += 1
+        
+    def _add_annotation(self, annotation):
+        """Stream an annotation entry to the writer, or keep it in memory."""
+        if self.writer is not None:
+            self.writer.add_annotation(annotation)
+        else:
+            self.annotations.append(annotation)
+        self.annotation_id += 1
+        self.annotation_count += 1
+        
     def _load_json_file(self, json_file):
-        """Load a LabelMe JSON file."""
+        """Load a LabelMe JSON file, skipping its embedded imageData."""
         try:
-            with open(json_file, "r") as f:
-                data = json.load(f)
-            return data
+            return load_labelme(json_file)
         except Exception as e:
             print(f"Error loading {json_file}: {str(e)}")
             return None
@@ -81,8 +142,7 @@ class LabelMeToCOCO:
                 if img_file:
                     img_path = os.path.join(os.path.dirname(json_file), img_file)
                     if os.path.exists(img_path):
-                        with Image.open(img_path) as img:
-                            self.width, self.height = img.size
+                        self.width, self.height = get_image_dimensions(img_path)
                     else:
                         print(f"Warning: Image file {img_path} not found")
                 
@@ -93,7 +153,7 @@ class LabelMeToCOCO:
                 "id": image_id,
                 "file_name": os.path.basename(data.get("imagePath", f"image_{image_id}.jpg"))
             }
-            self.images.append(image)
+            self._add_image(image)
             
         except Exception as e:
             print(f"Error processing image data for {json_file}: {str(e)}")
@@ -103,8 +163,7 @@ class LabelMeToCOCO:
         for shape in data.get("shapes", []):
             try:
                 label = shape.get("label")
-                if label not in self.labels:
-                    self.labels.append(label)
+                category_id = self.labels.add(label)
                     
                 # Get annotation data
                 points = shape.get("points", [])
@@ -138,13 +197,11 @@ class LabelMeToCOCO:
                         "iscrowd": 0,
                         "image_id": image_id,
                         "bbox": bbox,
-                        "category_id": -1,  # Will be updated later
-                        "id": self.annotation_id,
-                        "category_name": label  # Temporary field
+                        "category_id": category_id,
+                        "id": self.annotation_id
                     }
                     
-                    self.annotations.append(annotation)
-                    self.annotation_id += 1
+                    self._add_annotation(annotation)
                     
                 elif shape_type == "rectangle":
                     # For rectangle, we have two points: top-left and bottom-right
@@ -173,13 +230,11 @@ class LabelMeToCOCO:
                             "iscrowd": 0,
                             "image_id": image_id,
                             "bbox": bbox,
-                            "category_id": -1,  # Will be updated later
-                            "id": self.annotation_id,
-                            "category_name": label  # Temporary field
+                            "category_id": category_id,
+                            "id": self.annotation_id
                         }
                         
-                        self.annotations.append(annotation)
-                        self.annotation_id += 1
+                        self._add_annotation(annotation)
                 
             except Exception as e:
                 print(f"Error processing shape {shape}: {str(e)}")
@@ -190,52 +245,56 @@ class LabelMeToCOCO:
                         np.dot(points_array[:, 1], np.roll(points_array[:, 0], 1)))
                 
     def _update_category_ids(self):
-        """Update category IDs in annotations and create categories list."""
-        for i, label in enumerate(self.labels):
-            category = {
+        """Create the categories list from the labels seen so far."""
+        self.categories[:] = [
+            {
                 "supercategory": "object",
-                "id": i + 1,
+                "id": category_id,
                 "name": label
             }
-            self.categories.append(category)
+            for label, category_id in self.labels.items()
+        ]
+        
+    def _info(self):
+        """Return the COCO info block for LabelMe conversions."""
+        return default_info("Converted from LabelMe format", "LabelMe to COCO Converter")
+        
+    def _print_summary(self):
+        """Print conversion statistics."""
+        print(f"Conversion complete. Output saved to {self.output_file}")
+        print(f"  - Images: {self.image_count}")
+        print(f"  - Categories: {len(self.categories)}")
+        print(f"  - Annotations: {self.annotation_count}")
+        
+    def save_streaming(self):
+        """Convert and stream the COCO data to the output file in constant memory."""
+        try:
+            with COCOStreamWriter(self.output_file, self._info(), DEFAULT_LICENSES,
+                                  categories=self.categories, compact=self.compact) as writer:
+                self.process_data(writer)
+            self.writer = None
+            self._print_summary()
+            return True
             
-        # Update category IDs in annotations
-        for annotation in self.annotations:
-            category_name = annotation.pop("category_name", None)
-            if category_name:
-                category_id = self.labels.index(category_name) + 1
-                annotation["category_id"] = category_id
+        except Exception as e:
+            print(f"Error saving COCO data: {str(e)}")
+            return False
                 
     def save(self):
-        """Save the COCO format data to a JSON file."""
+        """Save the in-memory COCO format data to a JSON file."""
         try:
             data = {
-                "info": {
-                    "description": "Converted from LabelMe format",
-                    "url": "",
-                    "version": "1.0",
-                    "year": datetime.now().year,
-                    "contributor": "LabelMe to COCO Converter",
-                    "date_created": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                },
-                "licenses": [{
-                    "id": 1,
-                    "name": "Unknown",
-                    "url": ""
-                }],
+                "info": self._info(),
+                "licenses": DEFAULT_LICENSES,
                 "images": self.images,
                 "annotations": self.annotations,
                 "categories": self.categories
             }
             
-            with open(self.output_file, "w") as f:
-                json.dump(data, f, indent=2)
+            with open(self.output_file, "w", encoding="utf-8") as f:
+                jsonio.dump(data, f, self.compact)
                 
-            print(f"Conversion complete. Output saved to {self.output_file}")
-            print(f"  - Images: {len(self.images)}")
-            print(f"  - Categories: {len(self.categories)}")
-            print(f"  - Annotations: {len(self.annotations)}")
-            
+            self._print_summary()
             return True
             
         except Exception as e:
@@ -243,18 +302,37 @@ class LabelMeToCOCO:
             return False
 
 
-def labelme_to_coco(input_dir, output_file="coco.json"):
+def labelme_to_coco(input_dir, output_file="coco.json", stream=True, incremental=False, classes_file=None,
+                    compact=False):
     """
     Convert LabelMe JSON files to COCO format.
     
     Args:
         input_dir (str): Directory containing LabelMe JSON files
         output_file (str, optional): Output COCO JSON file. Defaults to "coco.json".
+        stream (bool, optional): Stream the output in constant memory instead of
+            building it in RAM first. Defaults to True.
+        incremental (bool, optional): Only parse JSON files that changed since the
+            previous run and patch the existing output_file. Defaults to False.
+        classes_file (str, optional): classes.txt, obj.names or labelmap.txt file
+            fixing the order of the first category ids
+        compact (bool, optional): Write the COCO file without whitespace. Defaults to False.
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
+        labels = load_labels(classes_file, start=1)
+        manifest_path = manifest_path_for(output_file)
+        options = {"input_dir": os.path.abspath(input_dir), "classes": list(labels)}
+        manifest = open_manifest(manifest_path, "labelme-to-coco", options, incremental)
+        
+        # The previous output is patched, so it has to be readable
+        previous = load_coco(output_file) if manifest.loaded else None
+        if manifest.loaded and previous is None:
+            print(f"Could not read previous output {output_file}, running a full conversion")
+            manifest = Manifest(manifest_path, "labelme-to-coco", options)
+            
         # Find all JSON files
         labelme_files = glob.glob(os.path.join(input_dir, "*.json"))
         
@@ -262,12 +340,39 @@ def labelme_to_coco(input_dir, output_file="coco.json"):
             print(f"No JSON files found in {input_dir}")
             return False
             
-        print(f"Converting {len(labelme_files)} LabelMe JSON files to COCO format...")
+        # Images of deleted and changed files are dropped; only changed files are parsed again
+        file_names = [os.path.basename(json_file) for json_file in labelme_files]
+        changed_files, deleted_files = manifest.scan(input_dir, file_names)
+        stale_image_ids = set()
+        for file_name in deleted_files + changed_files:
+            stale_image_ids.add(manifest.get(file_name, "image_id"))
+            manifest.forget(file_name, remove_outputs=False)
+        if manifest.loaded:
+            print(f"Incremental run: {len(changed_files)} changed, {len(deleted_files)} deleted, "
+                  f"{len(file_names) - len(changed_files)} unchanged")
+            
+        print(f"Converting {len(changed_files)} LabelMe JSON files to COCO format...")
         
         # Convert to COCO format
-        converter = LabelMeToCOCO(labelme_files, output_file)
-        converter.process_data()
-        return converter.save()
+        converter = LabelMeToCOCO([os.path.join(input_dir, name) for name in changed_files], output_file, labels,
+                                  compact)
+        if previous is not None:
+            converter.resume_from(previous, stale_image_ids)
+        if stream:
+            success = converter.save_streaming()
+        else:
+            converter.process_data()
+            success = converter.save()
+            
+        if success:
+            for file_name in changed_files:
+                image_id = converter.image_ids.get(os.path.join(input_dir, file_name))
+                if image_id is None:
+                    manifest.record(file_name)
+                else:
+                    manifest.record(file_name, image_id=image_id)
+            manifest.save()
+        return success
         
     except Exception as e:
         print(f"Error during conversion: {str(e)}")
@@ -279,9 +384,15 @@ def parse_args():
     parser = argparse.ArgumentParser(description="Convert LabelMe JSON files to COCO format")
     parser.add_argument("--input_dir", required=True, help="Directory containing LabelMe JSON files")
     parser.add_argument("--output_file", default="coco.json", help="Output COCO JSON file")
+    parser.add_argument("--no_stream", action="store_true", help="Build the whole COCO file in memory before writing")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only parse inputs that changed since the previous run and patch the output")
+    parser.add_argument("--classes_file", help="classes.txt, obj.names or labelmap.txt fixing the category id order")
+    parser.add_argument("--compact", action="store_true", help="Write the COCO file without indentation")
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    labelme_to_coco(args.input_dir, args.output_file)
+    labelme_to_coco(args.input_dir, args.output_file, not args.no_stream, args.incremental, args.classes_file,
+                    args.compact)
@@ -0,0 +1,137 @@
+"""
+LabelMe JSON reader that skips the embedded image.
+
+LabelMe files usually carry the whole image as a base64 "imageData" string,
+which is most of the file but is never needed to convert the annotations.
+load_labelme() memory-maps the file, locates the top-level imageData value
+with a C-speed tokenizer and parses only the rest of the document. When
+imageWidth/imageHeight are missing, they are filled in by decoding just the
+first few kilobytes of imageData and probing the image header.
+"""
+
+import io
+import re
+import mmap
+import base64
+import binascii
+
+from . import jsonio
+from .utils import probe_image_dimensions, get_image_dimensions_from_bytes
+
+# JSON strings and structural characters; everything else (numbers, literals,
+# whitespace) is irrelevant for tracking the nesting depth
+_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]]')
+_KEY = b'"imageData"'
+_VALUE = re.compile(rb'\s*:\s*')
+
+# Base64 characters decoded per attempt when probing the image header
+_HEADER_CHUNKS = (4096, 65536, 1 << 20)
+
+
+def _find_image_data(buf):
+    """
+    Locate the value of the top-level "imageData" member.
+
+    Args:
+        buf: JSON document bytes or mmap
+
+    Returns:
+        tuple: (start, end) byte span of the value, or None if there is no such member
+    """
+    depth = 0
+    for match in _TOKEN.finditer(buf):
+        token = match.group()
+        if token in (b'{', b'['):
+            depth += 1
+        elif token in (b'}', b']'):
+            depth -= 1
+        elif depth == 1 and token == _KEY:
+            value = _VALUE.match(buf, match.end())
+            if value is None:
+                # A string value that happens to read "imageData"
+                continue
+            start = value.end()
+            if buf[start:start + 1] != b'"':
+                # null or a non-string value, small enough to parse normally
+                return None
+            end = buf.find(b'"', start + 1)
+            while end != -1 and _escaped(buf, end):
+                end = buf.find(b'"', end + 1)
+            if end == -1:
+                raise ValueError("Unterminated imageData string")
+            return start, end + 1
+    return None
+
+
+def _escaped(buf, pos):
+    """Return True if the quote at pos is escaped by an odd number of backslashes."""
+    count = 0
+    while pos - count - 1 >= 0 and buf[pos - count - 1:pos - count] == b'\\':
+        count += 1
+    return count % 2 == 1
+
+
+def image_size_from_base64(data):
+    """
+    Get image dimensions from base64 image data, decoding only the header.
+
+    Args:
+        data (bytes, str or memoryview): Base64 encoded image; JSON-escaped slashes are accepted
+
+    Returns:
+        tuple: (width, height) of the image
+    """
+    if isinstance(data, str):
+        data = data.encode("ascii")
+    for size in _HEADER_CHUNKS:
+        chunk = bytes(data[:size]).replace(b'\\/', b'/')
+        try:
+            dimensions = probe_image_dimensions(io.BytesIO(base64.b64decode(chunk[:len(chunk) - len(chunk) % 4])))
+        except (binascii.Error, ValueError):
+            dimensions = None
+        if dimensions is not None:
+            return dimensions
+        if size >= len(data):
+            break
+    # Formats without a known header layout are decoded in full
+    return get_image_dimensions_from_bytes(base64.b64decode(bytes(data).replace(b'\\/', b'/')))
+
+
+def load_labelme(json_file, image_data=False):
+    """
+    Load a LabelMe JSON file without parsing its embedded image.
+
+    Args:
+        json_file (str): Path to the LabelMe JSON file
+        image_data (bool, optional): Keep the base64 imageData string. By default
+            it is replaced by None. Defaults to False.
+
+    Returns:
+        dict: LabelMe data, with imageWidth/imageHeight probed from imageData
+            when they are missing
+    """
+    with open(json_file, "rb") as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            buf = f.read()
+        try:
+            span = _find_image_data(buf)
+            if span is None:
+                return jsonio.loads(buf[:])
+
+            start, end = span
+            data = jsonio.loads(buf[:start] + b'null' + buf[end:])
+            if not isinstance(data, dict):
+                return data
+            if not data.get("imageWidth") or not data.get("imageHeight"):
+                # release the slice too, or closing the mmap fails and hides any decoding error
+                with memoryview(buf) as view, view[start + 1:end - 1] as encoded:
+                    data["imageWidth"], data["imageHeight"] = image_size_from_base64(encoded)
+            if image_data:
+                data["imageData"] = buf[start + 1:end - 1].replace(b'\\/', b'/').decode("ascii")
+            return data
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
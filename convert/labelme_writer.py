@@ -0,0 +1,78 @@
+"""
+LabelMe JSON writer with a configurable imageData policy.
+
+    none   - write "imageData": null; LabelMe loads the image from imagePath
+    embed  - embed the image as base64, streamed in chunks straight into the
+             output file instead of being built as one large string first
+"""
+
+import os
+import base64
+
+from . import jsonio
+
+IMAGE_DATA_MODES = ('none', 'embed')
+
+# Multiple of 3 so that the base64 of consecutive chunks concatenates cleanly
+_CHUNK_SIZE = 3 * (1 << 16)
+
+# Stands in for the image while the rest of the document is serialized
+_PLACEHOLDER = "\x002label-imageData\x00"
+
+
+def stream_base64(image, f, chunk_size=_CHUNK_SIZE):
+    """
+    Write the base64 encoding of an image to a text file in chunks.
+
+    Args:
+        image (str or bytes-like): Image file path, or encoded image bytes
+        f: File object opened for writing in text mode
+        chunk_size (int, optional): Bytes encoded per chunk; rounded down to a multiple of 3
+    """
+    chunk_size -= chunk_size % 3
+    if isinstance(image, (str, os.PathLike)):
+        with open(image, "rb") as src:
+            for chunk in iter(lambda: src.read(chunk_size), b""):
+                f.write(base64.b64encode(chunk).decode("ascii"))
+    else:
+        view = memoryview(image).cast("B")
+        for offset in range(0, len(view), chunk_size):
+            f.write(base64.b64encode(view[offset:offset + chunk_size]).decode("ascii"))
+
+
+def write_labelme(data, json_path, image=None, image_data="embed", compact=False):
+    """
+    Write a LabelMe JSON file.
+
+    Args:
+        data (dict): LabelMe data; its imageData entry, if any, is replaced
+        json_path (str): Output JSON file
+        image (str or bytes-like, optional): Image file path or encoded image bytes
+            to embed. Required when image_data is "embed".
+        image_data (str, optional): One of IMAGE_DATA_MODES. Defaults to "embed".
+        compact (bool, optional): Write without whitespace. Defaults to False.
+    """
+    if image_data not in IMAGE_DATA_MODES:
+        raise ValueError(f"Unknown image data mode '{image_data}'. Use one of {', '.join(IMAGE_DATA_MODES)}.")
+
+    data = dict(data)
+    if image_data == "none" or image is None:
+        data["imageData"] = None
+        with open(json_path, "w", encoding="utf-8") as f:
+            jsonio.dump(data, f, compact)
+        return
+
+    # Serialize everything but the image, then stream the image into its slot
+    data["imageData"] = _PLACEHOLDER
+    head, tail = jsonio.dumps(data, compact).split(jsonio.dumps(_PLACEHOLDER), 1)
+    try:
+        with open(json_path, "w", encoding="utf-8") as f:
+            f.write(head)
+            f.write('"')
+            stream_base64(image, f)
+            f.write('"')
+            f.write(tail)
+    except Exception:
+        if os.path.exists(json_path):
+            os.remove(json_path)
+        raise
@@ -7,13 +7,17 @@ Usage:
 
 import os
 import sys
-import json
 import argparse
 from pathlib import Path
-import shutil
 from collections import defaultdict
+from functools import partial
 
-from .utils import ensure_dir, clean_dir, load_json_file
+from .utils import ensure_dir, clean_dir
+from .parallel import parallel_map
+from .materialize import IMAGE_MODES, ImageMaterializer
+from .manifest import MANIFEST_NAME, open_manifest
+from .labels import LabelRegistry, load_labels
+from .document import as_document
 
 
 def parse_labelme_json(json_file, class_mapping=None):
@@ -21,15 +25,17 @@ def parse_labelme_json(json_file, class_mapping=None):
     Parse LabelMe JSON annotation file.
     
     Args:
-        json_file (str): Path to LabelMe JSON file
-        class_mapping (dict, optional): Mapping of class names to class IDs. If None, a new mapping will be created.
+        json_file (str or SourceDocument): LabelMe JSON file path or an already opened handle
+        class_mapping (LabelRegistry, optional): Class registry. If None, a new registry will be created.
         
     Returns:
         tuple: (shapes, image_width, image_height, updated_class_mapping)
     """
     try:
-        # Load JSON file
-        data = load_json_file(json_file)
+        # Load JSON file without its imageData, reusing the handle's parsed data if it was already read
+        document = as_document(json_file)
+        json_file = document.path
+        data = document.labelme
         if not data:
             return None, None, None, class_mapping
             
@@ -44,7 +50,7 @@ def parse_labelme_json(json_file, class_mapping=None):
             
         # Initialize class mapping if not provided
         if class_mapping is None:
-            class_mapping = {}
+            class_mapping = LabelRegistry()
             
         # Process shapes (annotations)
         shapes = []
@@ -62,12 +68,8 @@ def parse_labelme_json(json_file, class_mapping=None):
                 print(f"Warning: Shape type '{shape_type}' in {json_file} is not supported. Only 'rectangle' is supported.")
                 continue
                 
-            # Add label to class mapping if not already present
-            if label not in class_mapping:
-                class_mapping[label] = len(class_mapping)
-                
-            # Get class ID
-            class_id = class_mapping[label]
+            # Get class ID, adding the label to the registry if not already present
+            class_id = class_mapping.add(label)
             
             # Extract bounding box coordinates
             if len(points) == 2:  # LabelMe rectangles have 2 points: top-left and bottom-right
@@ -105,84 +107,135 @@ def parse_labelme_json(json_file, class_mapping=None):
         return None, None, None, class_mapping
 
 
-def write_yolo_files(annotations, class_mapping, input_dir, output_dir):
+def _read_labelme_file(json_path):
+    """
+    Parse one LabelMe JSON file with its own local class mapping.
+
+    Args:
+        json_path (str): Path to LabelMe JSON file
+
+    Returns:
+        tuple: (image_filename, shapes, width, height, local_class_mapping) or None
+    """
+    # Get image filename from JSON; the handle keeps the parsed data for parse_labelme_json
+    document = as_document(json_path)
+    try:
+        image_filename = document.labelme.get("imagePath")
+    except Exception as e:
+        print(f"Error reading {json_path}: {str(e)}")
+        return None
+        
+    if not image_filename:
+        print(f"Warning: No image path found in {os.path.basename(json_path)}")
+        return None
+        
+    # Parse LabelMe JSON
+    shapes, width, height, class_mapping = parse_labelme_json(document, LabelRegistry())
+    
+    # Handle relative paths
+    return os.path.basename(image_filename), shapes, width, height, class_mapping
+
+
+def _write_yolo_file(item, input_dir, output_dir):
+    """
+    Write the YOLO annotation file for one image.
+    
+    Args:
+        item (tuple): (image_filename, annotation_data)
+        input_dir (str): Input directory containing LabelMe files
+        output_dir (str): Output directory for YOLO format
+        
+    Returns:
+        tuple: (source_image_path, output_image_path) to materialize, or None if skipped
+    """
+    image_filename, annotation_data = item
+    
+    # Get annotations
+    shapes = annotation_data.get("shapes", [])
+    if not shapes:
+        return None
+        
+    # Find image file
+    image_path = os.path.join(input_dir, image_filename)
+    if not os.path.exists(image_path):
+        print(f"Warning: Image {image_filename} not found in {input_dir}")
+        return None
+        
+    # Write YOLO annotation
+    base_name = os.path.splitext(image_filename)[0]
+    txt_path = os.path.join(output_dir, f"{base_name}.txt")
+    
+    with open(txt_path, 'w') as f:
+        for shape in shapes:
+            # YOLO format: class_id center_x center_y width height
+            f.write(f"{shape['class_id']} {shape['x_center']:.6f} "
+                   f"{shape['y_center']:.6f} {shape['width']:.6f} "
+                   f"{shape['height']:.6f}\n")
+            
+    return image_path, os.path.join(output_dir, image_filename)
+
+
+def write_yolo_files(annotations, class_mapping, input_dir, output_dir, workers=1, image_mode="copy"):
     """
     Write YOLO annotation files and copy images.
     
     Args:
         annotations (dict): Dictionary mapping image filenames to annotations
-        class_mapping (dict): Mapping of class names to class IDs
+        class_mapping (LabelRegistry): Class registry
         input_dir (str): Input directory containing LabelMe files
         output_dir (str): Output directory for YOLO format
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        image_mode (str, optional): How images are placed in output_dir. Defaults to "copy".
         
     Returns:
         int: Number of processed files
     """
     try:
         # Write classes.txt
-        classes = [""] * len(class_mapping)
-        for label, class_id in class_mapping.items():
-            classes[class_id] = label
-            
-        with open(os.path.join(output_dir, 'classes.txt'), 'w') as f:
-            f.write('\n'.join(classes))
+        class_mapping.save(os.path.join(output_dir, 'classes.txt'))
             
         # Process each annotation
-        processed_count = 0
-        for image_filename, annotation_data in annotations.items():
-            # Get annotations
-            shapes = annotation_data.get("shapes", [])
-            if not shapes:
-                continue
-                
-            # Find image file
-            image_path = os.path.join(input_dir, image_filename)
-            if not os.path.exists(image_path):
-                print(f"Warning: Image {image_filename} not found in {input_dir}")
-                continue
-                
-            # Copy image to output directory
-            output_image_path = os.path.join(output_dir, image_filename)
-            try:
-                shutil.copy2(image_path, output_image_path)
-            except Exception as e:
-                print(f"Error copying image {image_path}: {str(e)}")
-                continue
-                
-            # Write YOLO annotation
-            base_name = os.path.splitext(image_filename)[0]
-            txt_path = os.path.join(output_dir, f"{base_name}.txt")
-            
-            with open(txt_path, 'w') as f:
-                for shape in shapes:
-                    # YOLO format: class_id center_x center_y width height
-                    f.write(f"{shape['class_id']} {shape['x_center']:.6f} "
-                           f"{shape['y_center']:.6f} {shape['width']:.6f} "
-                           f"{shape['height']:.6f}\n")
-                    
-            processed_count += 1
-            
-        return processed_count
+        write_file = partial(_write_yolo_file, input_dir=input_dir, output_dir=output_dir)
+        processed = 0
+        with ImageMaterializer(image_mode) as images:
+            for pair in parallel_map(write_file, annotations.items(), workers):
+                if pair is not None:
+                    images.add(*pair)
+                    processed += 1
+        return processed - len(images.failed)
         
     except Exception as e:
         print(f"Error writing YOLO files: {str(e)}")
         return 0
 
 
-def labelme_to_yolo(input_dir, output_dir="dst"):
+def labelme_to_yolo(input_dir, output_dir="dst", workers=1, image_mode="copy", incremental=False,
+                    classes_file=None):
     """
     Convert LabelMe format annotations to YOLO format.
     
     Args:
         input_dir (str): Directory containing LabelMe JSON files
         output_dir (str, optional): Output directory for YOLO files. Defaults to "dst".
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        image_mode (str, optional): copy, hardlink, symlink, reflink or none. Defaults to "copy".
+        incremental (bool, optional): Only convert JSON files that changed since the
+            previous run into output_dir. Defaults to False.
+        classes_file (str, optional): classes.txt, obj.names or labelmap.txt file
+            fixing the order of the first class ids
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
+        class_mapping = load_labels(classes_file)
+        manifest = open_manifest(os.path.join(output_dir, MANIFEST_NAME), "labelme-to-yolo",
+                                 {"input_dir": os.path.abspath(input_dir), "image_mode": image_mode,
+                                  "classes": list(class_mapping)},
+                                 incremental)
+        
         # Create output directory
-        if not clean_dir(output_dir):
+        if not manifest.loaded and not clean_dir(output_dir):
             print(f"Failed to create output directory {output_dir}")
             return False
             
@@ -197,51 +250,59 @@ def labelme_to_yolo(input_dir, output_dir="dst"):
             
         print(f"Found {len(json_files)} LabelMe JSON files")
         
-        # Process all JSON files
-        class_mapping = {}
+        # Drop the outputs of deleted and changed files; only changed files are parsed again
+        changed_files, deleted_files = manifest.scan(input_dir, json_files)
+        for json_file in deleted_files + changed_files:
+            manifest.forget(json_file)
+        if manifest.loaded:
+            print(f"Incremental run: {len(changed_files)} changed, {len(deleted_files)} deleted, "
+                  f"{len(json_files) - len(changed_files)} unchanged")
+        
+        # Process JSON files, then merge local class ids in file order. Classes
+        # of a previous run keep their ids so unchanged label files stay valid.
+        if manifest.loaded:
+            class_mapping = LabelRegistry(manifest.state.get("classes", []))
         annotations = {}
+        sources = {}
         
-        for json_file in json_files:
-            json_path = os.path.join(input_dir, json_file)
-            
-            # Get image filename from JSON
-            image_filename = None
-            try:
-                with open(json_path, 'r') as f:
-                    data = json.load(f)
-                    image_filename = data.get("imagePath")
-            except Exception as e:
-                print(f"Error reading {json_path}: {str(e)}")
+        json_paths = [os.path.join(input_dir, json_file) for json_file in changed_files]
+        for json_file, result in zip(changed_files, parallel_map(_read_labelme_file, json_paths, workers)):
+            manifest.record(json_file)
+            if result is None:
                 continue
-                
-            if not image_filename:
-                print(f"Warning: No image path found in {json_file}")
-                continue
-                
-            # Handle relative paths
-            image_filename = os.path.basename(image_filename)
+            image_filename, shapes, width, height, local_mapping = result
             
-            # Parse LabelMe JSON
-            shapes, width, height, class_mapping = parse_labelme_json(json_path, class_mapping)
+            local_to_global = {local_id: class_mapping.add(label) for label, local_id in local_mapping.items()}
             
             if shapes:
+                for shape in shapes:
+                    shape["class_id"] = local_to_global[shape["class_id"]]
                 annotations[image_filename] = {
                     "shapes": shapes,
                     "width": width,
                     "height": height
                 }
+                sources[image_filename] = json_file
                 
-        if not annotations:
+        if not annotations and not manifest.loaded:
             print("No valid annotations found")
             return False
             
         # Print class information
         print(f"Found {len(class_mapping)} classes:")
-        for label, class_id in sorted(class_mapping.items(), key=lambda x: x[1]):
+        for label, class_id in class_mapping.items():
             print(f"  {class_id}: {label}")
             
         # Write YOLO files
-        processed_count = write_yolo_files(annotations, class_mapping, input_dir, output_dir)
+        processed_count = write_yolo_files(annotations, class_mapping, input_dir, output_dir, workers, image_mode)
+        
+        for image_filename, json_file in sources.items():
+            outputs = [os.path.join(output_dir, f"{os.path.splitext(image_filename)[0]}.txt")]
+            if image_mode != "none":
+                outputs.append(os.path.join(output_dir, image_filename))
+            manifest.record(json_file, outputs)
+        manifest.state["classes"] = list(class_mapping)
+        manifest.save()
         
         print(f"Conversion complete. {processed_count}/{len(annotations)} images converted to YOLO format.")
         print(f"Results saved to {output_dir}")
@@ -257,9 +318,16 @@ def parse_args():
     parser = argparse.ArgumentParser(description="Convert LabelMe format annotations to YOLO format")
     parser.add_argument('--input_dir', required=True, help="Directory containing LabelMe JSON files")
     parser.add_argument('--output_dir', default="dst", help="Output directory for YOLO files")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes (0 = one per CPU)")
+    parser.add_argument('--image_mode', '--image-mode', choices=IMAGE_MODES, default="copy",
+                        help="How images are placed in the output directory")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only convert inputs that changed since the previous run")
+    parser.add_argument('--classes_file', help="classes.txt, obj.names or labelmap.txt fixing the class id order")
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    labelme_to_yolo(args.input_dir, args.output_dir)
+    labelme_to_yolo(args.input_dir, args.output_dir, args.workers, args.image_mode, args.incremental,
+                    args.classes_file)
@@ -0,0 +1,178 @@
+"""
+Label registry shared by the converters.
+
+Maps label names to stable integer ids in insertion order with dict lookups,
+and can be pre-seeded from a class list file so ids match an existing
+taxonomy:
+
+    classes.txt / obj.names   one label per line (YOLO, Darknet)
+    labelmap.txt              CVAT/VOC "label:color_rgb:parts:actions" lines
+"""
+
+import os
+
+
+class LabelRegistry:
+    """Insertion-ordered label name <-> id mapping with O(1) lookups."""
+
+    def __init__(self, names=None, start=0):
+        """
+        Initialize the registry.
+
+        Args:
+            names (iterable, optional): Initial label names, in id order
+            start (int, optional): Id of the first label, e.g. 1 for COCO. Defaults to 0.
+        """
+        self.start = start
+        self.names = []
+        self._ids = {}
+        for name in names or []:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def __repr__(self):
+        return f"LabelRegistry({self.names!r}, start={self.start})"
+
+    def add(self, name):
+        """
+        Return the id of a label, registering it if it is new.
+
+        Args:
+            name (str): Label name
+
+        Returns:
+            int: Label id
+        """
+        label_id = self._ids.get(name)
+        if label_id is None:
+            label_id = self.start + len(self.names)
+            self._ids[name] = label_id
+            self.names.append(name)
+        return label_id
+
+    def get(self, name, default=None):
+        """
+        Return the id of a known label without registering it.
+
+        Args:
+            name (str): Label name
+            default (optional): Returned for unknown labels. Defaults to None.
+
+        Returns:
+            int: Label id, or default
+        """
+        return self._ids.get(name, default)
+
+    def name(self, label_id):
+        """
+        Return the name of a label id.
+
+        Args:
+            label_id (int): Label id
+
+        Returns:
+            str: Label name
+        """
+        return self.names[label_id - self.start]
+
+    def items(self):
+        """Return (name, id) pairs in id order."""
+        return [(name, self.start + i) for i, name in enumerate(self.names)]
+
+    def to_categories(self, supercategory="object"):
+        """
+        Build a COCO categories list.
+
+        Args:
+            supercategory (str, optional): Supercategory of every label. Defaults to "object".
+
+        Returns:
+            list: [{"id", "name", "supercategory"}, ...] in id order
+        """
+        return [{"id": label_id, "name": name, "supercategory": supercategory}
+                for name, label_id in self.items()]
+
+    def save(self, path):
+        """
+        Write the labels one per line, e.g. as a YOLO classes.txt.
+
+        Args:
+            path (str): Output file path
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(self.names))
+
+    @classmethod
+    def from_file(cls, path, start=0):
+        """
+        Load labels from a classes.txt, obj.names or labelmap.txt file.
+
+        Ids follow read_class_names(), so a YOLO class keeps the id of its line
+        even when the list has blank or repeated names.
+
+        Args:
+            path (str): Class list file
+            start (int, optional): Id of the first label. Defaults to 0.
+
+        Returns:
+            LabelRegistry: The loaded registry
+        """
+        registry = cls(start=start)
+        for name in read_class_names(path):
+            # A repeated name keeps its first id but still takes up its position
+            registry._ids.setdefault(name, registry.start + len(registry.names))
+            registry.names.append(name)
+        return registry
+
+
+def read_class_names(path):
+    """
+    Read the class names of a classes.txt, obj.names or labelmap.txt file.
+
+    YOLO and Darknet lists are read by position, one class id per line, as
+    darknet does. For labelmap.txt files blank lines and "#" comments are
+    skipped, only the label name before the first ":" is used and the
+    "background" entry, which only exists for segmentation masks, is left out.
+
+    Args:
+        path (str): Class list file
+
+    Returns:
+        list: Class names in id order
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    if not os.path.basename(path).lower().startswith("labelmap"):
+        return lines
+    names = []
+    for line in lines:
+        if not line or line.startswith("#"):
+            continue
+        line = line.split(":", 1)[0]
+        if line != "background":
+            names.append(line)
+    return names
+
+
+def load_labels(classes_file=None, start=0):
+    """
+    Create a registry, pre-seeded from a class list file when one is given.
+
+    Args:
+        classes_file (str, optional): classes.txt, obj.names or labelmap.txt file
+        start (int, optional): Id of the first label. Defaults to 0.
+
+    Returns:
+        LabelRegistry: The registry
+    """
+    if classes_file:
+        return LabelRegistry.from_file(classes_file, start)
+    return LabelRegistry(start=start)
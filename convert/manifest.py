@@ -0,0 +1,241 @@
+"""
+Input manifest for incremental re-conversion.
+
+A converter keeps a manifest next to its output recording, for every input
+file, its size, modification time and SHA-256 digest, together with the
+outputs it produced. On the next run with --incremental only inputs that were
+added or changed are converted again, outputs of deleted inputs are removed,
+and everything else is left untouched. Files whose size and mtime are
+unchanged are not read at all; the digest is only computed when they differ,
+so a file that was merely touched is not converted again either.
+
+Runs without --incremental use a disabled manifest, which neither hashes the
+inputs nor writes a manifest file.
+"""
+
+import os
+import hashlib
+
+from . import jsonio
+
+MANIFEST_NAME = ".2label-manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    Compute the SHA-256 digest of a file.
+
+    Args:
+        path (str): File path
+        chunk_size (int, optional): Read size in bytes. Defaults to 1 MiB.
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_path_for(output_file):
+    """
+    Return the manifest path used for a single-file output such as a COCO JSON.
+
+    Args:
+        output_file (str): Output file path
+
+    Returns:
+        str: Manifest path next to the output file
+    """
+    directory, name = os.path.split(output_file)
+    return os.path.join(directory, f".{name}.manifest.json")
+
+
+class Manifest:
+    """Per-input signatures and outputs of one converter run."""
+
+    def __init__(self, path, converter, options=None, enabled=True):
+        """
+        Create an empty manifest.
+
+        Args:
+            path (str): Manifest file path; recorded outputs are stored relative to its directory
+            converter (str): Converter name
+            options (dict, optional): Conversion options; a manifest written with
+                different options is not reused
+            enabled (bool, optional): Track the inputs. A disabled manifest reports every
+                input as changed without reading it, and save() only removes a stale
+                manifest file. Defaults to True.
+        """
+        self.path = path
+        self.root = os.path.dirname(os.path.abspath(path))
+        self.converter = converter
+        self.options = options or {}
+        self.enabled = enabled
+        self.files = {}
+        self.state = {}
+        self.loaded = False
+        self._pending = {}
+
+    @classmethod
+    def load(cls, path, converter, options=None):
+        """
+        Load a manifest, falling back to an empty one when it is missing or stale.
+
+        Args:
+            path (str): Manifest file path
+            converter (str): Converter name
+            options (dict, optional): Conversion options
+
+        Returns:
+            Manifest: The manifest; its loaded attribute tells whether it can be reused
+        """
+        manifest = cls(path, converter, options)
+        try:
+            with open(path, "rb") as f:
+                data = jsonio.load(f)
+        except (OSError, ValueError):
+            return manifest
+
+        if (data.get("version") != MANIFEST_VERSION or data.get("converter") != converter
+                or data.get("options") != manifest.options):
+            return manifest
+
+        manifest.files = data.get("files", {})
+        manifest.state = data.get("state", {})
+        manifest.loaded = True
+        return manifest
+
+    def scan(self, input_dir, file_names):
+        """
+        Compare input files with the manifest.
+
+        Args:
+            input_dir (str): Directory containing the input files
+            file_names (list): Input file names, relative to input_dir
+
+        Returns:
+            tuple: (changed, deleted) where changed lists the added or modified
+                file names in input order and deleted the recorded names that are gone
+        """
+        if not self.enabled:
+            return list(file_names), []
+
+        changed = []
+        seen = set()
+        for name in file_names:
+            seen.add(name)
+            path = os.path.join(input_dir, name)
+            stat = os.stat(path)
+            entry = self.files.get(name)
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                continue
+
+            digest = file_digest(path)
+            if entry and entry["size"] == stat.st_size and entry["sha256"] == digest:
+                # Touched but not modified
+                entry["mtime_ns"] = stat.st_mtime_ns
+                continue
+
+            self._pending[name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+            changed.append(name)
+
+        deleted = [name for name in self.files if name not in seen]
+        return changed, deleted
+
+    def get(self, name, key, default=None):
+        """
+        Return a value stored for an input file by record().
+
+        Args:
+            name (str): Input file name
+            key (str): Value name
+            default (optional): Returned when the file or value is not recorded
+
+        Returns:
+            The stored value
+        """
+        return self.files.get(name, {}).get(key, default)
+
+    def record(self, name, outputs=(), **values):
+        """
+        Record that an input file was converted.
+
+        Args:
+            name (str): Input file name, as passed to scan()
+            outputs (iterable, optional): Output paths produced from the file
+            **values: Extra JSON-serializable values to keep for the file
+        """
+        if not self.enabled:
+            return
+        entry = self._pending.pop(name, None) or self.files.get(name)
+        if entry is None:
+            raise KeyError(f"{name} was not scanned")
+        entry = {"size": entry["size"], "mtime_ns": entry["mtime_ns"], "sha256": entry["sha256"]}
+        entry["outputs"] = [os.path.relpath(os.path.abspath(output), self.root) for output in outputs]
+        entry.update(values)
+        self.files[name] = entry
+
+    def forget(self, name, remove_outputs=True):
+        """
+        Drop an input file from the manifest.
+
+        Args:
+            name (str): Input file name
+            remove_outputs (bool, optional): Also delete the outputs recorded for it. Defaults to True.
+
+        Returns:
+            dict: The removed entry, or None if the file was not recorded
+        """
+        entry = self.files.pop(name, None)
+        if entry and remove_outputs:
+            for output in entry.get("outputs", []):
+                path = os.path.join(self.root, output)
+                if os.path.lexists(path):
+                    os.remove(path)
+        return entry
+
+    def save(self):
+        """Write the manifest atomically, or remove it for a disabled manifest since it no longer matches the outputs."""
+        if not self.enabled:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        data = {
+            "version": MANIFEST_VERSION,
+            "converter": self.converter,
+            "options": self.options,
+            "state": self.state,
+            "files": self.files
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            jsonio.dump(data, f, compact=True)
+        os.replace(tmp_path, self.path)
+
+
+def open_manifest(path, converter, options=None, incremental=False):
+    """
+    Open the manifest for a converter run.
+
+    Args:
+        path (str): Manifest file path
+        converter (str): Converter name
+        options (dict, optional): Conversion options
+        incremental (bool, optional): Reuse a previous manifest if it matches. Defaults to False.
+
+    Returns:
+        Manifest: A loaded manifest for incremental runs, or an empty one to be
+            filled by a full conversion; a disabled one for other runs. Callers do
+            a full conversion when manifest.loaded is False
+    """
+    if not incremental:
+        return Manifest(path, converter, options, enabled=False)
+    manifest = Manifest.load(path, converter, options)
+    if manifest.loaded:
+        return manifest
+    print("No reusable manifest found, running a full conversion")
+    return Manifest(path, converter, options)
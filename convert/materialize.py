@@ -0,0 +1,184 @@
+"""
+Materialize source images into a converter's output directory.
+
+Converters hand (source, destination) pairs to an ImageMaterializer, which
+links or copies them on a thread pool according to the selected mode:
+
+    copy      - byte copy through os.copy_file_range/os.sendfile, keeping metadata
+    hardlink  - hard link to the source (same filesystem only)
+    symlink   - absolute symbolic link to the source
+    reflink   - copy-on-write clone where the filesystem supports it, else copy
+    none      - leave images where they are
+"""
+
+import os
+import shutil
+
+IMAGE_MODES = ('copy', 'hardlink', 'symlink', 'reflink', 'none')
+
+# Linux ioctl request number for cloning a whole file (FICLONE)
+_FICLONE = 0x40049409
+
+
+def fast_copy(src, dst):
+    """
+    Copy a file in the kernel where possible and preserve its metadata, like shutil.copy2.
+
+    Args:
+        src (str): Source file path
+        dst (str): Destination file path
+    """
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        copied = 0
+
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while copied < size:
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - copied)
+                    if n == 0:
+                        break
+                    copied += n
+            except OSError:
+                pass
+
+        if copied < size and hasattr(os, 'sendfile'):
+            try:
+                while copied < size:
+                    n = os.sendfile(fdst.fileno(), fsrc.fileno(), copied, size - copied)
+                    if n == 0:
+                        break
+                    copied += n
+            except OSError:
+                pass
+
+        if copied < size:
+            fsrc.seek(copied)
+            fdst.seek(copied)
+            shutil.copyfileobj(fsrc, fdst)
+
+    shutil.copystat(src, dst)
+
+
+def reflink(src, dst):
+    """
+    Clone a file with copy-on-write, falling back to fast_copy when unsupported.
+
+    Args:
+        src (str): Source file path
+        dst (str): Destination file path
+    """
+    try:
+        import fcntl
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        shutil.copystat(src, dst)
+    except (ImportError, OSError):
+        fast_copy(src, dst)
+
+
+def materialize_image(src, dst, mode='copy'):
+    """
+    Place one source image at its destination path.
+
+    Args:
+        src (str): Source image path
+        dst (str): Destination image path
+        mode (str, optional): One of IMAGE_MODES. Defaults to 'copy'.
+    """
+    if mode == 'none':
+        return
+    if mode not in IMAGE_MODES:
+        raise ValueError(f"Unknown image mode '{mode}'. Use one of {', '.join(IMAGE_MODES)}.")
+
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+    if mode == 'hardlink':
+        os.link(src, dst)
+    elif mode == 'symlink':
+        os.symlink(os.path.abspath(src), dst)
+    elif mode == 'reflink':
+        reflink(src, dst)
+    else:
+        fast_copy(src, dst)
+
+
+class ImageMaterializer:
+    """Link or copy images into an output directory on a thread pool."""
+
+    def __init__(self, mode='copy', max_workers=8):
+        """
+        Initialize the materializer.
+
+        Args:
+            mode (str, optional): One of IMAGE_MODES. Defaults to 'copy'.
+            max_workers (int, optional): Number of I/O threads. Defaults to 8.
+        """
+        if mode not in IMAGE_MODES:
+            raise ValueError(f"Unknown image mode '{mode}'. Use one of {', '.join(IMAGE_MODES)}.")
+        self.mode = mode
+        self.failed = []
+        self._executor = None
+        self._futures = []
+        if mode != 'none':
+            # Imported here so the CLI can read IMAGE_MODES without loading concurrent.futures
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def add(self, src, dst):
+        """
+        Schedule one image to be materialized.
+
+        Args:
+            src (str): Source image path
+            dst (str): Destination image path
+        """
+        if self._executor is None:
+            return
+        self._futures.append((src, self._executor.submit(materialize_image, src, dst, self.mode)))
+
+    def close(self):
+        """
+        Wait for all scheduled images and report failures.
+
+        Returns:
+            int: Number of images that could not be materialized
+        """
+        if self._executor is None:
+            return 0
+        for src, future in self._futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error copying image {src}: {str(e)}")
+                self.failed.append(src)
+        self._futures = []
+        self._executor.shutdown()
+        self._executor = None
+        return len(self.failed)
+
+
+def materialize_images(pairs, mode='copy', max_workers=8):
+    """
+    Materialize many (source, destination) image pairs concurrently.
+
+    Args:
+        pairs (iterable): (src, dst) path pairs
+        mode (str, optional): One of IMAGE_MODES. Defaults to 'copy'.
+        max_workers (int, optional): Number of I/O threads. Defaults to 8.
+
+    Returns:
+        int: Number of images that could not be materialized
+    """
+    with ImageMaterializer(mode, max_workers) as materializer:
+        for src, dst in pairs:
+            materializer.add(src, dst)
+    return len(materializer.failed)
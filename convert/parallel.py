@@ -0,0 +1,54 @@
+"""
+Process-pool helpers shared by the per-file converters.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def resolve_workers(workers):
+    """
+    Resolve a --workers value to a process count.
+
+    Args:
+        workers (int): Requested number of workers; 0 or negative means one per CPU
+
+    Returns:
+        int: Number of worker processes to use (1 means run serially)
+    """
+    if workers is None:
+        return 1
+    if workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def parallel_map(func, items, workers=1, chunksize=None):
+    """
+    Apply a function to every item, optionally fanned out to a process pool.
+
+    Results are yielded in input order, so callers that assign ids while
+    consuming them get exactly the ids of a serial run.
+
+    Args:
+        func (callable): Picklable (module-level) function taking one item
+        items (list): Items to process
+        workers (int, optional): Number of worker processes. Defaults to 1 (serial).
+        chunksize (int, optional): Items sent to a worker per task. Defaults to
+            a size that gives each worker a few batches.
+
+    Yields:
+        The result of func(item) for each item, in order
+    """
+    items = list(items)
+    workers = min(resolve_workers(workers), max(len(items), 1))
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    if chunksize is None:
+        chunksize = max(1, min(256, len(items) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(func, items, chunksize=chunksize):
+            yield result
@@ -0,0 +1,271 @@
+"""
+Photometric augmentation on 256-entry lookup tables.
+
+Brightness, contrast and gamma map every 8-bit channel value through one
+table; hue, saturation and value map the channels of the HSV image through
+per-channel tables. Tables are cached per parameter, and consecutive steps
+of the same kind are fused into a single table, so a chain costs one
+cv2.LUT call (plus one HSV round trip for the HSV steps) whatever its
+length. Noise adds a window of a fixed, cached Gaussian pool in a single pass
+instead of drawing fresh random numbers for every pixel; the window depends
+only on the seed, so the same seed gives the same noise in every process.
+
+Usage:
+    image_aug = apply_photometric(image, [Brightness(20), Gamma(0.8), Saturation(1.2)])
+"""
+
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+_IDENTITY = np.arange(256, dtype=np.float64)
+
+# 8-bit OpenCV hue is in [0, 180)
+_HUE_RANGE = 180
+
+# Unit Gaussian samples reused by Noise, stored twice in a row so any window wraps around
+_NOISE_SEED = 0
+_NOISE_POOL_SIZE = 1 << 20
+_noise_pool = None
+
+
+def _to_table(values):
+    """Round and saturate 256 float values into a read-only uint8 table, safe to share from the cache."""
+    table = np.clip(np.rint(values), 0, 255).astype(np.uint8)
+    table.flags.writeable = False
+    return table
+
+
+@lru_cache(maxsize=None)
+def brightness_table(delta):
+    """Return the table adding delta to every value."""
+    return _to_table(_IDENTITY + delta)
+
+
+@lru_cache(maxsize=None)
+def contrast_table(factor):
+    """Return the table scaling the distance of every value to mid-gray by factor."""
+    return _to_table((_IDENTITY - 127.5) * factor + 127.5)
+
+
+@lru_cache(maxsize=None)
+def gamma_table(gamma):
+    """Return the table raising normalized values to the power gamma; gamma < 1 brightens."""
+    return _to_table(255.0 * (_IDENTITY / 255.0) ** gamma)
+
+
+@lru_cache(maxsize=None)
+def hue_table(shift):
+    """Return the table rotating 8-bit OpenCV hues by shift, wrapping around at 180."""
+    table = _IDENTITY.copy()
+    table[:_HUE_RANGE] = (_IDENTITY[:_HUE_RANGE] + shift) % _HUE_RANGE
+    return _to_table(table)
+
+
+@lru_cache(maxsize=None)
+def scale_table(factor):
+    """Return the table multiplying every value by factor."""
+    return _to_table(_IDENTITY * factor)
+
+
+class PhotometricStep:
+    """Base class of steps that change pixel values but not geometry."""
+
+    def apply(self, image):
+        """
+        Apply the step on its own.
+
+        Args:
+            image (numpy.ndarray): 8-bit image
+
+        Returns:
+            numpy.ndarray: New image
+        """
+        return apply_photometric(image, [self])
+
+
+class LUTStep(PhotometricStep):
+    """Step mapping every channel through the same table."""
+
+    def table(self):
+        raise NotImplementedError
+
+
+class HSVStep(PhotometricStep):
+    """Step mapping one channel of the HSV image through a table."""
+
+    channel = None
+
+    def table(self):
+        raise NotImplementedError
+
+
+class Brightness(LUTStep):
+    """Add a constant to every value."""
+
+    def __init__(self, delta):
+        self.delta = delta
+
+    def table(self):
+        return brightness_table(self.delta)
+
+
+class Contrast(LUTStep):
+    """Stretch (factor > 1) or flatten (factor < 1) values around mid-gray."""
+
+    def __init__(self, factor):
+        self.factor = factor
+
+    def table(self):
+        return contrast_table(self.factor)
+
+
+class Gamma(LUTStep):
+    """Apply a gamma curve; gamma < 1 brightens and gamma > 1 darkens."""
+
+    def __init__(self, gamma):
+        self.gamma = gamma
+
+    def table(self):
+        return gamma_table(self.gamma)
+
+
+class Hue(HSVStep):
+    """Rotate hues by a shift in 8-bit OpenCV units (2 degrees each)."""
+
+    channel = 0
+
+    def __init__(self, shift):
+        self.shift = shift
+
+    def table(self):
+        return hue_table(self.shift)
+
+
+class Saturation(HSVStep):
+    """Scale the saturation."""
+
+    channel = 1
+
+    def __init__(self, factor):
+        self.factor = factor
+
+    def table(self):
+        return scale_table(self.factor)
+
+
+class Value(HSVStep):
+    """Scale the HSV value."""
+
+    channel = 2
+
+    def __init__(self, factor):
+        self.factor = factor
+
+    def table(self):
+        return scale_table(self.factor)
+
+
+class Noise(PhotometricStep):
+    """Add Gaussian noise."""
+
+    def __init__(self, sigma, seed=0):
+        """
+        Initialize the step.
+
+        Args:
+            sigma (float): Standard deviation in 8-bit levels
+            seed (int, optional): Picks the noise pattern. Defaults to 0.
+        """
+        self.sigma = sigma
+        self.seed = seed
+
+    def apply(self, image):
+        return add_noise(image, self.sigma, self.seed)
+
+
+def _get_noise_pool():
+    """Return the unit Gaussian pool, _NOISE_POOL_SIZE samples repeated twice."""
+    global _noise_pool
+    if _noise_pool is None:
+        samples = np.random.default_rng(_NOISE_SEED).standard_normal(_NOISE_POOL_SIZE, dtype=np.float32)
+        _noise_pool = np.concatenate([samples, samples])
+    return _noise_pool
+
+
+def add_noise(image, sigma, seed=0):
+    """
+    Add Gaussian noise using a window of a cached pool of samples.
+
+    Images larger than the pool repeat the window.
+
+    Args:
+        image (numpy.ndarray): 8-bit image
+        sigma (float): Standard deviation in 8-bit levels
+        seed (int, optional): Picks the window. Defaults to 0.
+
+    Returns:
+        numpy.ndarray: New image
+    """
+    pool = _get_noise_pool()
+    offset = int(np.random.default_rng(seed).integers(0, _NOISE_POOL_SIZE))
+    if image.size <= _NOISE_POOL_SIZE:
+        noise = pool[offset:offset + image.size]
+    else:
+        noise = np.resize(pool[offset:offset + _NOISE_POOL_SIZE], image.size)
+    return cv2.addWeighted(image, 1.0, noise.reshape(image.shape), float(sigma), 0.0, dtype=cv2.CV_8U)
+
+
+def _apply_lut(image, tables):
+    """Apply a fused chain of single tables."""
+    table = tables[0]
+    for other in tables[1:]:
+        table = other[table]
+    return cv2.LUT(image, table)
+
+
+def _apply_hsv(image, steps):
+    """Apply a fused chain of HSV steps with one color conversion each way."""
+    if image.ndim == 2 or image.shape[2] == 1:
+        # No hue or saturation without color, the value is the gray level itself
+        tables = [step.table() for step in steps if step.channel == 2]
+        return _apply_lut(image, tables) if tables else image
+    tables = np.tile(np.arange(256, dtype=np.uint8)[:, None], (1, 3))
+    for step in steps:
+        tables[:, step.channel] = step.table()[tables[:, step.channel]]
+    hsv = cv2.cvtColor(image[..., :3], cv2.COLOR_BGR2HSV)
+    result = cv2.cvtColor(cv2.LUT(hsv, tables.reshape(256, 1, 3)), cv2.COLOR_HSV2BGR)
+    if image.shape[2] > 3:
+        result = np.concatenate([result, image[..., 3:]], axis=2)
+    return result
+
+
+def apply_photometric(image, steps):
+    """
+    Apply photometric steps in order, fusing runs of the same kind.
+
+    Args:
+        image (numpy.ndarray): 8-bit BGR or grayscale image
+        steps (list): PhotometricStep objects
+
+    Returns:
+        numpy.ndarray: New image, or the input itself if steps is empty
+    """
+    index = 0
+    while index < len(steps):
+        step = steps[index]
+        if isinstance(step, (LUTStep, HSVStep)):
+            kind = LUTStep if isinstance(step, LUTStep) else HSVStep
+            end = index
+            while end < len(steps) and isinstance(steps[end], kind):
+                end += 1
+            if kind is LUTStep:
+                image = _apply_lut(image, [s.table() for s in steps[index:end]])
+            else:
+                image = _apply_hsv(image, steps[index:end])
+            index = end
+        else:
+            image = step.apply(image)
+            index += 1
+    return image
@@ -0,0 +1,626 @@
+"""
+TFRecord files of tf.train.Example protos without TensorFlow.
+
+The Example, Features, Feature and BytesList/FloatList/Int64List messages
+are built from the tensorflow/core/example/*.proto definitions with plain
+protobuf, so they serialize to exactly the bytes tf.train.Example does.
+Records are framed like tf.io.TFRecordWriter writes them:
+
+    uint64 length | uint32 masked crc32c(length) | data | uint32 masked crc32c(data)
+
+CRC32C uses google-crc32c or crc32c when one is installed and a
+numpy implementation that checksums many lanes of the data at once
+otherwise.
+
+Uncompressed files can get a sidecar index of record offsets (<file>.index),
+written by TFRecordWriter(..., write_index=True) or afterwards by
+build_index(), which TFRecordReader uses to read any record or range of
+records without scanning the file:
+
+    python -m convert.tfrecord train.record-*
+
+Usage:
+    example = tfrecord.Example(features=tfrecord.Features(feature={
+        'image/encoded': tfrecord.bytes_feature(encoded_jpg),
+        'image/object/class/label': tfrecord.int64_list_feature([1, 2]),
+    }))
+    with tfrecord.TFRecordWriter('train.record') as writer:
+        writer.write(example.SerializeToString())
+
+    reader = tfrecord.TFRecordReader('train.record')
+    example = tfrecord.Example.FromString(reader[800000])
+"""
+
+import os
+import re
+import gzip
+import zlib
+import array
+import struct
+import argparse
+
+import numpy as np
+from google.protobuf import descriptor_pb2, descriptor_pool
+
+COMPRESSION_TYPES = ('NONE', 'GZIP', 'ZLIB')
+
+INDEX_SUFFIX = '.index'
+
+# Index layout: magic, then little-endian uint64 offsets of every record and of the end of the file
+_INDEX_MAGIC = b'2LTFIDX1'
+
+# Record framing: uint64 length + uint32 crc before the data, uint32 crc after it
+_HEADER_SIZE = 12
+_FOOTER_SIZE = 4
+
+# Largest block read at once by TFRecordReader.read_range()
+_RANGE_BLOCK_SIZE = 64 << 20
+
+_FIELD = descriptor_pb2.FieldDescriptorProto
+
+
+def _build_example_classes():
+    """Create the Example message classes from their proto definitions."""
+    file_proto = descriptor_pb2.FileDescriptorProto(
+        name="2label/tensorflow/core/example/example.proto", package="tensorflow", syntax="proto3")
+
+    def add_message(name, fields, parent=file_proto):
+        message = (parent.message_type if parent is file_proto else parent.nested_type).add(name=name)
+        for number, (field_name, field_type, label, type_name, oneof) in enumerate(fields, 1):
+            field = message.field.add(name=field_name, number=number, type=field_type, label=label)
+            if type_name:
+                field.type_name = type_name
+            if oneof is not None:
+                field.oneof_index = oneof
+            if label == _FIELD.LABEL_REPEATED and field_type in (_FIELD.TYPE_FLOAT, _FIELD.TYPE_INT64):
+                field.options.packed = True
+        return message
+
+    optional, repeated = _FIELD.LABEL_OPTIONAL, _FIELD.LABEL_REPEATED
+    add_message("BytesList", [("value", _FIELD.TYPE_BYTES, repeated, None, None)])
+    add_message("FloatList", [("value", _FIELD.TYPE_FLOAT, repeated, None, None)])
+    add_message("Int64List", [("value", _FIELD.TYPE_INT64, repeated, None, None)])
+    feature = add_message("Feature", [
+        ("bytes_list", _FIELD.TYPE_MESSAGE, optional, ".tensorflow.BytesList", 0),
+        ("float_list", _FIELD.TYPE_MESSAGE, optional, ".tensorflow.FloatList", 0),
+        ("int64_list", _FIELD.TYPE_MESSAGE, optional, ".tensorflow.Int64List", 0),
+    ])
+    feature.oneof_decl.add(name="kind")
+    features = add_message("Features", [
+        ("feature", _FIELD.TYPE_MESSAGE, repeated, ".tensorflow.Features.FeatureEntry", None),
+    ])
+    entry = add_message("FeatureEntry", [
+        ("key", _FIELD.TYPE_STRING, optional, None, None),
+        ("value", _FIELD.TYPE_MESSAGE, optional, ".tensorflow.Feature", None),
+    ], parent=features)
+    entry.options.map_entry = True
+    add_message("Example", [("features", _FIELD.TYPE_MESSAGE, optional, ".tensorflow.Features", None)])
+
+    # A private pool, so loading TensorFlow next to this module does not clash
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(file_proto)
+    try:
+        from google.protobuf.message_factory import GetMessageClass
+    except ImportError:
+        # protobuf < 4.21
+        from google.protobuf.message_factory import MessageFactory
+        GetMessageClass = MessageFactory(pool).GetPrototype
+    return tuple(GetMessageClass(pool.FindMessageTypeByName(f"tensorflow.{name}"))
+                 for name in ("BytesList", "FloatList", "Int64List", "Feature", "Features", "Example"))
+
+
+BytesList, FloatList, Int64List, Feature, Features, Example = _build_example_classes()
+
+
+def int64_feature(value):
+    return Feature(int64_list=Int64List(value=[value]))
+
+
+def int64_list_feature(value):
+    return Feature(int64_list=Int64List(value=value))
+
+
+def bytes_feature(value):
+    return Feature(bytes_list=BytesList(value=[value]))
+
+
+def bytes_list_feature(value):
+    return Feature(bytes_list=BytesList(value=value))
+
+
+def float_feature(value):
+    return Feature(float_list=FloatList(value=[value]))
+
+
+def float_list_feature(value):
+    return Feature(float_list=FloatList(value=value))
+
+
+# CRC-32C (Castagnoli), reflected
+_POLY = 0x82F63B78
+
+
+def _make_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ _POLY if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_TABLE = _make_table()
+_NP_TABLE = np.array(_TABLE, dtype=np.uint32)
+
+# Below this size the plain loop beats the numpy setup cost
+_NUMPY_THRESHOLD = 2048
+
+_shift_tables = {}
+
+
+def _crc32c_python(data, crc=0xFFFFFFFF):
+    table = _TABLE
+    for byte in data:
+        crc = table[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
+
+
+def _get_shift_tables(length):
+    """
+    Return byte tables advancing a CRC register over length zero bytes.
+
+    The register update is linear, so advancing x equals the xor of the
+    advanced bits of x, looked up here one byte of x at a time.
+    """
+    tables = _shift_tables.get(length)
+    if tables is None:
+        basis = np.left_shift(np.uint32(1), np.arange(32, dtype=np.uint32))
+        for _ in range(length):
+            basis = (basis >> np.uint32(8)) ^ _NP_TABLE[basis & np.uint32(0xFF)]
+        values = np.arange(256)
+        tables = []
+        for byte in range(4):
+            table = np.zeros(256, dtype=np.uint32)
+            for bit in range(8):
+                table[(values >> bit) & 1 == 1] ^= basis[8 * byte + bit]
+            tables.append(table.tolist())
+        _shift_tables[length] = tables
+    return tables
+
+
+def _crc32c_numpy(data):
+    """
+    CRC-32C of many equal lanes of the data at once, chained afterwards.
+
+    The data is left-padded with zeros to lanes x length bytes; zeros do not
+    change a zero register, and the initial 0xFFFFFFFF register is applied
+    by inverting the first four data bytes instead.
+    """
+    size = len(data)
+    length = 1
+    while length * length < size:
+        length *= 2
+    lanes = -(-size // length)
+    padding = lanes * length - size
+    buf = np.zeros(lanes * length, dtype=np.uint8)
+    buf[padding:] = np.frombuffer(data, dtype=np.uint8)
+    buf[padding:padding + 4] ^= 0xFF
+    columns = np.ascontiguousarray(buf.reshape(lanes, length).T)
+
+    crcs = np.zeros(lanes, dtype=np.uint32)
+    mask, shift = np.uint32(0xFF), np.uint32(8)
+    for column in columns:
+        crcs = (crcs >> shift) ^ _NP_TABLE[(crcs ^ column) & mask]
+
+    t0, t1, t2, t3 = _get_shift_tables(length)
+    crc = 0
+    for lane_crc in crcs.tolist():
+        crc = t0[crc & 0xFF] ^ t1[(crc >> 8) & 0xFF] ^ t2[(crc >> 16) & 0xFF] ^ t3[crc >> 24] ^ lane_crc
+    return crc ^ 0xFFFFFFFF
+
+
+def _crc32c_fallback(data):
+    if len(data) < _NUMPY_THRESHOLD:
+        return _crc32c_python(data)
+    return _crc32c_numpy(data)
+
+
+def _select_crc32c():
+    """Return the fastest installed CRC-32C function."""
+    try:
+        import google_crc32c
+        if google_crc32c.implementation == "c":
+            return google_crc32c.value
+    except ImportError:
+        pass
+    try:
+        import crc32c
+        return crc32c.crc32c
+    except ImportError:
+        pass
+    return _crc32c_fallback
+
+
+crc32c = _select_crc32c()
+
+
+def masked_crc32c(data):
+    """Return the masked CRC-32C stored in TFRecord framing."""
+    crc = crc32c(data)
+    return (((crc >> 15) | (crc << 17)) + 0xA282EAD8) & 0xFFFFFFFF
+
+
+def _open(path, mode, compression_type):
+    """Open a record file with the given compression."""
+    compression_type = compression_type or 'NONE'
+    if compression_type not in COMPRESSION_TYPES:
+        raise ValueError(f"Unknown compression type '{compression_type}'. Use one of {', '.join(COMPRESSION_TYPES)}.")
+    if compression_type == 'GZIP':
+        return gzip.open(path, mode)
+    if compression_type == 'ZLIB':
+        return _ZlibFile(path, mode)
+    return open(path, mode)
+
+
+class _ZlibFile:
+    """Minimal file object for a zlib-compressed stream, as written by TensorFlow's ZLIB option."""
+
+    def __init__(self, path, mode):
+        self._file = open(path, mode)
+        self._writing = 'w' in mode
+        self._codec = zlib.compressobj() if self._writing else zlib.decompressobj()
+        self._buffer = b''
+
+    def write(self, data):
+        self._file.write(self._codec.compress(data))
+
+    def flush(self):
+        self._file.flush()
+
+    def read(self, size):
+        while len(self._buffer) < size and not self._codec.eof:
+            chunk = self._file.read(1 << 16)
+            if not chunk:
+                break
+            self._buffer += self._codec.decompress(chunk)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def close(self):
+        if self._writing:
+            self._file.write(self._codec.flush())
+        self._file.close()
+
+
+class TFRecordWriter:
+    """Write records in TFRecord framing, a drop-in for tf.io.TFRecordWriter."""
+
+    def __init__(self, path, compression_type=None, write_index=False):
+        """
+        Initialize the writer.
+
+        Args:
+            path (str): Output file
+            compression_type (str, optional): One of COMPRESSION_TYPES. Defaults to no compression.
+            write_index (bool, optional): Write the offset index to path + INDEX_SUFFIX
+                on close. Only possible without compression. Defaults to False.
+        """
+        if write_index and (compression_type or 'NONE') != 'NONE':
+            raise ValueError("Compressed TFRecord files cannot be indexed")
+        self.path = path
+        self._file = _open(path, 'wb', compression_type)
+        self._offsets = array.array('Q', [0]) if write_index else None
+
+    def write(self, record):
+        """
+        Append a record.
+
+        Args:
+            record (bytes): Serialized record, e.g. Example.SerializeToString()
+        """
+        length = struct.pack('<Q', len(record))
+        self._file.write(length + struct.pack('<I', masked_crc32c(length)))
+        self._file.write(record)
+        self._file.write(struct.pack('<I', masked_crc32c(record)))
+        if self._offsets is not None:
+            self._offsets.append(self._offsets[-1] + _HEADER_SIZE + len(record) + _FOOTER_SIZE)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+        if self._offsets is not None:
+            write_index(self._offsets, self.path + INDEX_SUFFIX)
+            self._offsets = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def iter_records(path, compression_type=None, verify=True):
+    """
+    Read the records of a TFRecord file.
+
+    Args:
+        path (str): TFRecord file
+        compression_type (str, optional): One of COMPRESSION_TYPES. Defaults to no compression.
+        verify (bool, optional): Check the CRCs of every record. Defaults to True.
+
+    Yields:
+        bytes: Each record
+    """
+    f = _open(path, 'rb', compression_type)
+    try:
+        while True:
+            header = f.read(12)
+            if not header:
+                return
+            if len(header) < 12:
+                raise ValueError(f"Truncated record header in {path}")
+            length, length_crc = struct.unpack('<QI', header)
+            if verify and masked_crc32c(header[:8]) != length_crc:
+                raise ValueError(f"Corrupted record length in {path}")
+            record = f.read(length)
+            footer = f.read(4)
+            if len(record) < length or len(footer) < 4:
+                raise ValueError(f"Truncated record in {path}")
+            if verify and masked_crc32c(record) != struct.unpack('<I', footer)[0]:
+                raise ValueError(f"Corrupted record data in {path}")
+            yield record
+    finally:
+        f.close()
+
+
+def write_index(offsets, index_path):
+    """
+    Write an offset index file.
+
+    Args:
+        offsets (sequence): Byte offset of every record, followed by the file size
+        index_path (str): Output index file
+    """
+    with open(index_path, 'wb') as f:
+        f.write(_INDEX_MAGIC)
+        f.write(np.asarray(offsets, dtype='<u8').tobytes())
+
+
+def build_index(path, index_path=None):
+    """
+    Index an existing uncompressed TFRecord file in one sequential pass.
+
+    Only the record headers are read; the data is skipped with seeks.
+
+    Args:
+        path (str): TFRecord file
+        index_path (str, optional): Output index file. Defaults to path + INDEX_SUFFIX.
+
+    Returns:
+        int: Number of records
+    """
+    offsets = array.array('Q', [0])
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        position = 0
+        while position < size:
+            header = f.read(_HEADER_SIZE)
+            if len(header) < _HEADER_SIZE:
+                raise ValueError(f"Truncated record header in {path}")
+            length, length_crc = struct.unpack('<QI', header)
+            if masked_crc32c(header[:8]) != length_crc:
+                raise ValueError(f"Corrupted record length at byte {position} of {path}; compressed files cannot be indexed")
+            position += _HEADER_SIZE + length + _FOOTER_SIZE
+            if position > size:
+                raise ValueError(f"Truncated record in {path}")
+            f.seek(position)
+            offsets.append(position)
+    write_index(offsets, index_path or path + INDEX_SUFFIX)
+    return len(offsets) - 1
+
+
+def load_index(index_path):
+    """
+    Map an offset index file into memory.
+
+    Args:
+        index_path (str): Index file
+
+    Returns:
+        numpy.ndarray: Read-only uint64 offsets of every record, followed by the file size
+    """
+    with open(index_path, 'rb') as f:
+        if f.read(len(_INDEX_MAGIC)) != _INDEX_MAGIC:
+            raise ValueError(f"{index_path} is not a TFRecord index")
+    if os.path.getsize(index_path) == len(_INDEX_MAGIC):
+        return np.zeros(1, dtype='<u8')
+    return np.memmap(index_path, dtype='<u8', mode='r', offset=len(_INDEX_MAGIC))
+
+
+def shard_range(num_records, shard_index, num_shards):
+    """
+    Split records into contiguous, nearly equal shards.
+
+    Args:
+        num_records (int): Number of records
+        shard_index (int): Shard to return
+        num_shards (int): Number of shards
+
+    Returns:
+        tuple: (start, stop) record indices of the shard
+    """
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"Shard index {shard_index} is out of range for {num_shards} shards")
+    return num_records * shard_index // num_shards, num_records * (shard_index + 1) // num_shards
+
+
+class TFRecordReader:
+    """Random access to the records of an indexed, uncompressed TFRecord file."""
+
+    def __init__(self, path, index_path=None, verify=True):
+        """
+        Initialize the reader.
+
+        The file is opened on first access, so readers can be pickled and
+        handed to worker processes, which then read their ranges in parallel.
+
+        Args:
+            path (str): TFRecord file
+            index_path (str, optional): Index file. Defaults to path + INDEX_SUFFIX.
+            verify (bool, optional): Check the CRCs of every record read. Defaults to True.
+        """
+        self.path = path
+        self.index_path = index_path or path + INDEX_SUFFIX
+        self.verify = verify
+        if not os.path.exists(self.index_path):
+            raise FileNotFoundError(f"No index for {path}; create it with build_index() "
+                                    f"or python -m convert.tfrecord {path}")
+        self.offsets = load_index(self.index_path)
+        if int(self.offsets[-1]) != os.path.getsize(path):
+            raise ValueError(f"Index {self.index_path} does not match {path}; rebuild it")
+        self._file = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return list(self.read_range(start, stop))
+            return [self[i] for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("record index out of range")
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return self._parse(self._read(start, end - start), 0, end - start)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_file'] = None
+        state['offsets'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.offsets = load_index(self.index_path)
+
+    def _read(self, offset, size):
+        if self._file is None:
+            self._file = open(self.path, 'rb')
+        if hasattr(os, 'pread'):
+            # Independent of the file position, so threads can share the reader
+            return os.pread(self._file.fileno(), size, offset)
+        self._file.seek(offset)
+        return self._file.read(size)
+
+    def _parse(self, buf, start, size):
+        """Return the data of the record framed in buf[start:start + size]."""
+        view = memoryview(buf)[start:start + size]
+        length, length_crc = struct.unpack_from('<QI', view)
+        if length != size - _HEADER_SIZE - _FOOTER_SIZE:
+            raise ValueError(f"Index {self.index_path} does not match {self.path}; rebuild it")
+        record = bytes(view[_HEADER_SIZE:_HEADER_SIZE + length])
+        if self.verify:
+            data_crc, = struct.unpack_from('<I', view, _HEADER_SIZE + length)
+            if masked_crc32c(view[:8]) != length_crc or masked_crc32c(record) != data_crc:
+                raise ValueError(f"Corrupted record in {self.path}")
+        return record
+
+    def read_range(self, start, stop):
+        """
+        Read a contiguous range of records with few large reads.
+
+        Args:
+            start (int): First record index
+            stop (int): Index after the last record
+
+        Yields:
+            bytes: Each record
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        offsets = self.offsets
+        index = start
+        while index < stop:
+            # Gather as many records as fit in one block, at least one
+            end = index + 1
+            limit = int(offsets[index]) + _RANGE_BLOCK_SIZE
+            end = max(end, min(stop, int(np.searchsorted(offsets, limit, side='right')) - 1))
+            block_start = int(offsets[index])
+            block = self._read(block_start, int(offsets[end]) - block_start)
+            for i in range(index, end):
+                yield self._parse(block, int(offsets[i]) - block_start, int(offsets[i + 1] - offsets[i]))
+            index = end
+
+    def iter_shard(self, shard_index, num_shards):
+        """
+        Read one of num_shards contiguous shards, e.g. one per worker.
+
+        Args:
+            shard_index (int): Shard to read
+            num_shards (int): Number of shards
+
+        Yields:
+            bytes: Each record of the shard
+        """
+        return self.read_range(*shard_range(len(self), shard_index, num_shards))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+_ITEM = re.compile(r'item\s*\{([^}]*)\}')
+_ITEM_FIELD = re.compile(r'(\w+)\s*:\s*(?:"((?:[^"\\]|\\.)*)"|\'((?:[^\'\\]|\\.)*)\'|(-?\d+))')
+
+
+def load_label_map(path, use_display_name=False):
+    """
+    Read a TensorFlow Object Detection label map (.pbtxt) file.
+
+    Args:
+        path (str): Label map file with "item { id: 1 name: 'cat' }" entries
+        use_display_name (bool, optional): Key by display_name instead of name. Defaults to False.
+
+    Returns:
+        dict: Label name -> id
+    """
+    with open(path, 'r') as f:
+        text = re.sub(r'^\s*#.*$', '', f.read(), flags=re.MULTILINE)
+    label_map = {}
+    for item in _ITEM.finditer(text):
+        fields = {}
+        for match in _ITEM_FIELD.finditer(item.group(1)):
+            key, double_quoted, single_quoted, number = match.groups()
+            fields[key] = int(number) if number is not None else (double_quoted if double_quoted is not None else single_quoted)
+        name = fields.get('display_name' if use_display_name else 'name')
+        if name is not None and 'id' in fields:
+            label_map[name] = fields['id']
+    return label_map
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Build offset indexes for uncompressed TFRecord files")
+    parser.add_argument('records', nargs='+', help="TFRecord files")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    for record_file in args.records:
+        if record_file.endswith(INDEX_SUFFIX):
+            continue
+        count = build_index(record_file)
+        print(f"Indexed {count} records: {record_file + INDEX_SUFFIX}")
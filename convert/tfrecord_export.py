@@ -0,0 +1,365 @@
+"""
+Convert TFRecord files of Object Detection API Examples to COCO, YOLO or Pascal VOC.
+
+Records are decoded one at a time with convert.tfrecord, without TensorFlow,
+and images are written straight from their image/encoded bytes, so nothing is
+re-encoded. Record files (or, for indexed files, ranges of records) are spread
+over worker processes that decode records and write images; the main process
+only receives the small per-image annotations and writes them as they arrive,
+keeping memory constant in the number of records.
+
+Usage:
+    python -m convert.tfrecord_export --input /path/to/train.record-* --output_dir /path/to/coco --output_format coco
+"""
+
+import os
+import sys
+import glob
+import argparse
+from functools import partial
+
+import cv2
+import numpy as np
+
+from . import tfrecord
+from .utils import ensure_dir, get_image_dimensions_from_bytes
+from .parallel import parallel_map
+from .labels import load_labels
+from .dataset import AnnotationDataset, WRITERS
+from .coco_writer import COCOStreamWriter, default_info
+
+EXPORT_FORMATS = ("coco", "yolo", "voc")
+
+# Records per task when an offset index allows splitting a file
+_CHUNK_RECORDS = 1000
+
+_RECORD_PATTERNS = ("*.record", "*.record-*", "*.tfrecord", "*.tfrecord-*", "*.tfrecords")
+
+
+def _feature_values(features, key):
+    """Return the values of a feature, or an empty list if it is missing."""
+    if key not in features:
+        return []
+    feature = features[key]
+    kind = feature.WhichOneof("kind")
+    return list(getattr(feature, kind).value) if kind else []
+
+
+def mask_to_polygons(encoded_mask):
+    """
+    Trace the outlines of a PNG encoded instance mask.
+
+    Args:
+        encoded_mask (bytes): PNG image with non-zero object pixels
+
+    Returns:
+        list: COCO polygons, flat [x1, y1, x2, y2, ...] lists
+    """
+    mask = cv2.imdecode(np.frombuffer(encoded_mask, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if mask is None:
+        return []
+    contours, _ = cv2.findContours((mask > 0).astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return [contour.reshape(-1).astype(float).tolist() for contour in contours if len(contour) >= 3]
+
+
+def decode_example(record, label_names=None, include_masks=True):
+    """
+    Decode a serialized Object Detection API Example.
+
+    Args:
+        record (bytes): Serialized tf.train.Example
+        label_names (dict, optional): Class id -> name, used when the record has no class text
+        include_masks (bool, optional): Trace image/object/mask into polygons. Defaults to True.
+
+    Returns:
+        dict: file_name, width, height, encoded image bytes and the objects'
+            labels, absolute [xmin, ymin, xmax, ymax] boxes, polygons (lists,
+            empty without masks), iscrowd flags and areas (None if not stored)
+    """
+    features = tfrecord.Example.FromString(record).features.feature
+    encoded = b"".join(_feature_values(features, "image/encoded"))
+    width = (_feature_values(features, "image/width") or [0])[0]
+    height = (_feature_values(features, "image/height") or [0])[0]
+    if (not width or not height) and encoded:
+        width, height = get_image_dimensions_from_bytes(encoded)
+
+    file_name = b"".join(_feature_values(features, "image/filename")).decode("utf8")
+    if not file_name:
+        source_id = b"".join(_feature_values(features, "image/source_id")).decode("utf8")
+        image_format = b"".join(_feature_values(features, "image/format")).decode("utf8") or "jpg"
+        file_name = f"{source_id or 'image'}.{image_format}"
+
+    texts = [text.decode("utf8") for text in _feature_values(features, "image/object/class/text")]
+    class_ids = _feature_values(features, "image/object/class/label")
+    if not texts:
+        label_names = label_names or {}
+        texts = [label_names.get(class_id, str(class_id)) for class_id in class_ids]
+
+    xmins = np.asarray(_feature_values(features, "image/object/bbox/xmin"), dtype=np.float64)
+    ymins = np.asarray(_feature_values(features, "image/object/bbox/ymin"), dtype=np.float64)
+    xmaxs = np.asarray(_feature_values(features, "image/object/bbox/xmax"), dtype=np.float64)
+    ymaxs = np.asarray(_feature_values(features, "image/object/bbox/ymax"), dtype=np.float64)
+    boxes = np.stack([xmins * width, ymins * height, xmaxs * width, ymaxs * height], axis=1)
+
+    num_objects = len(boxes)
+    masks = _feature_values(features, "image/object/mask") if include_masks else []
+    polygons = [mask_to_polygons(mask) for mask in masks] if len(masks) == num_objects else [[]] * num_objects
+    iscrowd = _feature_values(features, "image/object/is_crowd") or [0] * num_objects
+    areas = _feature_values(features, "image/object/area") or [None] * num_objects
+
+    return {
+        "file_name": file_name,
+        "width": int(width),
+        "height": int(height),
+        "encoded": encoded,
+        "labels": texts[:num_objects],
+        "boxes": boxes.tolist(),
+        "polygons": polygons,
+        "iscrowd": [int(flag) for flag in iscrowd],
+        "areas": areas,
+    }
+
+
+def list_record_files(input_path):
+    """
+    Resolve a TFRecord file, glob pattern or directory of record files.
+
+    Args:
+        input_path (str): File, glob pattern or directory
+
+    Returns:
+        list: Sorted record files, without index files
+    """
+    if os.path.isdir(input_path):
+        paths = [path for pattern in _RECORD_PATTERNS for path in glob.glob(os.path.join(input_path, pattern))]
+    elif os.path.isfile(input_path):
+        paths = [input_path]
+    else:
+        paths = glob.glob(input_path)
+    return sorted(set(path for path in paths if not path.endswith(tfrecord.INDEX_SUFFIX)))
+
+
+def plan_tasks(record_files, compression=None, chunk_records=_CHUNK_RECORDS):
+    """
+    Split record files into worker tasks.
+
+    Indexed, uncompressed files are split into ranges of records; other files
+    are read sequentially as a whole.
+
+    Args:
+        record_files (list): TFRecord files
+        compression (str, optional): One of tfrecord.COMPRESSION_TYPES
+        chunk_records (int, optional): Records per range
+
+    Returns:
+        list: (path, compression, start, stop) tasks; start and stop are None for whole files
+    """
+    tasks = []
+    for path in record_files:
+        if (compression or "NONE") == "NONE" and os.path.exists(path + tfrecord.INDEX_SUFFIX):
+            with tfrecord.TFRecordReader(path) as reader:
+                num_records = len(reader)
+            for start in range(0, num_records, chunk_records):
+                tasks.append((path, compression, start, min(start + chunk_records, num_records)))
+        else:
+            tasks.append((path, compression, None, None))
+    return tasks
+
+
+def export_task(task, output_dir, label_names=None, include_masks=True, write_images=True):
+    """
+    Decode the records of one task and write their images.
+
+    Args:
+        task (tuple): (path, compression, start, stop) from plan_tasks()
+        output_dir (str): Directory receiving the images
+        label_names (dict, optional): Class id -> name for records without class text
+        include_masks (bool, optional): Trace masks into polygons. Defaults to True.
+        write_images (bool, optional): Write image/encoded to output_dir. Defaults to True.
+
+    Returns:
+        list: Decoded examples without their image bytes
+
+    Raises:
+        RuntimeError: If a record cannot be read or decoded, or an image cannot be written
+    """
+    path, compression, start, stop = task
+    examples = []
+    try:
+        if start is None:
+            _export_records(tfrecord.iter_records(path, compression), examples, output_dir, label_names,
+                            include_masks, write_images)
+        else:
+            with tfrecord.TFRecordReader(path) as reader:
+                _export_records(reader.read_range(start, stop), examples, output_dir, label_names,
+                                include_masks, write_images)
+    except Exception as e:
+        raise RuntimeError(f"Error reading TFRecord file {path}: {str(e)}") from e
+    return examples
+
+
+def image_output_path(output_dir, file_name):
+    """
+    Resolve the output path of an image, creating its parent directories.
+
+    Args:
+        output_dir (str): Output directory
+        file_name (str): image/filename of a record, possibly with subdirectories
+
+    Returns:
+        str: Path of the image inside output_dir
+
+    Raises:
+        ValueError: If file_name is absolute or points outside output_dir
+    """
+    root = os.path.abspath(output_dir)
+    image_path = os.path.abspath(os.path.join(root, file_name))
+    if os.path.isabs(file_name) or os.path.commonpath([root, image_path]) != root or image_path == root:
+        raise ValueError(f"Image file name {file_name!r} points outside the output directory")
+    # Workers may create the same directory concurrently
+    os.makedirs(os.path.dirname(image_path), exist_ok=True)
+    return image_path
+
+
+def _export_records(records, examples, output_dir, label_names, include_masks, write_images):
+    """Decode records one at a time, writing their images and collecting their annotations."""
+    for record in records:
+        example = decode_example(record, label_names, include_masks)
+        encoded = example.pop("encoded")
+        # Also checked without images, the YOLO and VOC files go next to them
+        image_path = image_output_path(output_dir, example["file_name"])
+        if write_images and encoded:
+            with open(image_path, "wb") as f:
+                f.write(encoded)
+        examples.append(example)
+
+
+def _write_coco_examples(writer, labels, examples):
+    """Stream decoded examples into a COCO writer."""
+    for example in examples:
+        image_id = writer.num_images + 1
+        writer.add_image({"id": image_id, "file_name": example["file_name"],
+                          "width": example["width"], "height": example["height"], "license": 1})
+        for label, box, polygons, iscrowd, area in zip(example["labels"], example["boxes"], example["polygons"],
+                                                       example["iscrowd"], example["areas"]):
+            xmin, ymin, xmax, ymax = box
+            width, height = xmax - xmin, ymax - ymin
+            writer.add_annotation({
+                "id": writer.num_annotations + 1,
+                "image_id": image_id,
+                "category_id": labels.add(label),
+                "segmentation": polygons or [[xmin, ymin, xmax, ymin, xmax, ymax, xmin, ymax]],
+                "area": area if area is not None else width * height,
+                "bbox": [xmin, ymin, width, height],
+                "iscrowd": iscrowd
+            })
+
+
+def _write_dataset_examples(output_format, output_dir, labels, examples):
+    """Write decoded examples with the YOLO or VOC dataset writer."""
+    if not examples:
+        return  # empty record file or shard
+    for example in examples:
+        for label in example["labels"]:
+            labels.add(label)
+    dataset = AnnotationDataset(labels.names)
+    for example in examples:
+        image_id = dataset.add_image(example["file_name"], example["width"], example["height"])
+        for label, box in zip(example["labels"], example["boxes"]):
+            dataset.add_annotation(image_id, label, box=box)
+    WRITERS[output_format](dataset, output_dir)
+
+
+def tfrecord_export(input_path, output_dir, output_format="coco", workers=1, compression=None, classes_file=None,
+                    label_map=None, include_masks=True, write_images=True, compact=False):
+    """
+    Convert TFRecord files to COCO, YOLO or Pascal VOC.
+
+    Args:
+        input_path (str): TFRecord file, glob pattern or directory of record files
+        output_dir (str): Output directory; COCO annotations go to annotations.json in it
+        output_format (str, optional): One of EXPORT_FORMATS. Defaults to "coco".
+        workers (int, optional): Number of worker processes (0 = one per CPU). Defaults to 1.
+        compression (str, optional): Record compression, one of tfrecord.COMPRESSION_TYPES
+        classes_file (str, optional): classes.txt, obj.names or labelmap.txt fixing the class id order
+        label_map (str, optional): Label map .pbtxt naming class ids of records without class text
+        include_masks (bool, optional): Convert instance masks to COCO polygons. Defaults to True.
+        write_images (bool, optional): Write the encoded images to output_dir. Defaults to True.
+        compact (bool, optional): Write COCO JSON without whitespace. Defaults to False.
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        if output_format not in EXPORT_FORMATS:
+            print(f"Unsupported output format: {output_format}")
+            return False
+        record_files = list_record_files(input_path)
+        if not record_files:
+            print(f"No TFRecord files found at {input_path}")
+            return False
+
+        ensure_dir(output_dir)
+        label_names = None
+        if label_map:
+            label_names = {label_id: name for name, label_id in tfrecord.load_label_map(label_map).items()}
+        labels = load_labels(classes_file, start=1 if output_format == "coco" else 0)
+        tasks = plan_tasks(record_files, compression)
+        print(f"Reading {len(record_files)} TFRecord files in {len(tasks)} tasks...")
+
+        export_file = partial(export_task, output_dir=output_dir, label_names=label_names,
+                              include_masks=include_masks, write_images=write_images)
+        writer = None
+        if output_format == "coco":
+            categories = []
+            writer = COCOStreamWriter(os.path.join(output_dir, "annotations.json"),
+                                      info=default_info("Converted from TFRecord by 2Label"),
+                                      categories=categories, compact=compact)
+
+        num_images = num_annotations = 0
+        try:
+            for examples in parallel_map(export_file, tasks, workers, chunksize=1):
+                if writer is not None:
+                    _write_coco_examples(writer, labels, examples)
+                else:
+                    _write_dataset_examples(output_format, output_dir, labels, examples)
+                num_images += len(examples)
+                num_annotations += sum(len(example["labels"]) for example in examples)
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+
+        if writer is not None:
+            categories.extend(labels.to_categories())
+            writer.close()
+
+        print(f"Conversion complete. {num_images} images and {num_annotations} annotations saved to {output_dir}")
+        return True
+
+    except Exception as e:
+        print(f"Error during conversion: {str(e)}")
+        return False
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Convert TFRecord files to COCO, YOLO or Pascal VOC")
+    parser.add_argument('--input', required=True, help="TFRecord file, glob pattern or directory of record files")
+    parser.add_argument('--output_dir', required=True, help="Output directory")
+    parser.add_argument('--output_format', choices=EXPORT_FORMATS, default="coco", help="Output format")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes (0 = one per CPU)")
+    parser.add_argument('--compression', choices=tfrecord.COMPRESSION_TYPES, default="NONE", help="Record compression")
+    parser.add_argument('--classes_file', help="classes.txt, obj.names or labelmap.txt fixing the class id order")
+    parser.add_argument('--label_map', help="Label map .pbtxt naming the class ids of records without class text")
+    parser.add_argument('--no_masks', action='store_true', help="Do not convert instance masks to COCO polygons")
+    parser.add_argument('--no_images', action='store_true', help="Only write annotations, not the encoded images")
+    parser.add_argument('--compact', action='store_true', help="Write the COCO file without indentation")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not tfrecord_export(args.input, args.output_dir, args.output_format, args.workers, args.compression,
+                           args.classes_file, args.label_map, not args.no_masks, not args.no_images, args.compact):
+        sys.exit(1)
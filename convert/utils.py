@@ -3,10 +3,13 @@ Utility functions for annotation format conversions.
 """
 
 import os
-import json
+import io
 import shutil
 import base64
-from PIL import Image
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from . import jsonio
 
 
 def ensure_dir(directory):
@@ -42,10 +45,97 @@ def clean_dir(directory):
         return True
 
 
+# JPEG start-of-frame markers carry the image size; C4, C8 and CC are not SOF
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _probe_jpeg(f):
+    """Walk JPEG marker segments until a start-of-frame marker and read its size."""
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        # Standalone markers have no length field
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if marker in _JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        f.seek(length - 2, io.SEEK_CUR)
+
+
+def probe_image_dimensions(f):
+    """
+    Read image dimensions from the header of a JPEG, PNG, GIF or BMP stream.
+    
+    Only the first few hundred bytes are read (JPEG may skip over metadata
+    segments to reach its start-of-frame marker).
+    
+    Args:
+        f: Seekable binary file object positioned at the start of the image
+        
+    Returns:
+        tuple: (width, height), or None if the format is not recognized
+    """
+    head = f.read(26)
+    if head.startswith(b"\xff\xd8"):
+        return _probe_jpeg(f)
+    if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+        return struct.unpack(">II", head[16:24])
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return struct.unpack("<HH", head[6:10])
+    if head.startswith(b"BM") and len(head) >= 26:
+        header_size = struct.unpack("<I", head[14:18])[0]
+        if header_size == 12:
+            return struct.unpack("<HH", head[18:22])
+        width, height = struct.unpack("<ii", head[18:26])
+        # Negative height marks a top-down bitmap
+        return width, abs(height)
+    return None
+
+
+def get_image_dimensions_from_bytes(data):
+    """
+    Get the dimensions of an encoded image held in memory.
+    
+    Args:
+        data (bytes): Encoded image bytes (the whole file or at least its header)
+        
+    Returns:
+        tuple: (width, height) of the image
+    """
+    try:
+        size = probe_image_dimensions(io.BytesIO(data))
+        if size is None:
+            from PIL import Image
+            with Image.open(io.BytesIO(data)) as img:
+                size = img.size
+        return size
+    except Exception as e:
+        raise Exception(f"Failed to get image dimensions from image data: {str(e)}")
+
+
 def get_image_dimensions(image_path):
     """
     Get the dimensions of an image.
     
+    Sizes come from the shared image catalog (convert.catalog) while the file
+    is unchanged; otherwise JPEG, PNG, GIF and BMP sizes are read from the
+    file header and other formats fall back to PIL.
+    
     Args:
         image_path: Path to the image file
         
@@ -53,12 +143,40 @@ def get_image_dimensions(image_path):
         tuple: (width, height) of the image
     """
     try:
-        with Image.open(image_path) as img:
-            return img.size
+        from .catalog import image_info
+        info = image_info(image_path)
+        if info.width is None:
+            raise ValueError("not a readable image")
+        return info.width, info.height
     except Exception as e:
         raise Exception(f"Failed to get image dimensions for {image_path}: {str(e)}")
 
 
+def get_image_dimensions_batch(image_paths, max_workers=16):
+    """
+    Get the dimensions of many images concurrently.
+    
+    Header probes are dominated by open/read latency, so a thread pool overlaps
+    them well on network-mounted storage.
+    
+    Args:
+        image_paths (list): Paths to the image files
+        max_workers (int, optional): Number of threads. Defaults to 16.
+        
+    Returns:
+        list: (width, height) per path, in input order; None for unreadable images
+    """
+    def probe(image_path):
+        try:
+            return get_image_dimensions(image_path)
+        except Exception as e:
+            print(f"Warning: {str(e)}")
+            return None
+            
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(probe, image_paths))
+
+
 def image_to_base64(image_path):
     """
     Convert an image to base64 encoding.
@@ -78,20 +196,21 @@ def image_to_base64(image_path):
         raise Exception(f"Failed to convert image to base64 for {image_path}: {str(e)}")
 
 
-def save_json(data, json_path):
+def save_json(data, json_path, compact=False):
     """
     Save data as JSON file.
     
     Args:
         data: Data to save as JSON
         json_path: Path to save the JSON file
+        compact (bool, optional): Write without whitespace. Defaults to False.
         
     Returns:
         bool: True if successful
     """
     try:
-        with open(json_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        with open(json_path, 'w', encoding='utf-8') as f:
+            jsonio.dump(data, f, compact)
         return True
     except Exception as e:
         raise Exception(f"Failed to save JSON to {json_path}: {str(e)}")
@@ -108,7 +227,7 @@ def load_json(json_path):
         dict: Loaded JSON data
     """
     try:
-        with open(json_path, 'r') as f:
-            return json.load(f)
+        with open(json_path, 'rb') as f:
+            return jsonio.load(f)
     except Exception as e:
         raise Exception(f"Failed to load JSON from {json_path}: {str(e)}")
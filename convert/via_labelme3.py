@@ -7,14 +7,14 @@ Usage:
 
 import os
 import sys
-import json
 import argparse
-import shutil
 from xml.dom import minidom
-from PIL import Image
-from pathlib import Path
+from functools import partial
 
-from .utils import ensure_dir, clean_dir
+from . import jsonio
+from .utils import ensure_dir, clean_dir, get_image_dimensions
+from .parallel import parallel_map
+from .materialize import IMAGE_MODES, ImageMaterializer
 
 
 def create_xml_document(img_name, img_width, img_height, regions):
@@ -181,13 +181,73 @@ def create_xml_document(img_name, img_width, img_height, regions):
     return root
 
 
-def via_to_labelme3(input_dir, output_dir="dst"):
+def _convert_via_image(item, input_dir, output_dir, total):
+    """
+    Convert one VIA image entry to a LabelMe 3.0 XML file.
+    
+    Args:
+        item (tuple): (index, (image_key, image_data)) from the VIA project
+        input_dir (str): Directory containing VIA JSON file and images
+        output_dir (str): Output directory for LabelMe 3.0 files
+        total (int): Number of images in the VIA project, for progress output
+        
+    Returns:
+        tuple: (source_image_path, output_image_path) to materialize, or None if skipped
+    """
+    i, (image_key, image_data) = item
+    try:
+        # Get image filename
+        img_name = image_data.get('filename')
+        if not img_name:
+            print(f"Warning: Image at index {i} has no filename. Skipping.")
+            return None
+            
+        print(f"Processing image {i+1}/{total}: {img_name}")
+        
+        # Get image dimensions
+        img_path = os.path.join(input_dir, img_name)
+        if not os.path.exists(img_path):
+            print(f"Warning: Image file {img_path} not found. Skipping.")
+            return None
+            
+        try:
+            img_width, img_height = get_image_dimensions(img_path)
+        except Exception as e:
+            print(f"Warning: Failed to open image {img_path}: {str(e)}. Skipping.")
+            return None
+            
+        # Get regions
+        regions = image_data.get('regions', [])
+        if not regions:
+            print(f"Warning: No annotations found for {img_name}. Skipping.")
+            return None
+            
+        # Create XML document
+        xml_doc = create_xml_document(img_name, img_width, img_height, regions)
+        
+        # Save XML file
+        xml_filename = os.path.splitext(img_name)[0] + '.xml'
+        xml_path = os.path.join(output_dir, xml_filename)
+        
+        with open(xml_path, 'w') as f:
+            f.write(xml_doc.toprettyxml())
+            
+        return img_path, os.path.join(output_dir, img_name)
+        
+    except Exception as e:
+        print(f"Error processing image {image_key}: {str(e)}")
+        return None
+
+
+def via_to_labelme3(input_dir, output_dir="dst", workers=1, image_mode="copy"):
     """
     Convert VIA JSON format to LabelMe 3.0 XML format.
     
     Args:
         input_dir (str): Directory containing VIA JSON file and images
         output_dir (str, optional): Output directory for LabelMe 3.0 files. Defaults to "dst".
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        image_mode (str, optional): copy, hardlink, symlink, reflink or none. Defaults to "copy".
         
     Returns:
         bool: True if successful, False otherwise
@@ -209,8 +269,8 @@ def via_to_labelme3(input_dir, output_dir="dst"):
             
         # Load VIA JSON data
         try:
-            with open(via_json_path, 'r') as f:
-                via_data = json.load(f)
+            with open(via_json_path, 'rb') as f:
+                via_data = jsonio.load(f)
         except Exception as e:
             print(f"Failed to load VIA JSON file: {str(e)}")
             return False
@@ -222,54 +282,12 @@ def via_to_labelme3(input_dir, output_dir="dst"):
         print(f"Processing {len(via_data)} images from VIA project")
         
         # Process each image in VIA data
-        for i, (image_key, image_data) in enumerate(via_data.items()):
-            try:
-                # Get image filename
-                img_name = image_data.get('filename')
-                if not img_name:
-                    print(f"Warning: Image at index {i} has no filename. Skipping.")
-                    continue
-                    
-                print(f"Processing image {i+1}/{len(via_data)}: {img_name}")
-                
-                # Get image dimensions
-                img_path = os.path.join(input_dir, img_name)
-                if not os.path.exists(img_path):
-                    print(f"Warning: Image file {img_path} not found. Skipping.")
-                    continue
-                    
-                try:
-                    with Image.open(img_path) as img:
-                        img_width, img_height = img.size
-                except Exception as e:
-                    print(f"Warning: Failed to open image {img_path}: {str(e)}. Skipping.")
-                    continue
-                    
-                # Get regions
-                regions = image_data.get('regions', [])
-                if not regions:
-                    print(f"Warning: No annotations found for {img_name}. Skipping.")
-                    continue
-                    
-                # Create XML document
-                xml_doc = create_xml_document(img_name, img_width, img_height, regions)
-                
-                # Save XML file
-                xml_filename = os.path.splitext(img_name)[0] + '.xml'
-                xml_path = os.path.join(output_dir, xml_filename)
-                
-                with open(xml_path, 'w') as f:
-                    f.write(xml_doc.toprettyxml())
-                    
-                # Copy image file
-                dst_img_path = os.path.join(output_dir, img_name)
-                try:
-                    Path(img_path).copy(dst_img_path)
-                except Exception as e:
-                    print(f"Warning: Failed to copy image {img_path}: {str(e)}")
-                    
-            except Exception as e:
-                print(f"Error processing image {image_key}: {str(e)}")
+        convert_image = partial(_convert_via_image, input_dir=input_dir,
+                                output_dir=output_dir, total=len(via_data))
+        with ImageMaterializer(image_mode) as images:
+            for pair in parallel_map(convert_image, enumerate(via_data.items()), workers):
+                if pair is not None:
+                    images.add(*pair)
         
         print(f"Conversion complete. Results saved to {output_dir}")
         return True
@@ -284,9 +302,12 @@ def parse_args():
     parser = argparse.ArgumentParser(description="Convert VIA JSON to LabelMe 3.0 XML format")
     parser.add_argument('--input_dir', required=True, help="Directory containing VIA JSON file and images")
     parser.add_argument('--output_dir', default="dst", help="Output directory for LabelMe 3.0 files")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes (0 = one per CPU)")
+    parser.add_argument('--image_mode', '--image-mode', choices=IMAGE_MODES, default="copy",
+                        help="How images are placed in the output directory")
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    via_to_labelme3(args.input_dir, args.output_dir)
\ No newline at end of file
+    via_to_labelme3(args.input_dir, args.output_dir, args.workers, args.image_mode)
\ No newline at end of file
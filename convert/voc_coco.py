@@ -7,49 +7,26 @@ Usage:
 
 import os
 import sys
-import json
 import argparse
 import xml.etree.ElementTree as ET
-from datetime import datetime
 from pathlib import Path
 from PIL import Image
 
 from .utils import ensure_dir
+from .parallel import parallel_map
+from .coco_writer import (COCOStreamWriter, COCOMemoryWriter, default_info, DEFAULT_LICENSES,
+                          load_coco, retained_entries)
+from .manifest import Manifest, manifest_path_for, open_manifest
+from .labels import LabelRegistry, load_labels
 
 
-def get_category_id(label, categories):
-    """
-    Get category ID for a label, creating a new category if it doesn't exist.
-    
-    Args:
-        label (str): The object label
-        categories (list): List of categories
-        
-    Returns:
-        int: Category ID
-    """
-    for category in categories:
-        if category["name"] == label:
-            return category["id"]
-    
-    # Create new category
-    new_id = len(categories) + 1
-    categories.append({
-        "id": new_id,
-        "name": label,
-        "supercategory": "object"
-    })
-    
-    return new_id
-
-
-def parse_voc_xml(xml_file, categories):
+def parse_voc_xml(xml_file, labels):
     """
     Parse VOC XML annotation file.
     
     Args:
         xml_file (str): Path to XML file
-        categories (list): List of categories
+        labels (LabelRegistry): 1-based category registry, extended with new labels
         
     Returns:
         dict: Dictionary with image info and annotations
@@ -95,7 +72,7 @@ def parse_voc_xml(xml_file, categories):
             height = ymax - ymin
             
             # Get category id
-            category_id = get_category_id(label, categories)
+            category_id = labels.add(label)
             
             # Create annotation
             annotation = {
@@ -115,18 +92,53 @@ def parse_voc_xml(xml_file, categories):
         return None, None
 
 
-def voc_to_coco(input_dir, output_file):
+def _parse_voc_file(xml_path):
+    """
+    Parse one VOC XML file with its own local category registry.
+    
+    Args:
+        xml_path (str): Path to XML file
+        
+    Returns:
+        tuple: (image_info, annotations, local_labels)
+    """
+    labels = LabelRegistry(start=1)
+    image_info, annotations = parse_voc_xml(xml_path, labels)
+    return image_info, annotations, labels
+
+
+def voc_to_coco(input_dir, output_file, workers=1, stream=True, incremental=False, classes_file=None,
+                compact=False):
     """
     Convert Pascal VOC format annotations to COCO format.
     
     Args:
         input_dir (str): Directory containing VOC XML files
         output_file (str): Output COCO JSON file
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        stream (bool, optional): Stream the output in constant memory instead of
+            building it in RAM first. Defaults to True.
+        incremental (bool, optional): Only parse XML files that changed since the
+            previous run and patch the existing output_file. Defaults to False.
+        classes_file (str, optional): classes.txt, obj.names or labelmap.txt file
+            fixing the order of the first category ids
+        compact (bool, optional): Write the COCO file without whitespace. Defaults to False.
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
+        labels = load_labels(classes_file, start=1)
+        manifest_path = manifest_path_for(output_file)
+        options = {"input_dir": os.path.abspath(input_dir), "classes": list(labels)}
+        manifest = open_manifest(manifest_path, "voc-to-coco", options, incremental)
+        
+        # The previous output is patched, so it has to be readable
+        previous = load_coco(output_file) if manifest.loaded else None
+        if manifest.loaded and previous is None:
+            print(f"Could not read previous output {output_file}, running a full conversion")
+            manifest = Manifest(manifest_path, "voc-to-coco", options)
+            
         # Ensure output directory exists
         output_dir = os.path.dirname(output_file)
         if output_dir and not os.path.exists(output_dir):
@@ -141,65 +153,73 @@ def voc_to_coco(input_dir, output_file):
             print(f"No VOC XML files found in {input_dir}")
             return False
             
-        print(f"Processing {len(xml_files)} VOC XML files...")
-        
-        # Initialize COCO structure
-        coco_json = {
-            "info": {
-                "description": "Converted from VOC format",
-                "url": "",
-                "version": "1.0",
-                "year": datetime.now().year,
-                "contributor": "2Label",
-                "date_created": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            },
-            "licenses": [
-                {
-                    "id": 1,
-                    "name": "Unknown",
-                    "url": ""
-                }
-            ],
-            "categories": [],
-            "images": [],
-            "annotations": []
-        }
+        # Images of deleted and changed files are dropped; only changed files are parsed again
+        changed_files, deleted_files = manifest.scan(input_dir, xml_files)
+        stale_image_ids = set()
+        for xml_file in deleted_files + changed_files:
+            stale_image_ids.add(manifest.get(xml_file, "image_id"))
+            manifest.forget(xml_file, remove_outputs=False)
+        if manifest.loaded:
+            print(f"Incremental run: {len(changed_files)} changed, {len(deleted_files)} deleted, "
+                  f"{len(xml_files) - len(changed_files)} unchanged")
+            
+        print(f"Processing {len(changed_files)} VOC XML files...")
+        
+        # Initialize COCO writer; categories are written last
+        categories = []
+        writer_class = COCOStreamWriter if stream else COCOMemoryWriter
         
         image_id = 1
         annotation_id = 1
+        retained_images, retained_annotations = [], []
+        if previous is not None:
+            # Keep the category ids and the entries of unchanged files from the previous run
+            names = [category["name"] for category in sorted(previous["categories"], key=lambda c: c["id"])]
+            labels = LabelRegistry(names, start=1)
+            retained_images, retained_annotations, image_id, annotation_id = retained_entries(previous, stale_image_ids)
         
-        for xml_file in xml_files:
-            xml_path = os.path.join(input_dir, xml_file)
-            
-            # Parse VOC XML
-            image_info, annotations = parse_voc_xml(xml_path, coco_json["categories"])
-            
-            if image_info is None:
-                continue
+        with writer_class(output_file, default_info("Converted from VOC format"),
+                          DEFAULT_LICENSES, categories, compact) as writer:
+            for image_info in retained_images:
+                writer.add_image(image_info)
+            for annotation in retained_annotations:
+                writer.add_annotation(annotation)
                 
-            # Add image id
-            image_info["id"] = image_id
-            image_info["license"] = 1
-            
-            # Add to COCO
-            coco_json["images"].append(image_info)
-            
-            # Add annotations
-            for annotation in annotations:
-                annotation["id"] = annotation_id
-                annotation["image_id"] = image_id
+            xml_paths = [os.path.join(input_dir, xml_file) for xml_file in changed_files]
+            results = parallel_map(_parse_voc_file, xml_paths, workers)
+            for xml_file, (image_info, annotations, local_labels) in zip(changed_files, results):
+                # Merge local category ids into the global registry in file order
+                local_to_global = {label_id: labels.add(name) for name, label_id in local_labels.items()}
                 
-                coco_json["annotations"].append(annotation)
-                annotation_id += 1
+                if image_info is None:
+                    manifest.record(xml_file)
+                    continue
+                    
+                # Add image id
+                image_info["id"] = image_id
+                image_info["license"] = 1
                 
-            image_id += 1
-            
-        # Write to file
-        with open(output_file, 'w') as f:
-            json.dump(coco_json, f, indent=2)
+                # Add to COCO
+                writer.add_image(image_info)
+                
+                # Add annotations
+                for annotation in annotations:
+                    annotation["id"] = annotation_id
+                    annotation["image_id"] = image_id
+                    annotation["category_id"] = local_to_global[annotation["category_id"]]
+                    
+                    writer.add_annotation(annotation)
+                    annotation_id += 1
+                    
+                manifest.record(xml_file, image_id=image_id)
+                image_id += 1
+                
+            categories[:] = labels.to_categories()
+                
+        manifest.save()
             
-        print(f"Conversion complete. {len(coco_json['images'])} images and {len(coco_json['annotations'])} annotations converted.")
-        print(f"Found {len(coco_json['categories'])} categories: {', '.join([c['name'] for c in coco_json['categories']])}")
+        print(f"Conversion complete. {writer.num_images} images and {writer.num_annotations} annotations converted.")
+        print(f"Found {len(categories)} categories: {', '.join([c['name'] for c in categories])}")
         print(f"Results saved to {output_file}")
         
         return True
@@ -214,9 +234,16 @@ def parse_args():
     parser = argparse.ArgumentParser(description="Convert Pascal VOC format annotations to COCO format")
     parser.add_argument('--input_dir', required=True, help="Directory containing VOC XML files")
     parser.add_argument('--output_file', required=True, help="Output COCO JSON file")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes (0 = one per CPU)")
+    parser.add_argument('--no_stream', action='store_true', help="Build the whole COCO file in memory before writing")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only parse inputs that changed since the previous run and patch the output")
+    parser.add_argument('--classes_file', help="classes.txt, obj.names or labelmap.txt fixing the category id order")
+    parser.add_argument('--compact', action='store_true', help="Write the COCO file without indentation")
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    voc_to_coco(args.input_dir, args.output_file)
+    voc_to_coco(args.input_dir, args.output_file, args.workers, not args.no_stream, args.incremental, args.classes_file,
+                args.compact)
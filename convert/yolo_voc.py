@@ -8,11 +8,14 @@ Usage:
 import os
 import sys
 import argparse
-from pathlib import Path
 import xml.etree.ElementTree as ET
-from PIL import Image
+from functools import partial
 
-from .utils import ensure_dir, clean_dir
+from .utils import ensure_dir, clean_dir, get_image_dimensions
+from .parallel import parallel_map
+from .materialize import IMAGE_MODES, ImageMaterializer
+from .manifest import MANIFEST_NAME, open_manifest
+from .labels import read_class_names
 
 
 def create_voc_xml(image_path, txt_path, class_names, output_path):
@@ -30,8 +33,7 @@ def create_voc_xml(image_path, txt_path, class_names, output_path):
     """
     try:
         # Get image dimensions
-        with Image.open(image_path) as img:
-            width, height = img.size
+        width, height = get_image_dimensions(image_path)
             
         # Create XML structure
         root = ET.Element("annotation")
@@ -138,35 +140,91 @@ def create_voc_xml(image_path, txt_path, class_names, output_path):
         return False
 
 
-def yolo_to_voc(input_dir, output_dir="dst"):
+def _convert_yolo_file(txt_file, input_dir, output_dir, class_names):
+    """
+    Convert one YOLO annotation file.
+    
+    Args:
+        txt_file (str): YOLO annotation file name
+        input_dir (str): Directory containing YOLO annotations and images
+        output_dir (str): Output directory for VOC annotations
+        class_names (list): List of class names
+        
+    Returns:
+        tuple: (source_image_path, output_image_path) to materialize, or None if skipped
+    """
+    # Get base filename
+    base_name = os.path.splitext(txt_file)[0]
+    
+    # Find corresponding image file
+    image_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
+    image_path = None
+    
+    for ext in image_extensions:
+        img_file = f"{base_name}{ext}"
+        img_path = os.path.join(input_dir, img_file)
+        if os.path.exists(img_path):
+            image_path = img_path
+            break
+            
+    if not image_path:
+        print(f"Warning: No image found for {txt_file}. Skipping.")
+        return None
+        
+    # Create VOC XML file
+    txt_path = os.path.join(input_dir, txt_file)
+    xml_output_path = os.path.join(output_dir, f"{base_name}.xml")
+    
+    if not create_voc_xml(image_path, txt_path, class_names, xml_output_path):
+        return None
+        
+    return image_path, os.path.join(output_dir, os.path.basename(image_path))
+
+
+def yolo_to_voc(input_dir, output_dir="dst", workers=1, image_mode="copy", incremental=False,
+                classes_file=None):
     """
     Convert YOLO format annotations to Pascal VOC format.
     
     Args:
         input_dir (str): Directory containing YOLO annotations and images
         output_dir (str, optional): Output directory for VOC annotations. Defaults to "dst".
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        image_mode (str, optional): copy, hardlink, symlink, reflink or none. Defaults to "copy".
+        incremental (bool, optional): Only convert annotation files that changed since
+            the previous run into output_dir. Defaults to False.
+        classes_file (str, optional): classes.txt, obj.names or labelmap.txt file.
+            Defaults to classes.txt in input_dir.
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
+        # Check for classes.txt file
+        if classes_file is None:
+            classes_file = os.path.join(input_dir, 'classes.txt')
+        class_names = []
+        
+        if os.path.exists(classes_file):
+            class_names = read_class_names(classes_file)
+            
+        # A different class list invalidates every converted file
+        manifest = open_manifest(os.path.join(output_dir, MANIFEST_NAME), "yolo-to-voc",
+                                 {"input_dir": os.path.abspath(input_dir), "image_mode": image_mode,
+                                  "classes": class_names},
+                                 incremental)
+        
         # Create output directory
-        if not clean_dir(output_dir):
+        if not manifest.loaded and not clean_dir(output_dir):
             print(f"Failed to create output directory {output_dir}")
             return False
             
         print(f"Converting YOLO annotations from {input_dir} to VOC format...")
         
-        # Check for classes.txt file
-        classes_file = os.path.join(input_dir, 'classes.txt')
-        class_names = []
-        
         if os.path.exists(classes_file):
-            with open(classes_file, 'r') as f:
-                class_names = [line.strip() for line in f.readlines()]
-            print(f"Found {len(class_names)} classes in classes.txt")
+            print(f"Found {len(class_names)} classes in {os.path.basename(classes_file)}")
         else:
-            print("Warning: classes.txt not found. Class names will be generated automatically.")
+            print(f"Warning: {os.path.basename(classes_file)} not found. Class names will be generated automatically.")
             
         # Find all YOLO annotation files (txt)
         txt_files = [f for f in os.listdir(input_dir) if f.endswith('.txt') and f != 'classes.txt']
@@ -175,42 +233,32 @@ def yolo_to_voc(input_dir, output_dir="dst"):
             print(f"No YOLO annotation files found in {input_dir}")
             return False
             
-        print(f"Processing {len(txt_files)} YOLO annotation files...")
+        # Drop the outputs of deleted and changed files; only changed files are converted again
+        changed_files, deleted_files = manifest.scan(input_dir, txt_files)
+        for txt_file in deleted_files + changed_files:
+            manifest.forget(txt_file)
+        if manifest.loaded:
+            print(f"Incremental run: {len(changed_files)} changed, {len(deleted_files)} deleted, "
+                  f"{len(txt_files) - len(changed_files)} unchanged")
+            
+        print(f"Processing {len(changed_files)} YOLO annotation files...")
         
+        convert_file = partial(_convert_yolo_file, input_dir=input_dir,
+                               output_dir=output_dir, class_names=class_names)
         converted_count = 0
-        for txt_file in txt_files:
-            # Get base filename
-            base_name = os.path.splitext(txt_file)[0]
-            
-            # Find corresponding image file
-            image_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
-            image_path = None
-            
-            for ext in image_extensions:
-                img_file = f"{base_name}{ext}"
-                img_path = os.path.join(input_dir, img_file)
-                if os.path.exists(img_path):
-                    image_path = img_path
-                    break
-                    
-            if not image_path:
-                print(f"Warning: No image found for {txt_file}. Skipping.")
-                continue
-                
-            # Create VOC XML file
-            txt_path = os.path.join(input_dir, txt_file)
-            xml_output_path = os.path.join(output_dir, f"{base_name}.xml")
-            
-            success = create_voc_xml(image_path, txt_path, class_names, xml_output_path)
-            
-            if success:
-                # Copy image file
-                output_img_path = os.path.join(output_dir, os.path.basename(image_path))
-                try:
-                    Path(image_path).copy(output_img_path)
-                    converted_count += 1
-                except Exception as e:
-                    print(f"Error copying image {image_path}: {str(e)}")
+        with ImageMaterializer(image_mode) as images:
+            for txt_file, pair in zip(changed_files, parallel_map(convert_file, changed_files, workers)):
+                if pair is None:
+                    manifest.record(txt_file)
+                    continue
+                images.add(*pair)
+                outputs = [os.path.join(output_dir, f"{os.path.splitext(txt_file)[0]}.xml")]
+                if image_mode != "none":
+                    outputs.append(pair[1])
+                manifest.record(txt_file, outputs)
+                converted_count += 1
+        converted_count -= len(images.failed)
+        manifest.save()
         
         print(f"Conversion complete. {converted_count} annotations converted to VOC format.")
         print(f"Results saved to {output_dir}")
@@ -226,9 +274,16 @@ def parse_args():
     parser = argparse.ArgumentParser(description="Convert YOLO format annotations to Pascal VOC format")
     parser.add_argument('--input_dir', required=True, help="Directory containing YOLO annotations and images")
     parser.add_argument('--output_dir', default="dst", help="Output directory for VOC annotations")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes (0 = one per CPU)")
+    parser.add_argument('--image_mode', '--image-mode', choices=IMAGE_MODES, default="copy",
+                        help="How images are placed in the output directory")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only convert inputs that changed since the previous run")
+    parser.add_argument('--classes_file', help="classes.txt, obj.names or labelmap.txt (default: classes.txt in input_dir)")
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    yolo_to_voc(args.input_dir, args.output_dir)
+    yolo_to_voc(args.input_dir, args.output_dir, args.workers, args.image_mode, args.incremental,
+                args.classes_file)
@@ -25,6 +25,10 @@ setup(
     ],
     python_requires=">=3.6",
     install_requires=requirements,
+    extras_require={
+        "fast-json": ["orjson>=3.6"],
+        "fast-tfrecord": ["google-crc32c>=1.1"],
+    },
     entry_points={
         "console_scripts": [
             "2label=convert:main",
@@ -0,0 +1,35 @@
+import numpy as np
+
+from convert import photometric
+from convert.photometric import Noise, add_noise, apply_photometric
+
+
+def _image(height, width, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def test_noise_does_not_depend_on_earlier_images(monkeypatch):
+    small = _image(48, 64)
+    monkeypatch.setattr(photometric, "_noise_pool", None)
+    fresh = add_noise(small, 10, seed=5)
+
+    # a larger image than the pool, then a fresh pool in another "process"
+    add_noise(_image(640, 640, seed=1), 10, seed=3)
+    after_large = add_noise(small, 10, seed=5)
+    monkeypatch.setattr(photometric, "_noise_pool", None)
+    reloaded = apply_photometric(small, [Noise(10, seed=5)])
+
+    np.testing.assert_array_equal(fresh, after_large)
+    np.testing.assert_array_equal(fresh, reloaded)
+
+
+def test_noise_seed_picks_the_pattern():
+    image = _image(48, 64)
+    assert not np.array_equal(add_noise(image, 10, seed=1), add_noise(image, 10, seed=2))
+
+
+def test_noise_on_images_larger_than_the_pool():
+    image = np.full((1024, 1024, 3), 128, dtype=np.uint8)
+    noisy = add_noise(image, 10, seed=7)
+    assert noisy.shape == image.shape
+    np.testing.assert_array_equal(noisy, add_noise(image, 10, seed=7))
@@ -1,14 +1,21 @@
 '''
-python3 utils/augment_labelme.py --src_path src --no_sample 600 --ignore_dst
+python3 utils/augment_labelme.py --src_path src --no_sample 600 --ignore_dst --image_data none --workers 0
 '''
 import os
+import sys
 import cv2
-import json
 import random
 import argparse
-import numpy as np
 from tqdm import tqdm
-import base64
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from convert.labelme_writer import IMAGE_DATA_MODES, write_labelme
+from convert.parallel import parallel_map, resolve_workers
+from convert.augment import AUG_OPTIONS, iter_augmented
+
+# geometric and photometric options; a sample composes --chain_length of them, one warp plus fused lookup tables
+aug_options = list(AUG_OPTIONS)
 
 # argument parser
 parser = argparse.ArgumentParser(description="labelme dataset augmentation tool")
@@ -17,63 +24,40 @@ parser.add_argument('--src_path',type = str, help = 'directory of labelme datase
 parser.add_argument('--dst_path',type= str, help = 'directory of destination folder', default='dst')
 parser.add_argument('--no_sample',type = int,help = 'The number of augmented sample',default = 1000)
 parser.add_argument('--ignore_dst',action = 'store_true',help = 'ignore destination folder if exists')
+parser.add_argument('--image_data','--image-data',choices = IMAGE_DATA_MODES,default = 'embed',help = 'embed augmented images as base64 imageData or leave it empty')
+parser.add_argument('--aug_options',nargs = '+',choices = aug_options,default = ['v_flip'],help = 'augmentation options to choose from')
+parser.add_argument('--chain_length',type = int,default = 1,help = 'number of random options composed into each augmented sample')
+parser.add_argument('--max_angle',type = float,default = 15,help = 'maximum rotation angle in degrees')
+parser.add_argument('--workers',type = int,default = 1,help = 'number of worker processes (0 = one per CPU)')
+parser.add_argument('--seed',type = int,help = 'random seed for reproducible augmentation')
 # create arguments
 args = parser.parse_args()
 
-# initialize
-#aug_options = ['h_flip','v_flip','rotate','blur','noise','crop','resize','color','brightness','contrast','gamma','hue','saturation','value']
-aug_options = ['v_flip']
-
-def flip_point(point, flip_code, image_shape):
-    x, y = point
-    h, w = image_shape
-
-    if flip_code == 1:  # Horizontal Flip
-        new_x = w - x
-        new_y = y
-    elif flip_code == 0:  # Vertical Flip
-        new_x = x
-        new_y = h - y
-    elif flip_code == -1:  # Both Horizontal and Vertical Flip
-        new_x = w - x
-        new_y = h - y
-    else:
-        raise ValueError("Invalid flip_code. Use 0 for vertical, 1 for horizontal, or -1 for both.")
-
-    return new_x, new_y
+# write the augmented samples of one source file, returns the number of written samples
+def augment_file(annotation_file,augmented_times,seed,single_thread=False):
+    if single_thread:
+        cv2.setNumThreads(1) # one OpenCV thread per worker process
+    count = 0
+    # samples are seeded per source file and index, so results do not depend on --workers
+    for image_aug,shapes_aug,info in iter_augmented(args.src_path,augmented_times,seed,args.aug_options,args.chain_length,
+                                                    args.max_angle,annotation_files = [annotation_file],with_info = True):
+        annotation,i = info['annotation'],info['index']
 
-# define augmentation functions
-def h_flip(image,shapes):
-    h,w,c = image.shape
-    image_aug = image.copy()
-    image_aug = cv2.flip(image,0) # horizontal flip
-    shapes_aug = shapes.copy()
-    for k,shape in enumerate(shapes):
-        points = shape['points']
-        new_points = []
-        for point in points:
-            new_x, new_y = flip_point(point, 0, (h, w))
-            new_points.append([new_x,new_y])
-        shapes_aug[k]['points'] = new_points
-    return image_aug,shapes_aug
+        # encode image once, it is both written to disk and embedded
+        retval, buffer = cv2.imencode('.jpg', image_aug)
 
-def v_flip(image,shapes):
-    h,w,c = image.shape
-    image_aug = image.copy()
-    image_aug = cv2.flip(image_aug,1) # veritcal flip
-    shapes_aug = shapes.copy()
-    for k,shape in enumerate(shapes):
-        points = shape['points']
-        new_points = []
-        for point in points:
-            new_x, new_y = flip_point(point, 1, (h, w))
-            new_points.append([new_x,new_y])
-        shapes_aug[k]['points'] = new_points
-    return image_aug,shapes_aug
-
-def noise(image,shapes):
-    image_aug = image.copy()
-    return image_aug,shapes
+        aug_annotation = annotation.copy()
+        aug_annotation['shapes'] = shapes_aug
+        aug_annotation['imageHeight'], aug_annotation['imageWidth'] = image_aug.shape[:2]
+        aug_annotation['imagePath'] = os.path.splitext(annotation['imagePath'])[0] + '_aug_{}.jpg'.format(i)
+        
+        # export augmented image and annotation file, streaming the base64 image data
+        with open(os.path.join(args.dst_path,aug_annotation['imagePath']),'wb') as f:
+            f.write(buffer.tobytes())
+        write_labelme(aug_annotation,os.path.join(args.dst_path,os.path.splitext(annotation_file)[0] + '_aug_{}.json'.format(i)),
+                      buffer,args.image_data,compact = True)
+        count += 1
+    return count
 
 if __name__ == "__main__":
     print('labelme dataset augmentation tool, Number of sample = {}'.format(args.no_sample))
@@ -120,49 +104,12 @@ if __name__ == "__main__":
     augmented_times = int(args.no_sample/len(annotation_files))
     print('Augmented times of each image: {}'.format(augmented_times))
         
-    # loop for each annotation file
-    for annotation_file in tqdm(annotation_files):
-        annotation_path = os.path.join(args.src_path,annotation_file)
-        
-        # read annotation file
-        with open(annotation_path,'r') as f:
-            annotation = json.load(f)
-
-        # read image
-        image_path = os.path.join(args.src_path,annotation['imagePath'])
-        image = cv2.imread(image_path)
-        image_org = image.copy()
-        # get shape of annotations
-        shapes = annotation['shapes']
-        shapes_org = shapes.copy()
-            
-        # start augmentation
-        for i in range(augmented_times):
-            
-            # random choose augmentation option
-            aug_option = 'v_flip' # random.choice(aug_options)
-    
-            if aug_option == 'h_flip':
-                image_aug,shapes_aug = h_flip(image_org,shapes_org)
-
-            elif aug_option == 'v_flip':
-                image_aug,shapes_aug = v_flip(image_org,shapes_org)
-
-            elif aug_option == 'noise':
-                image_aug,shapes_aug = noise(image_org,shapes_org)
-
-            # convert image to base64
-            retval, buffer = cv2.imencode('.jpg', image_aug)
-            jpg_as_text = base64.b64encode(buffer)
-
-            aug_annotation = annotation.copy()
-            aug_annotation['imageData'] = jpg_as_text.decode('utf-8')
-            aug_annotation['shapes'] = shapes_aug # clear shapes
-            aug_annotation['imagePath'] = os.path.splitext(annotation['imagePath'])[0] + '_aug_{}.jpg'.format(i)
-            
-            # export augmented image and annotation file
-            cv2.imwrite(os.path.join(args.dst_path,aug_annotation['imagePath']),image_aug)
-            with open(os.path.join(args.dst_path,os.path.splitext(annotation_file)[0] + '_aug_{}.json'.format(i)),'w') as f:
-                json.dump(aug_annotation,f)
+    # spread source images across worker processes, each seeded per file so results do not depend on --workers
+    seed = args.seed if args.seed is not None else random.randrange(1 << 30)
+    augment = partial(augment_file,augmented_times = augmented_times,seed = seed,single_thread = resolve_workers(args.workers) > 1)
+    no_augmented = 0
+    for count in tqdm(parallel_map(augment,annotation_files,args.workers),total = len(annotation_files)):
+        no_augmented += count
+    print('Augmented samples: {}'.format(no_augmented))
     
     print('Augmentation done!')
\ No newline at end of file
@@ -0,0 +1,89 @@
+'''
+python3 utils/benchmark_json.py --images 20000 --annotations_per_image 10
+python3 utils/benchmark_json.py --input /path/to/coco.json
+'''
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_root)
+
+from convert import jsonio
+
+parser = argparse.ArgumentParser(description="Compare JSON backends and output modes on a large COCO file")
+parser.add_argument('--input', help='existing COCO JSON file; a synthetic one is generated if omitted')
+parser.add_argument('--images', type=int, default=20000, help='number of synthetic images')
+parser.add_argument('--annotations_per_image', type=int, default=10, help='synthetic annotations per image')
+parser.add_argument('--runs', type=int, default=3, help='timed runs per measurement, the best one is reported')
+args = parser.parse_args()
+
+
+def synthetic_coco(num_images, annotations_per_image):
+    rng = random.Random(0)
+    images, annotations = [], []
+    for image_id in range(1, num_images + 1):
+        images.append({"id": image_id, "file_name": "{:08d}.jpg".format(image_id),
+                       "width": 1280, "height": 720, "license": 1})
+        for _ in range(annotations_per_image):
+            x, y = rng.uniform(0, 1200), rng.uniform(0, 650)
+            w, h = rng.uniform(5, 80), rng.uniform(5, 70)
+            annotations.append({
+                "id": len(annotations) + 1,
+                "image_id": image_id,
+                "category_id": rng.randint(1, 80),
+                "segmentation": [[x, y, x + w, y, x + w, y + h, x, y + h]],
+                "area": w * h,
+                "bbox": [x, y, w, h],
+                "iscrowd": 0
+            })
+    categories = [{"id": i, "name": "class_{}".format(i), "supercategory": "object"} for i in range(1, 81)]
+    return {"info": {"description": "benchmark"}, "licenses": [{"id": 1, "name": "Unknown", "url": ""}],
+            "images": images, "annotations": annotations, "categories": categories}
+
+
+def best_of(function, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    if args.input:
+        with open(args.input, 'rb') as f:
+            data = jsonio.load(f)
+    else:
+        data = synthetic_coco(args.images, args.annotations_per_image)
+    print('images: {}, annotations: {}'.format(len(data['images']), len(data['annotations'])))
+
+    path = os.path.join(tempfile.mkdtemp(), 'coco.json')
+    baseline = None
+    print('{:<8} {:<8} {:>10} {:>10} {:>10} {:>8}'.format('backend', 'mode', 'size MB', 'dump ms', 'load ms', 'speedup'))
+    # Standard library first, it is the baseline for the speedup column
+    for backend in reversed(jsonio.available_backends()):
+        jsonio.set_backend(backend)
+        for compact in (False, True):
+            def dump():
+                with open(path, 'w') as f:
+                    jsonio.dump(data, f, compact)
+
+            def load():
+                with open(path, 'rb') as f:
+                    jsonio.load(f)
+
+            dump_ms = best_of(dump, args.runs)
+            load_ms = best_of(load, args.runs)
+            size_mb = os.path.getsize(path) / 1e6
+            if backend == 'json' and not compact:
+                baseline = dump_ms + load_ms
+            print('{:<8} {:<8} {:>10.1f} {:>10.1f} {:>10.1f} {:>8}'.format(
+                backend, 'compact' if compact else 'indent', size_mb, dump_ms, load_ms,
+                '-' if baseline is None else '{:.1f}x'.format(baseline / (dump_ms + load_ms))))
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
@@ -0,0 +1,77 @@
+'''
+python3 utils/benchmark_startup.py --runs 20 --budget_ms 150
+'''
+import os
+import sys
+import time
+import shutil
+import argparse
+import statistics
+import subprocess
+
+# Modules that must not be imported just to print the version or the help text
+HEAVY_MODULES = ['numpy', 'PIL', 'cv2', 'labelme', 'tensorflow', 'pycocotools']
+
+parser = argparse.ArgumentParser(description="2label CLI startup-time benchmark")
+parser.add_argument('--runs', type=int, default=20, help='number of timed runs')
+parser.add_argument('--budget_ms', type=float, default=150.0, help='fail if the median `2label --version` time exceeds this')
+args = parser.parse_args()
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cli_command():
+    # Prefer the installed console script, fall back to the package in this checkout
+    script = shutil.which('2label')
+    if script:
+        return [script, '--version']
+    return [sys.executable, '-m', 'convert', '--version']
+
+
+def time_runs(command, runs):
+    env = dict(os.environ, PYTHONPATH=repo_root + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def heavy_imports():
+    # Import the package and build the parser, then report which heavy modules got loaded
+    code = ('import io, sys, contextlib, convert\n'
+            'sys.argv = ["2label", "--help"]\n'
+            'with contextlib.redirect_stdout(io.StringIO()):\n'
+            '    try:\n'
+            '        convert.main()\n'
+            '    except SystemExit:\n'
+            '        pass\n'
+            'print(",".join(m for m in {} if m in sys.modules))'.format(HEAVY_MODULES))
+    env = dict(os.environ, PYTHONPATH=repo_root + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, check=True).stdout
+    return [m for m in output.strip().split(',') if m]
+
+
+if __name__ == "__main__":
+    command = cli_command()
+    baseline = time_runs([sys.executable, '-c', 'pass'], args.runs)
+    timings = time_runs(command, args.runs)
+
+    median = statistics.median(timings)
+    print('command: {}'.format(' '.join(command)))
+    print('python startup median: {:.1f} ms'.format(statistics.median(baseline)))
+    print('2label --version median: {:.1f} ms (min {:.1f} ms, max {:.1f} ms)'.format(median, min(timings), max(timings)))
+
+    loaded = heavy_imports()
+    failed = False
+    if loaded:
+        print('Error: heavy modules imported at startup: {}'.format(', '.join(loaded)))
+        failed = True
+    if median > args.budget_ms:
+        print('Error: median startup {:.1f} ms exceeds budget of {:.1f} ms'.format(median, args.budget_ms))
+        failed = True
+
+    if failed:
+        exit(-1)
+    print('Startup within budget')
@@ -15,7 +15,15 @@
 
 r"""Convert raw COCO dataset to TFRecord for object_detection.
 
-Please note that this tool creates sharded output files.
+Please note that this tool creates sharded output files: with --num_shards=N
+images are assigned round-robin to train.record-0000i-of-0000N, each written
+by its own writer, while a pool of --workers processes builds the examples.
+Records can be GZIP or ZLIB compressed with --compression; read them back with
+the same compression_type. Uncompressed shards get a random-access offset
+index with --write_index. Instance masks of an image are rasterized in one
+batch and PNG encoded in the worker processes at --mask_png_level; with
+--mask_cache_dir the encoded masks are kept on disk by annotation hash and
+reused by later runs.
 
 Example usage:
     python create_coco_tf_record.py --logtostderr \
@@ -23,57 +31,199 @@ Example usage:
       --test_image_dir="${TEST_IMAGE_DIR}" \
       --train_annotations_file="${TRAIN_ANNOTATIONS_FILE}" \
       --test_annotations_file="${TEST_ANNOTATIONS_FILE}" \
-      --output_dir="${OUTPUT_DIR}"
+      --output_dir="${OUTPUT_DIR}" \
+      --num_shards=100 --workers=0 --compression=GZIP
 """
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import argparse
+import contextlib
+import functools
 import hashlib
 import io
 import json
+import logging
 import os
-import contextlib2
+import sys
 import numpy as np
 import PIL.Image
 
-from pycocotools import mask
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from convert import catalog
+from convert import tfrecord
+from convert.parallel import parallel_map
 
-from tensorflow.python.framework.versions import VERSION
-if VERSION >= "2.0.0a0":
-    import tensorflow.compat.v1 as tf
-else:
-    import tensorflow as tf
 
-from object_detection.dataset_tools import tf_record_creation_util
-from object_detection.utils import dataset_util
-from object_detection.utils import label_map_util
+def _str2bool(value):
+  return str(value).lower() in ('1', 'true', 'yes', 'y')
 
 
-flags = tf.app.flags
-tf.flags.DEFINE_boolean('include_masks', True,
-                        'Whether to include instance segmentations masks '
-                        '(PNG encoded) in the result. default: True.')
-tf.flags.DEFINE_string('train_image_dir', '',
-                       'Training image directory.')
-tf.flags.DEFINE_string('test_image_dir', '',
-                       'Test image directory.')
-tf.flags.DEFINE_string('train_annotations_file', '',
-                       'Training annotations JSON file.')
-tf.flags.DEFINE_string('test_annotations_file', '',
-                       'Test-dev annotations JSON file.')
-tf.flags.DEFINE_string('output_dir', '/tmp/', 'Output data directory.')
+parser = argparse.ArgumentParser(
+    description='Convert raw COCO dataset to TFRecord for object_detection.')
+parser.add_argument('--include_masks', type=_str2bool, nargs='?', const=True,
+                    default=True,
+                    help='Whether to include instance segmentations masks '
+                    '(PNG encoded) in the result. default: True.')
+parser.add_argument('--noinclude_masks', dest='include_masks',
+                    action='store_false',
+                    help='Leave out the instance segmentation masks.')
+parser.add_argument('--train_image_dir', default='',
+                    help='Training image directory.')
+parser.add_argument('--test_image_dir', default='',
+                    help='Test image directory.')
+parser.add_argument('--train_annotations_file', default='',
+                    help='Training annotations JSON file.')
+parser.add_argument('--test_annotations_file', default='',
+                    help='Test-dev annotations JSON file.')
+parser.add_argument('--output_dir', default='/tmp/',
+                    help='Output data directory.')
+parser.add_argument('--num_shards', type=int, default=1,
+                    help='Number of output files per split; images are '
+                    'assigned to them round-robin. default: 1 (a single '
+                    'file).')
+parser.add_argument('--workers', type=int, default=1,
+                    help='Number of worker processes building examples '
+                    '(0 = one per CPU). default: 1.')
+parser.add_argument('--compression', choices=tfrecord.COMPRESSION_TYPES,
+                    default='NONE', help='Record compression. default: NONE.')
+parser.add_argument('--write_index', type=_str2bool, nargs='?', const=True,
+                    default=False,
+                    help='Write a <shard>.index file of record offsets next '
+                    'to every shard for random access. Requires '
+                    '--compression=NONE. default: False.')
+parser.add_argument('--mask_png_level', type=int, default=6,
+                    help='zlib level (0-9) of the PNG encoded masks; 1 is much '
+                    'faster on binary masks for a slightly larger file. '
+                    'default: 6.')
+parser.add_argument('--mask_cache_dir', default='',
+                    help='Directory caching PNG encoded masks by annotation '
+                    'hash, reused when the records are regenerated. '
+                    'default: no cache.')
+parser.add_argument('--logtostderr', action='store_true',
+                    help='Accepted for compatibility; logs always go to '
+                    'stderr.')
 
-FLAGS = flags.FLAGS
+FLAGS = None
 
-tf.logging.set_verbosity(tf.logging.INFO)
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+
+def create_category_index(categories):
+  """Creates a dictionary of COCO compatible categories keyed by category id."""
+  return {cat['id']: cat for cat in categories}
+
+
+def _mask_cache_key(object_annotations, image_height, image_width,
+                    png_level):
+  """Hashes everything the PNG encoded mask of an annotation depends on."""
+  payload = json.dumps([object_annotations['segmentation'],
+                        bool(object_annotations['iscrowd']),
+                        image_height, image_width, png_level],
+                       separators=(',', ':'), sort_keys=True)
+  return hashlib.sha1(payload.encode('utf8')).hexdigest()
+
+
+def _mask_cache_path(cache_dir, key):
+  return os.path.join(cache_dir, key[:2], key + '.png')
+
+
+def rasterize_masks(segmentations, image_height, image_width):
+  """Decodes the masks of all annotations of an image together.
+
+  The polygons of every annotation go through a single frPyObjects call, the
+  polygons of each annotation are merged into one RLE and all RLEs are
+  decoded by a single decode call. pycocotools is only needed for masks.
+
+  Args:
+    segmentations: list of COCO segmentations, each a list of polygons or an
+      uncompressed RLE dict.
+    image_height: height of the image.
+    image_width: width of the image.
+  Returns:
+    masks: uint8 array of shape [image_height, image_width, len(segmentations)]
+  """
+  from pycocotools import mask
+
+  polygons = []
+  spans = []
+  for segmentation in segmentations:
+    if isinstance(segmentation, list):
+      spans.append((len(polygons), len(polygons) + len(segmentation)))
+      polygons.extend(segmentation)
+    else:
+      spans.append(None)
+  polygon_rles = (mask.frPyObjects(polygons, image_height, image_width)
+                  if polygons else [])
+
+  run_len_encodings = []
+  for segmentation, span in zip(segmentations, spans):
+    if span is None:
+      run_len_encodings.append(
+          mask.frPyObjects(segmentation, image_height, image_width))
+    else:
+      run_len_encodings.append(mask.merge(polygon_rles[span[0]:span[1]]))
+  return mask.decode(run_len_encodings).reshape(
+      image_height, image_width, len(run_len_encodings))
+
+
+def encode_instance_masks(annotations_list, image_height, image_width,
+                          png_level=6, cache_dir=None):
+  """PNG encodes the instance masks of an image, using an on-disk cache.
+
+  Args:
+    annotations_list: list of COCO annotation dicts of one image.
+    image_height: height of the image.
+    image_width: width of the image.
+    png_level: zlib compression level of the PNG files. default: 6.
+    cache_dir: directory caching encoded masks by annotation hash, or None.
+  Returns:
+    encoded_mask_png: list of PNG encoded masks, one per annotation.
+  """
+  encoded_mask_png = [None] * len(annotations_list)
+  keys = [None] * len(annotations_list)
+  if cache_dir:
+    for idx, object_annotations in enumerate(annotations_list):
+      keys[idx] = _mask_cache_key(object_annotations, image_height,
+                                  image_width, png_level)
+      cache_path = _mask_cache_path(cache_dir, keys[idx])
+      if os.path.isfile(cache_path):
+        with open(cache_path, 'rb') as fid:
+          encoded_mask_png[idx] = fid.read()
+
+  missing = [idx for idx, encoded in enumerate(encoded_mask_png)
+             if encoded is None]
+  if not missing:
+    return encoded_mask_png
+  binary_masks = rasterize_masks(
+      [annotations_list[idx]['segmentation'] for idx in missing],
+      image_height, image_width)
+  for position, idx in enumerate(missing):
+    pil_image = PIL.Image.fromarray(
+        np.ascontiguousarray(binary_masks[:, :, position]))
+    output_io = io.BytesIO()
+    pil_image.save(output_io, format='PNG', compress_level=png_level)
+    encoded_mask_png[idx] = output_io.getvalue()
+    if cache_dir:
+      # Written under a temporary name so that concurrent workers never
+      # read a partial file
+      cache_path = _mask_cache_path(cache_dir, keys[idx])
+      os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+      temp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+      with open(temp_path, 'wb') as fid:
+        fid.write(encoded_mask_png[idx])
+      os.replace(temp_path, cache_path)
+  return encoded_mask_png
 
 
 def create_tf_example(image,
                       annotations_list,
                       image_dir,
                       category_index,
-                      include_masks=False):
+                      include_masks=False,
+                      mask_png_level=6,
+                      mask_cache_dir=None):
   """Converts image and annotations to a tf.Example proto.
 
   Args:
@@ -93,9 +243,12 @@ def create_tf_example(image,
     image_dir: directory containing the image files.
     category_index: a dict containing COCO category information keyed
       by the 'id' field of each category.  See the
-      label_map_util.create_category_index function.
+      create_category_index function.
     include_masks: Whether to include instance segmentations masks
       (PNG encoded) in the result. default: False.
+    mask_png_level: zlib compression level of the PNG masks. default: 6.
+    mask_cache_dir: directory caching PNG masks by annotation hash.
+      default: None.
   Returns:
     example: The converted tf.Example
     num_annotations_skipped: Number of (invalid) annotations that were ignored.
@@ -109,11 +262,10 @@ def create_tf_example(image,
   image_id = image['id']
 
   full_path = os.path.join(image_dir, filename)
-  with tf.gfile.GFile(full_path, 'rb') as fid:
+  with open(full_path, 'rb') as fid:
     encoded_jpg = fid.read()
-  encoded_jpg_io = io.BytesIO(encoded_jpg)
-  image = PIL.Image.open(encoded_jpg_io)
-  key = hashlib.sha256(encoded_jpg).hexdigest()
+  # Digest cached by the image catalog while the file is unchanged
+  key = catalog.image_info(full_path, sha256=True, data=encoded_jpg).sha256
 
   xmin = []
   xmax = []
@@ -123,7 +275,7 @@ def create_tf_example(image,
   category_names = []
   category_ids = []
   area = []
-  encoded_mask_png = []
+  mask_annotations = []
   num_annotations_skipped = 0
   for object_annotations in annotations_list:
     (x, y, width, height) = tuple(object_annotations['bbox'])
@@ -144,54 +296,104 @@ def create_tf_example(image,
     area.append(object_annotations['area'])
 
     if include_masks:
-      run_len_encoding = mask.frPyObjects(object_annotations['segmentation'],
-                                          image_height, image_width)
-      binary_mask = mask.decode(run_len_encoding)
-      if not object_annotations['iscrowd']:
-        binary_mask = np.amax(binary_mask, axis=2)
-      pil_image = PIL.Image.fromarray(binary_mask)
-      output_io = io.BytesIO()
-      pil_image.save(output_io, format='PNG')
-      encoded_mask_png.append(output_io.getvalue())
+      mask_annotations.append(object_annotations)
+  if include_masks:
+    # Rasterized and encoded together for the whole image
+    encoded_mask_png = encode_instance_masks(
+        mask_annotations, image_height, image_width, mask_png_level,
+        mask_cache_dir)
   feature_dict = {
       'image/height':
-          dataset_util.int64_feature(image_height),
+          tfrecord.int64_feature(image_height),
       'image/width':
-          dataset_util.int64_feature(image_width),
+          tfrecord.int64_feature(image_width),
       'image/filename':
-          dataset_util.bytes_feature(filename.encode('utf8')),
+          tfrecord.bytes_feature(filename.encode('utf8')),
       'image/source_id':
-          dataset_util.bytes_feature(str(image_id).encode('utf8')),
+          tfrecord.bytes_feature(str(image_id).encode('utf8')),
       'image/key/sha256':
-          dataset_util.bytes_feature(key.encode('utf8')),
+          tfrecord.bytes_feature(key.encode('utf8')),
       'image/encoded':
-          dataset_util.bytes_feature(encoded_jpg),
+          tfrecord.bytes_feature(encoded_jpg),
       'image/format':
-          dataset_util.bytes_feature('jpeg'.encode('utf8')),
+          tfrecord.bytes_feature('jpeg'.encode('utf8')),
       'image/object/bbox/xmin':
-          dataset_util.float_list_feature(xmin),
+          tfrecord.float_list_feature(xmin),
       'image/object/bbox/xmax':
-          dataset_util.float_list_feature(xmax),
+          tfrecord.float_list_feature(xmax),
       'image/object/bbox/ymin':
-          dataset_util.float_list_feature(ymin),
+          tfrecord.float_list_feature(ymin),
       'image/object/bbox/ymax':
-          dataset_util.float_list_feature(ymax),
+          tfrecord.float_list_feature(ymax),
       'image/object/class/text':
-          dataset_util.bytes_list_feature(category_names),
+          tfrecord.bytes_list_feature(category_names),
       'image/object/is_crowd':
-          dataset_util.int64_list_feature(is_crowd),
+          tfrecord.int64_list_feature(is_crowd),
       'image/object/area':
-          dataset_util.float_list_feature(area),
+          tfrecord.float_list_feature(area),
   }
   if include_masks:
     feature_dict['image/object/mask'] = (
-        dataset_util.bytes_list_feature(encoded_mask_png))
-  example = tf.train.Example(features=tf.train.Features(feature=feature_dict))
+        tfrecord.bytes_list_feature(encoded_mask_png))
+  example = tfrecord.Example(features=tfrecord.Features(feature=feature_dict))
   return key, example, num_annotations_skipped
 
 
+def _build_serialized_example(item, image_dir, category_index, include_masks,
+                              mask_png_level=6, mask_cache_dir=None):
+  """Builds and serializes the tf.Example of one image in a worker process.
+
+  Args:
+    item: (image, annotations_list) tuple, see create_tf_example.
+    image_dir: directory containing the image files.
+    category_index: a dict containing COCO category information keyed
+      by the 'id' field of each category.
+    include_masks: Whether to include instance segmentations masks.
+    mask_png_level: zlib compression level of the PNG masks.
+    mask_cache_dir: directory caching PNG masks by annotation hash.
+  Returns:
+    serialized_example: The serialized tf.Example
+    num_annotations_skipped: Number of (invalid) annotations that were ignored.
+  """
+  image, annotations_list = item
+  _, tf_example, num_annotations_skipped = create_tf_example(
+      image, annotations_list, image_dir, category_index, include_masks,
+      mask_png_level, mask_cache_dir)
+  return tf_example.SerializeToString(), num_annotations_skipped
+
+
+def open_sharded_output_tfrecords(exit_stack, base_path, num_shards,
+                                  compression='NONE', write_index=False):
+  """Opens one TFRecord writer per shard.
+
+  Args:
+    exit_stack: A contextlib.ExitStack used to automatically close the TFRecords
+      opened in this function.
+    base_path: The base path for all shards
+    num_shards: The number of shards; a single shard is written to base_path
+      itself.
+    compression: One of 'NONE', 'GZIP' or 'ZLIB'.
+    write_index: Whether to write an offset index next to every shard.
+
+  Returns:
+    The list of opened TFRecords. Position k in the list corresponds to shard k.
+  """
+  if num_shards == 1:
+    paths = [base_path]
+  else:
+    paths = ['{}-{:05d}-of-{:05d}'.format(base_path, idx, num_shards)
+             for idx in range(num_shards)]
+  return [
+      exit_stack.enter_context(
+          tfrecord.TFRecordWriter(path, compression, write_index))
+      for path in paths
+  ]
+
+
 def _create_tf_record_from_coco_annotations(
-    annotations_file, image_dir, output_path, include_masks):
+    annotations_file, image_dir, output_path, include_masks, num_shards=1,
+    workers=1, compression='NONE', mask_png_level=6, mask_cache_dir=None,
+    write_index=False):
   """Loads COCO annotation json files and converts to tf.Record format.
 
   Args:
@@ -200,17 +402,30 @@ def _create_tf_record_from_coco_annotations(
     output_path: Path to output tf.Record file.
     include_masks: Whether to include instance segmentations masks
       (PNG encoded) in the result. default: False.
+    num_shards: Number of output shards, images are assigned round-robin.
+      default: 1.
+    workers: Number of worker processes building examples, 0 means one per
+      CPU. default: 1.
+    compression: One of 'NONE', 'GZIP' or 'ZLIB'. default: 'NONE'.
+    mask_png_level: zlib compression level of the PNG masks. default: 6.
+    mask_cache_dir: directory caching PNG masks by annotation hash, shared
+      by all splits and runs. default: None.
+    write_index: Whether to write an offset index next to every shard.
+      default: False.
   """
-  with tf.gfile.GFile(annotations_file, 'r') as fid:
-    output_tfrecords = tf.python_io.TFRecordWriter(output_path)
+  with contextlib.ExitStack() as tf_record_close_stack, \
+      open(annotations_file, 'r') as fid:
+    output_tfrecords = open_sharded_output_tfrecords(
+        tf_record_close_stack, output_path, num_shards, compression,
+        write_index)
     groundtruth_data = json.load(fid)
     images = groundtruth_data['images']
-    category_index = label_map_util.create_category_index(
+    category_index = create_category_index(
         groundtruth_data['categories'])
 
     annotations_index = {}
     if 'annotations' in groundtruth_data:
-      tf.logging.info(
+      logging.info(
           'Found groundtruth annotations. Building annotations index.')
       for annotation in groundtruth_data['annotations']:
         image_id = annotation['image_id']
@@ -223,20 +438,25 @@ def _create_tf_record_from_coco_annotations(
       if image_id not in annotations_index:
         missing_annotation_count += 1
         annotations_index[image_id] = []
-    tf.logging.info('%d images are missing annotations.',
-                    missing_annotation_count)
+    logging.info('%d images are missing annotations.',
+                 missing_annotation_count)
 
+    # Examples are built in parallel and come back in image order, so the
+    # shard of every image does not depend on the number of workers
+    build_example = functools.partial(
+        _build_serialized_example, image_dir=image_dir,
+        category_index=category_index, include_masks=include_masks,
+        mask_png_level=mask_png_level, mask_cache_dir=mask_cache_dir)
+    items = ((image, annotations_index[image['id']]) for image in images)
     total_num_annotations_skipped = 0
-    for idx, image in enumerate(images):
+    for idx, (serialized_example, num_annotations_skipped) in enumerate(
+        parallel_map(build_example, items, workers)):
       if idx % 100 == 0:
-        tf.logging.info('On image %d of %d', idx, len(images))
-      annotations_list = annotations_index[image['id']]
-      _, tf_example, num_annotations_skipped = create_tf_example(
-          image, annotations_list, image_dir, category_index, include_masks)
+        logging.info('On image %d of %d', idx, len(images))
       total_num_annotations_skipped += num_annotations_skipped
-      output_tfrecords.write(tf_example.SerializeToString())
-    tf.logging.info('Finished writing, skipped %d annotations.',
-                    total_num_annotations_skipped)
+      output_tfrecords[idx % num_shards].write(serialized_example)
+    logging.info('Finished writing, skipped %d annotations.',
+                 total_num_annotations_skipped)
 
 
 def main(_):
@@ -244,9 +464,13 @@ def main(_):
   assert FLAGS.test_image_dir, '`test_image_dir` missing.'
   assert FLAGS.train_annotations_file, '`train_annotations_file` missing.'
   assert FLAGS.test_annotations_file, '`test_annotations_file` missing.'
+  assert FLAGS.num_shards >= 1, '`num_shards` must be at least 1.'
+  assert 0 <= FLAGS.mask_png_level <= 9, '`mask_png_level` must be in 0-9.'
+  assert not FLAGS.write_index or FLAGS.compression == 'NONE', (
+      '`write_index` requires `compression=NONE`.')
 
-  if not tf.gfile.IsDirectory(FLAGS.output_dir):
-    tf.gfile.MakeDirs(FLAGS.output_dir)
+  if not os.path.isdir(FLAGS.output_dir):
+    os.makedirs(FLAGS.output_dir)
   train_output_path = os.path.join(FLAGS.output_dir, 'train.record')
   testdev_output_path = os.path.join(FLAGS.output_dir, 'test.record')
 
@@ -254,13 +478,26 @@ def main(_):
       FLAGS.train_annotations_file,
       FLAGS.train_image_dir,
       train_output_path,
-      FLAGS.include_masks)
+      FLAGS.include_masks,
+      FLAGS.num_shards,
+      FLAGS.workers,
+      FLAGS.compression,
+      FLAGS.mask_png_level,
+      FLAGS.mask_cache_dir or None,
+      FLAGS.write_index)
   _create_tf_record_from_coco_annotations(
       FLAGS.test_annotations_file,
       FLAGS.test_image_dir,
       testdev_output_path,
-      FLAGS.include_masks)
+      FLAGS.include_masks,
+      FLAGS.num_shards,
+      FLAGS.workers,
+      FLAGS.compression,
+      FLAGS.mask_png_level,
+      FLAGS.mask_cache_dir or None,
+      FLAGS.write_index)
 
 
 if __name__ == '__main__':
-  tf.app.run()
+  FLAGS = parser.parse_args()
+  main(sys.argv)
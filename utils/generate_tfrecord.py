@@ -1,6 +1,7 @@
 """ Sample TensorFlow XML-to-TFRecord converter
 
 usage: generate_tfrecord.py [-h] [-x XML_DIR] [-l LABELS_PATH] [-o OUTPUT_PATH] [-i IMAGE_DIR] [-c CSV_PATH]
+                            [-w WORKERS] [--write_index]
 
 optional arguments:
   -h, --help            show this help message and exit
@@ -14,20 +15,25 @@ optional arguments:
                         Path to the folder where the input image files are stored. Defaults to the same directory as XML_DIR.
   -c CSV_PATH, --csv_path CSV_PATH
                         Path of output .csv file. If none provided, then no file will be written.
+  -w WORKERS, --workers WORKERS
+                        Number of processes parsing the XML files (0 = one per CPU). Defaults to 1.
+  --write_index         Also write OUTPUT_PATH.index with the record offsets, for random access.
+
+Each XML file is parsed and written as a record right away, so memory use does
+not grow with the dataset; the CSV file, if requested, is written alongside.
 """
 
 import os
+import sys
+import csv
 import glob
-import pandas as pd
-import io
 import xml.etree.ElementTree as ET
 import argparse
 
-os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'    # Suppress TensorFlow logging (1)
-import tensorflow.compat.v1 as tf
-from PIL import Image
-from object_detection.utils import dataset_util, label_map_util
-from collections import namedtuple
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from convert import catalog
+from convert import tfrecord
+from convert.parallel import parallel_map
 
 # Initiate argument parser
 parser = argparse.ArgumentParser(
@@ -52,40 +58,47 @@ parser.add_argument("-c",
                     help="Path of output .csv file. If none provided, then no file will be "
                          "written.",
                     type=str, default=None)
+parser.add_argument("-w",
+                    "--workers",
+                    help="Number of processes parsing the XML files (0 = one per CPU). Defaults to 1.",
+                    type=int, default=1)
+parser.add_argument("--write_index",
+                    help="Also write OUTPUT_PATH.index with the record offsets, for random access.",
+                    action="store_true")
 
 args = parser.parse_args()
 
 if args.image_dir is None:
     args.image_dir = args.xml_dir
 
-label_map = label_map_util.load_labelmap(args.labels_path)
-label_map_dict = label_map_util.get_label_map_dict(label_map)
+label_map_dict = tfrecord.load_label_map(args.labels_path)
+
+
+CSV_COLUMNS = ['filename', 'width', 'height',
+               'class', 'xmin', 'ymin', 'xmax', 'ymax']
 
 
-def xml_to_csv(path):
-    """Iterates through all .xml files (generated by labelImg) in a given directory and combines
-    them in a single Pandas dataframe.
+def parse_xml(xml_file):
+    """Parses one .xml file (generated by labelImg) into CSV-style rows.
 
     Parameters:
     ----------
-    path : str
-        The path containing the .xml files
+    xml_file : str
+        Path of the .xml file
     Returns
     -------
-    Pandas DataFrame
-        The produced dataframe
+    tuple
+        The image filename and a list of (filename, width, height, class, xmin, ymin, xmax, ymax) rows
     """
 
-    xml_list = []
-    for xml_file in glob.glob(path + '/*.xml'):
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-        filename = root.find('filename').text
-        width = int(root.find('size').find('width').text)
-        height = int(root.find('size').find('height').text)
-        for member in root.findall('object'):
-            bndbox = member.find('bndbox')
-            value = (filename,
+    root = ET.parse(xml_file).getroot()
+    filename = root.find('filename').text
+    width = int(root.find('size').find('width').text)
+    height = int(root.find('size').find('height').text)
+    rows = []
+    for member in root.findall('object'):
+        bndbox = member.find('bndbox')
+        rows.append((filename,
                      width,
                      height,
                      member.find('name').text,
@@ -93,32 +106,43 @@ def xml_to_csv(path):
                      int(float(bndbox.find('ymin').text)),
                      int(float(bndbox.find('xmax').text)),
                      int(float(bndbox.find('ymax').text)),
-                     )
-            xml_list.append(value)
-    column_name = ['filename', 'width', 'height',
-                   'class', 'xmin', 'ymin', 'xmax', 'ymax']
-    xml_df = pd.DataFrame(xml_list, columns=column_name)
-    return xml_df
+                     ))
+    return filename, rows
 
 
-def class_text_to_int(row_label):
-    return label_map_dict[row_label]
+def iter_xml_annotations(path, workers=1):
+    """Parses all .xml files in a directory, in filename order, yielding each one as soon as it is ready.
 
+    Parameters:
+    ----------
+    path : str
+        The path containing the .xml files
+    workers : int
+        Number of parsing processes, 0 means one per CPU
+    Yields
+    -------
+    tuple
+        (filename, rows) as returned by parse_xml
+    """
 
-def split(df, group):
-    data = namedtuple('data', ['filename', 'object'])
-    gb = df.groupby(group)
-    return [data(filename, gb.get_group(x)) for filename, x in zip(gb.groups.keys(), gb.groups)]
+    xml_files = sorted(glob.glob(path + '/*.xml'))
+    for filename, rows in parallel_map(parse_xml, xml_files, workers):
+        yield filename, rows
 
 
-def create_tf_example(group, path):
-    with tf.gfile.GFile(os.path.join(path, '{}'.format(group.filename)), 'rb') as fid:
+def class_text_to_int(row_label):
+    return label_map_dict[row_label]
+
+
+def create_tf_example(filename, rows, path):
+    image_path = os.path.join(path, '{}'.format(filename))
+    with open(image_path, 'rb') as fid:
         encoded_jpg = fid.read()
-    encoded_jpg_io = io.BytesIO(encoded_jpg)
-    image = Image.open(encoded_jpg_io)
-    width, height = image.size
+    # dimensions cached by the image catalog while the file is unchanged
+    image_info = catalog.image_info(image_path, data=encoded_jpg)
+    width, height = image_info.width, image_info.height
 
-    filename = group.filename.encode('utf8')
+    filename = filename.encode('utf8')
     image_format = b'jpg'
     xmins = []
     xmaxs = []
@@ -127,46 +151,54 @@ def create_tf_example(group, path):
     classes_text = []
     classes = []
 
-    for index, row in group.object.iterrows():
-        xmins.append(row['xmin'] / width)
-        xmaxs.append(row['xmax'] / width)
-        ymins.append(row['ymin'] / height)
-        ymaxs.append(row['ymax'] / height)
-        classes_text.append(row['class'].encode('utf8'))
-        classes.append(class_text_to_int(row['class']))
-
-    tf_example = tf.train.Example(features=tf.train.Features(feature={
-        'image/height': dataset_util.int64_feature(height),
-        'image/width': dataset_util.int64_feature(width),
-        'image/filename': dataset_util.bytes_feature(filename),
-        'image/source_id': dataset_util.bytes_feature(filename),
-        'image/encoded': dataset_util.bytes_feature(encoded_jpg),
-        'image/format': dataset_util.bytes_feature(image_format),
-        'image/object/bbox/xmin': dataset_util.float_list_feature(xmins),
-        'image/object/bbox/xmax': dataset_util.float_list_feature(xmaxs),
-        'image/object/bbox/ymin': dataset_util.float_list_feature(ymins),
-        'image/object/bbox/ymax': dataset_util.float_list_feature(ymaxs),
-        'image/object/class/text': dataset_util.bytes_list_feature(classes_text),
-        'image/object/class/label': dataset_util.int64_list_feature(classes),
+    for _, _, _, label, xmin, ymin, xmax, ymax in rows:
+        xmins.append(xmin / width)
+        xmaxs.append(xmax / width)
+        ymins.append(ymin / height)
+        ymaxs.append(ymax / height)
+        classes_text.append(label.encode('utf8'))
+        classes.append(class_text_to_int(label))
+
+    tf_example = tfrecord.Example(features=tfrecord.Features(feature={
+        'image/height': tfrecord.int64_feature(height),
+        'image/width': tfrecord.int64_feature(width),
+        'image/filename': tfrecord.bytes_feature(filename),
+        'image/source_id': tfrecord.bytes_feature(filename),
+        'image/encoded': tfrecord.bytes_feature(encoded_jpg),
+        'image/format': tfrecord.bytes_feature(image_format),
+        'image/object/bbox/xmin': tfrecord.float_list_feature(xmins),
+        'image/object/bbox/xmax': tfrecord.float_list_feature(xmaxs),
+        'image/object/bbox/ymin': tfrecord.float_list_feature(ymins),
+        'image/object/bbox/ymax': tfrecord.float_list_feature(ymaxs),
+        'image/object/class/text': tfrecord.bytes_list_feature(classes_text),
+        'image/object/class/label': tfrecord.int64_list_feature(classes),
     }))
     return tf_example
 
 
 def main(_):
 
-    writer = tf.python_io.TFRecordWriter(args.output_path)
+    writer = tfrecord.TFRecordWriter(args.output_path, write_index=args.write_index)
     path = os.path.join(args.image_dir)
-    examples = xml_to_csv(args.xml_dir)
-    grouped = split(examples, 'filename')
-    for group in grouped:
-        tf_example = create_tf_example(group, path)
+    csv_file = csv_writer = None
+    if args.csv_path is not None:
+        csv_file = open(args.csv_path, 'w', newline='')
+        csv_writer = csv.writer(csv_file, lineterminator='\n')
+        csv_writer.writerow(CSV_COLUMNS)
+    for filename, rows in iter_xml_annotations(args.xml_dir, args.workers):
+        if csv_writer is not None:
+            csv_writer.writerows(rows)
+        # Images without any object have no rows and no record
+        if not rows:
+            continue
+        tf_example = create_tf_example(filename, rows, path)
         writer.write(tf_example.SerializeToString())
     writer.close()
     print('Successfully created the TFRecord file: {}'.format(args.output_path))
-    if args.csv_path is not None:
-        examples.to_csv(args.csv_path, index=None)
+    if csv_file is not None:
+        csv_file.close()
         print('Successfully created the CSV file: {}'.format(args.csv_path))
 
 
 if __name__ == '__main__':
-    tf.app.run()
+    main(sys.argv)
@@ -0,0 +1,201 @@
+'''
+python3 utils/visualize_tfrecord.py dataset/train.record dataset/labelmap.pbtxt --num_samples 256 --workers 0
+'''
+import os
+import sys
+import zlib
+import random
+import argparse
+from functools import partial
+
+import cv2
+import numpy as np
+from tqdm import tqdm
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from convert import tfrecord
+from convert.tfrecord_export import decode_example, list_record_files
+from convert.parallel import parallel_map, resolve_workers
+
+# distinct BGR colors, picked per class name so a class keeps its color on every sheet
+PALETTE = np.array([
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207), (10, 249, 72),
+    (23, 204, 146), (134, 219, 61), (52, 147, 26), (187, 212, 0), (168, 153, 44), (255, 194, 0),
+    (147, 69, 52), (255, 115, 100), (236, 24, 0), (255, 56, 132), (133, 0, 82), (255, 56, 203),
+    (200, 149, 255), (199, 55, 255)], dtype=np.uint8)
+
+BACKGROUND = (40, 40, 40)
+
+# jpeg decoders can downscale by 2, 4 or 8 while decoding, much cheaper than decoding full size and resizing
+REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+# count records of every file, using the offset index when there is one
+def count_records(path, compression=None):
+    if (compression or 'NONE') == 'NONE' and os.path.exists(path + tfrecord.INDEX_SUFFIX):
+        with tfrecord.TFRecordReader(path) as reader:
+            return len(reader)
+    return sum(1 for _ in tfrecord.iter_records(path, compression, verify=False))
+
+# pick record positions, returns sorted (file index, record index) pairs
+def sample_positions(counts, num_samples, seed=0, first=False):
+    total = sum(counts)
+    num_samples = min(num_samples, total)
+    if first:
+        picked = range(num_samples)
+    else:
+        picked = sorted(random.Random(seed).sample(range(total), num_samples))
+    bounds = np.cumsum([0] + list(counts))
+    positions = []
+    for position in picked:
+        file_index = int(np.searchsorted(bounds, position, side='right')) - 1
+        positions.append((file_index, position - int(bounds[file_index])))
+    return positions
+
+# read the records at the given positions, random access for indexed files and one forward pass otherwise
+def read_positions(record_files, positions, compression=None):
+    by_file = {}
+    for file_index, record_index in positions:
+        by_file.setdefault(file_index, []).append(record_index)
+    for file_index, record_indices in by_file.items():
+        path = record_files[file_index]
+        if (compression or 'NONE') == 'NONE' and os.path.exists(path + tfrecord.INDEX_SUFFIX):
+            with tfrecord.TFRecordReader(path) as reader:
+                for record_index in record_indices:
+                    yield reader[record_index]
+            continue
+        wanted = set(record_indices)
+        last = max(record_indices)
+        for record_index, record in enumerate(tfrecord.iter_records(path, compression)):
+            if record_index in wanted:
+                yield record
+            if record_index >= last:
+                break
+
+# color of a class name
+def class_color(label):
+    return tuple(int(c) for c in PALETTE[zlib.crc32(label.encode('utf8')) % len(PALETTE)])
+
+# decode an image, downscaled while decoding when it stays at least as large as a cell
+def decode_thumbnail(encoded, width, height, cell_size):
+    data = np.frombuffer(encoded, dtype=np.uint8)
+    for factor, flag in REDUCED_FLAGS:
+        if width and height and max(width, height) // factor >= cell_size:
+            image = cv2.imdecode(data, flag)
+            if image is not None:
+                return image
+    return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+# draw boxes, masks and class names of one example into a cell_size x cell_size thumbnail
+def render_example(example, cell_size, draw_labels=True, mask_alpha=0.4):
+    cell = np.full((cell_size, cell_size, 3), BACKGROUND, dtype=np.uint8)
+    image = decode_thumbnail(example['encoded'], example['width'], example['height'], cell_size)
+    if image is None:
+        cv2.putText(cell, 'undecodable', (4, cell_size // 2), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 255), 1, cv2.LINE_AA)
+        return cell
+    width = example['width'] or image.shape[1]
+    height = example['height'] or image.shape[0]
+    scale = cell_size / max(width, height)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    thumb = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    # group objects by class so each class is drawn with one call per primitive
+    labels = example['labels']
+    boxes = np.rint(np.asarray(example['boxes'], dtype=np.float64).reshape(-1, 4) * scale).astype(np.int32)
+    corners = boxes[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 4, 2)
+    groups = {}
+    for i, label in enumerate(labels):
+        groups.setdefault(label, []).append(i)
+
+    if any(example['polygons']):
+        overlay = thumb.copy()
+        for label, indices in groups.items():
+            polygons = [np.rint(np.asarray(polygon, dtype=np.float64).reshape(-1, 2) * scale).astype(np.int32)
+                        for i in indices for polygon in example['polygons'][i]]
+            if polygons:
+                cv2.fillPoly(overlay, polygons, class_color(label))
+        thumb = cv2.addWeighted(overlay, mask_alpha, thumb, 1 - mask_alpha, 0)
+
+    for label, indices in groups.items():
+        cv2.polylines(thumb, list(corners[indices]), True, class_color(label), 1, cv2.LINE_AA)
+    if draw_labels:
+        for label, box in zip(labels, boxes.tolist()):
+            cv2.putText(thumb, label, (box[0] + 2, max(box[1] - 2, 8)), cv2.FONT_HERSHEY_SIMPLEX, 0.3,
+                        class_color(label), 1, cv2.LINE_AA)
+
+    top, left = (cell_size - size[1]) // 2, (cell_size - size[0]) // 2
+    cell[top:top + size[1], left:left + size[0]] = thumb
+    cell[cell_size - 12:] = BACKGROUND # caption strip
+    cv2.putText(cell, example['file_name'][:40], (2, cell_size - 4), cv2.FONT_HERSHEY_SIMPLEX, 0.3,
+                (255, 255, 255), 1, cv2.LINE_AA)
+    return cell
+
+# render one contact sheet, returns its path and the number of drawn records
+def render_sheet(sheet, record_files, output_dir, cols, cell_size, compression=None, label_names=None,
+                 draw_masks=True, draw_labels=True, single_thread=False):
+    if single_thread:
+        cv2.setNumThreads(1) # one OpenCV thread per worker process
+    sheet_index, positions = sheet
+    rows = (len(positions) + cols - 1) // cols
+    canvas = np.full((rows * cell_size, cols * cell_size, 3), BACKGROUND, dtype=np.uint8)
+    count = 0
+    for i, record in enumerate(read_positions(record_files, positions, compression)):
+        example = decode_example(record, label_names, draw_masks)
+        row, col = divmod(i, cols)
+        canvas[row * cell_size:(row + 1) * cell_size, col * cell_size:(col + 1) * cell_size] = \
+            render_example(example, cell_size, draw_labels)
+        count += 1
+    # cell borders
+    canvas[::cell_size, :] = 0
+    canvas[:, ::cell_size] = 0
+    sheet_path = os.path.join(output_dir, 'sheet_{:04d}.jpg'.format(sheet_index))
+    cv2.imwrite(sheet_path, canvas, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return sheet_path, count
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="TFRecord contact sheet visualizer")
+    parser.add_argument('tfrecord', help='TFRecord file, glob pattern or directory of record files')
+    parser.add_argument('label_map', nargs='?', help='label map .pbtxt naming class ids of records without class text')
+    parser.add_argument('--output_dir', default='vis', help='directory of the contact sheets')
+    parser.add_argument('--num_samples', type=int, default=64, help='number of records to draw')
+    parser.add_argument('--first', action='store_true', help='draw the first records instead of a random sample')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the sample')
+    parser.add_argument('--cols', type=int, default=8, help='cells per sheet row')
+    parser.add_argument('--rows', type=int, default=8, help='cell rows per sheet')
+    parser.add_argument('--cell_size', type=int, default=256, help='cell width and height in pixels')
+    parser.add_argument('--compression', choices=tfrecord.COMPRESSION_TYPES, default='NONE', help='record compression')
+    parser.add_argument('--no_masks', action='store_true', help='do not draw instance masks')
+    parser.add_argument('--no_labels', action='store_true', help='do not write class names next to boxes')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes (0 = one per CPU)')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    record_files = list_record_files(args.tfrecord)
+    if not record_files:
+        print('Error: no TFRecord files found at {}'.format(args.tfrecord))
+        exit(-1)
+    label_names = None
+    if args.label_map:
+        # display names like the object detection visualizer, names where an item has none
+        label_names = {label_id: name for name, label_id in tfrecord.load_label_map(args.label_map, True).items()}
+        label_names.update({label_id: name for name, label_id in tfrecord.load_label_map(args.label_map).items()
+                            if label_id not in label_names})
+    if not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    counts = [count_records(path, args.compression) for path in record_files]
+    positions = sample_positions(counts, args.num_samples, args.seed, args.first)
+    print('Total records: {}, drawing {}'.format(sum(counts), len(positions)))
+
+    # sheets hold consecutive positions, so workers reading unindexed files stop early
+    per_sheet = args.cols * args.rows
+    sheets = [(i // per_sheet, positions[i:i + per_sheet]) for i in range(0, len(positions), per_sheet)]
+    render = partial(render_sheet, record_files=record_files, output_dir=args.output_dir, cols=args.cols,
+                     cell_size=args.cell_size, compression=args.compression, label_names=label_names,
+                     draw_masks=not args.no_masks, draw_labels=not args.no_labels,
+                     single_thread=resolve_workers(args.workers) > 1)
+    no_drawn = 0
+    for sheet_path, count in tqdm(parallel_map(render, sheets, args.workers, chunksize=1), total=len(sheets)):
+        no_drawn += count
+    print('Drew {} records on {} sheets in {}'.format(no_drawn, len(sheets), args.output_dir))